@@ -0,0 +1,187 @@
+import os
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import adoption_sweep
+
+# Cone arrays, local preference table, hackers and victim shared by the worker processes
+_problem = None
+
+
+def _init_worker(cone, lp_table, hackers, victim):
+    """
+    Stores the problem in a worker process.
+    """
+    global _problem
+    _problem = (cone, lp_table, hackers, victim)
+
+
+def _hijacked(rpki):
+    """
+    Simulates every hacker against the victim for an RPKI assignment.
+
+    :param rpki: Boolean array marking the ASes using RPKI.
+    :return: Boolean array marking the ASes hijacked by at least one hacker, and the total number of hijacked ASes.
+    """
+    cone, lp_table, hackers, victim = _problem
+    hijacked_any = np.zeros(len(cone["nodes"]), dtype=bool)
+    total = 0
+    for hacker in hackers:
+        hijacked = adoption_sweep.simulate(cone, lp_table, rpki, hacker, victim)
+        hijacked[hacker] = False  # The hacker always routes to itself
+        hijacked_any |= hijacked
+        total += int(hijacked.sum())
+    return hijacked_any, total
+
+
+def _evaluate(adopters, candidates):
+    """
+    Evaluates, in a worker process, the adopter set extended with each candidate.
+
+    :param adopters: Indexes of the current adopters.
+    :param candidates: Indexes of the candidate adopters.
+    :return: List of the total number of hijacked ASes for every candidate.
+    """
+    rpki = np.zeros(len(_problem[0]["nodes"]), dtype=bool)
+    rpki[adopters] = True
+    totals = []
+    for candidate in candidates:
+        rpki[candidate] = True
+        totals.append(_hijacked(rpki)[1])
+        rpki[candidate] = False
+    return totals
+
+
+def optimize_adopters(topology, victim_node, hacker_nodes, prefer_customer, invalid_prefixes_in_bgp_table,
+                      max_adopters=None, target_hijacked=0, workers=None, chunk_size=64):
+    """
+    Greedily selects a small set of RPKI adopters protecting the victim prefix from the given hackers.
+
+    The victim always adopts RPKI, as only ASes using RPKI have a ROA for their LAN. At each
+    step every AS currently hijacked by some hacker is tried as a new adopter (the other ASes
+    already route to the victim) and the one leaving the fewest hijacked ASes, summed over all
+    the hackers, is added. Candidates are evaluated in parallel with the propagation model of
+    adoption_sweep and lazily: the reduction measured at an earlier step is taken as an upper
+    bound (as in lazy greedy for submodular objectives; here it is a heuristic), so only the
+    most promising candidates are re-evaluated. The search stops when at most target_hijacked
+    ASes are hijacked, when no candidate improves the outcome or when max_adopters is reached.
+
+    :param topology: Dictionary representing the customer cone.
+    :param victim_node: AS number of the victim.
+    :param hacker_nodes: List of the AS numbers of the possible hackers.
+    :param prefer_customer: Boolean flag to prefer customer routes.
+    :param invalid_prefixes_in_bgp_table: Boolean flag to keep invalid routes.
+    :param max_adopters: Maximum number of adopters, victim included (no limit if None).
+    :param target_hijacked: Total number of hijacked ASes at which the search stops.
+    :param workers: Number of worker processes (defaults to the number of CPUs).
+    :param chunk_size: Number of candidates evaluated by each task.
+    :return: Tuple (list of the selected RPKI nodes, list of the steps with the added AS and the hijacked ASes left).
+    """
+    cone = adoption_sweep.cone_arrays(topology)
+    lp_table = adoption_sweep.local_pref_table(prefer_customer, invalid_prefixes_in_bgp_table)
+    index = {as_number: i for i, as_number in enumerate(cone["nodes"])}
+    victim = index[victim_node]
+    hackers = [index[hacker_node] for hacker_node in hacker_nodes if hacker_node != victim_node]
+
+    # The main process evaluates the selected set with the same model
+    _init_worker(cone, lp_table, hackers, victim)
+    adopters = [victim]
+    rpki = np.zeros(len(cone["nodes"]), dtype=bool)
+    rpki[victim] = True
+    hijacked_any, total = _hijacked(rpki)
+    steps = [{"added": victim_node, "hijacked": total}]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cone, lp_table, hackers, victim)) as executor:
+        # Reduction of the hijacked ASes achieved by each candidate when it was last evaluated
+        reductions = {}
+        batch_size = chunk_size * (workers or os.cpu_count() or 1)
+        while total > target_hijacked and (max_adopters is None or len(adopters) < max_adopters):
+            candidates = [int(i) for i in np.nonzero(hijacked_any & ~rpki)[0] if i not in hackers]
+            if not candidates:
+                break
+
+            # Lazy evaluation: candidates are re-evaluated in order of their last reduction, which is
+            # used as an upper bound, until the best fresh reduction beats every stale one
+            order = sorted(candidates, key=lambda i: (-reductions.get(i, float("inf")), i))
+            evaluated = []
+            position = 0
+            while position < len(order):
+                batch = order[position:position + batch_size]
+                position += len(batch)
+                chunks = [batch[start:start + chunk_size] for start in range(0, len(batch), chunk_size)]
+                totals = []
+                for chunk_totals in executor.map(_evaluate, [adopters] * len(chunks), chunks):
+                    totals.extend(chunk_totals)
+                for candidate, candidate_total in zip(batch, totals):
+                    reductions[candidate] = total - candidate_total
+                evaluated.extend(batch)
+                best_candidate = min(evaluated, key=lambda i: (-reductions[i], i))
+                if position >= len(order) or reductions[best_candidate] >= reductions.get(order[position], float("inf")):
+                    break
+
+            if reductions[best_candidate] <= 0:
+                break  # No single adopter improves the outcome
+            adopters.append(best_candidate)
+            rpki[best_candidate] = True
+            hijacked_any, total = _hijacked(rpki)
+            steps.append({"added": cone["nodes"][best_candidate], "hijacked": total})
+            print(f"Adopter {len(adopters)}: AS{cone['nodes'][best_candidate]}, {total} hijacked ASes left")
+
+    return [cone["nodes"][i] for i in adopters], steps
+
+
+def save_configuration(rpki_nodes, hacker_node, victim_node, collector_nodes, output_file):
+    """
+    Saves the selected adopters in the format of saved_nodes.json, to be loaded by kat_rpki.py.
+
+    :param rpki_nodes: List of the RPKI nodes.
+    :param hacker_node: AS number of the hacker to emulate.
+    :param victim_node: AS number of the victim.
+    :param collector_nodes: List of the collector nodes.
+    :param output_file: Path of the output file.
+    """
+    with open(output_file, "w") as f:
+        json.dump({
+            "rpki_nodes": rpki_nodes,
+            "collector_nodes": collector_nodes,
+            "hacker_node": [hacker_node],
+            "victim_node": [victim_node]
+        }, f)
+
+
+if __name__ == "__main__":
+    # Run from the project root, after kat_rpki.py has created the customer cone
+    with open("input/config.json", "r") as f:
+        config = json.load(f)
+    optimizer_config = config.get("adopter_optimizer", {})
+
+    with open("output/customer_cone.json", "r") as f:
+        topology = json.load(f)
+
+    # Without an explicit victim and hackers, optimise the last saved selection
+    victim_node = optimizer_config.get("victim_node")
+    hacker_nodes = optimizer_config.get("hacker_nodes") or []
+    collector_nodes = []
+    if os.path.exists("output/saved_nodes.json"):
+        with open("output/saved_nodes.json", "r") as f:
+            saved_nodes = json.load(f)
+        victim_node = victim_node or saved_nodes["victim_node"][0]
+        hacker_nodes = hacker_nodes or saved_nodes["hacker_node"]
+        collector_nodes = saved_nodes.get("collector_nodes", [])
+    if victim_node is None or not hacker_nodes:
+        print("Error: set 'victim_node' and 'hacker_nodes' in the 'adopter_optimizer' configuration.")
+        exit(1)
+
+    start = time.perf_counter()
+    rpki_nodes, steps = optimize_adopters(topology, victim_node, hacker_nodes,
+                                          config.get("prefer_customer", False),
+                                          config.get("invalid_prefixes_in_bgp_table", False),
+                                          optimizer_config.get("max_adopters"),
+                                          optimizer_config.get("target_hijacked", 0),
+                                          optimizer_config.get("workers") or os.cpu_count())
+
+    output_file = optimizer_config.get("output_file", "output/optimized_nodes.json")
+    save_configuration(rpki_nodes, hacker_nodes[0], victim_node, collector_nodes, output_file)
+    print(f"{len(rpki_nodes)} RPKI adopters leave {steps[-1]['hijacked']} hijacked ASes over {len(hacker_nodes)} hackers "
+          f"(computed in {time.perf_counter() - start:.1f} seconds, saved in '{output_file}')")
@@ -0,0 +1,231 @@
+import os
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import route_propagation
+
+# Relationship codes of the route selected by an AS (higher codes win ties); LOCAL marks the origins
+PROVIDER, PEER, CUSTOMER, LOCAL = 0, 1, 2, 3
+RELATION_CODES = {route_propagation.PROVIDER: PROVIDER, route_propagation.PEER: PEER, route_propagation.CUSTOMER: CUSTOMER}
+
+# Validation state codes of the victim prefix
+VALID, NOT_FOUND, INVALID = 0, 1, 2
+
+MAX_PATH_LENGTH = 63  # AS path lengths are packed in 6 bits
+MAX_ROUNDS = 256
+
+# Arrays of the cone shared by the worker processes
+_cone = None
+
+
+def local_pref_table(prefer_customer, invalid_prefixes_in_bgp_table):
+    """
+    Builds the local preference assigned by the route-maps of frr.create_frr.
+
+    :param prefer_customer: Boolean flag to prefer customer routes.
+    :param invalid_prefixes_in_bgp_table: Boolean flag to keep invalid routes.
+    :return: Array indexed by [uses RPKI, relationship code, validation state code]; -1 marks filtered routes.
+    """
+    policy = route_propagation.RoutingPolicy([], [], prefer_customer, invalid_prefixes_in_bgp_table)
+    states = {VALID: route_propagation.rov.VALID, NOT_FOUND: route_propagation.rov.NOT_FOUND, INVALID: route_propagation.rov.INVALID}
+    table = np.full((2, 3, 3), -1, dtype=np.int64)
+    for is_rpki in (0, 1):
+        for relation, code in RELATION_CODES.items():
+            for state_code, state in states.items():
+                local_pref = policy.state_local_pref(bool(is_rpki), relation, state)
+                if local_pref is not None:
+                    table[is_rpki, code, state_code] = local_pref
+    return table
+
+
+def cone_arrays(topology):
+    """
+    Converts the customer cone into edge arrays.
+
+    :param topology: Dictionary representing the customer cone.
+    :return: Dictionary with the AS list and, for every directed edge u -> v, the arrays "src", "dst",
+             "relation" (relationship code of u as seen by v) and "export_all" (v is a customer of u,
+             so it receives every route of u).
+    """
+    relations = route_propagation.relations_from_topology(topology)
+    nodes = list(relations)
+    index = {as_number: i for i, as_number in enumerate(nodes)}
+    src, dst, relation = [], [], []
+    for as_number, neighbors in relations.items():
+        for neighbor, neighbor_relation in neighbors.items():
+            src.append(index[neighbor])
+            dst.append(index[as_number])
+            relation.append(RELATION_CODES[neighbor_relation])
+    relation = np.array(relation, dtype=np.int64)
+    return {
+        "nodes": nodes,
+        "src": np.array(src, dtype=np.int64),
+        "dst": np.array(dst, dtype=np.int64),
+        "relation": relation,
+        "export_all": relation == PROVIDER
+    }
+
+
+def _converge(cone, edge_lp, local, score):
+    """
+    Runs synchronous propagation rounds from a score array until no AS changes its route.
+    """
+    src, dst, relation, export_all = cone["src"], cone["dst"], cone["relation"], cone["export_all"]
+    for _ in range(MAX_ROUNDS):
+        has_route = score[src] >= 0
+        relation_code = score[src] & 3
+        older = (score[src] >> 2) & 1
+        length = MAX_PATH_LENGTH - ((score[src] >> 3) & 63)
+
+        # Valley-free export: customer and local routes to everyone, the others only to customers
+        lp = np.where(older == 1, edge_lp[1], edge_lp[0])
+        sent = has_route & ((relation_code >= CUSTOMER) | export_all) & (lp >= 0)
+        candidate = ((lp * 64 + MAX_PATH_LENGTH - np.minimum(length + 1, MAX_PATH_LENGTH)) * 2 + older) * 4 + relation
+
+        new_score = local.copy()
+        np.maximum.at(new_score, dst[sent], candidate[sent])
+        if np.array_equal(new_score, score):
+            break
+        score = new_score
+    return score
+
+
+def simulate(cone, lp_table, rpki, hacker, victim):
+    """
+    Propagates the victim's announcement of its prefix, then the hacker's one on top of the converged state.
+
+    The route of every AS is packed in a single integer score (local preference, shorter
+    AS path, victim's older route, relationship), so each round is a vectorised scatter-max
+    over all the edges. AS path loops are not tracked: valley-free export cannot create them
+    in an acyclic provider-customer hierarchy. Ties between equally ranked neighbors are broken
+    by the relationship code instead of the neighbor AS, so a few ASes may pick a different
+    (equally preferred) path than hijack_simulator.
+
+    :param cone: Arrays returned by cone_arrays.
+    :param lp_table: Array returned by local_pref_table.
+    :param rpki: Boolean array marking the ASes using RPKI.
+    :param hacker: Index of the hacker AS.
+    :param victim: Index of the victim AS.
+    :return: Boolean array marking the ASes whose best route leads to the hacker.
+    """
+    # By convention only ASes using RPKI have a ROA for their own LAN
+    state_victim = VALID if rpki[victim] else NOT_FOUND
+    state_hacker = INVALID if rpki[victim] else NOT_FOUND
+    edge_lp = {older: lp_table[rpki[cone["dst"]].astype(np.int64), cone["relation"], state_victim if older else state_hacker]
+               for older in (0, 1)}
+
+    local = np.full(len(cone["nodes"]), -1, dtype=np.int64)
+    local_pref = route_propagation.LOCAL_ROUTE_PREF
+    local[victim] = ((local_pref * 64 + MAX_PATH_LENGTH) * 2 + 1) * 4 + LOCAL
+    score = _converge(cone, edge_lp, local, local.copy())
+
+    # The hijack starts once the victim prefix has converged
+    local[hacker] = ((local_pref * 64 + MAX_PATH_LENGTH) * 2 + 0) * 4 + LOCAL
+    score[hacker] = local[hacker]
+    score = _converge(cone, edge_lp, local, score)
+    return (score >= 0) & (((score >> 2) & 1) == 0)
+
+
+def _init_worker(cone, lp_table):
+    """
+    Stores the cone arrays in a worker process.
+    """
+    global _cone
+    _cone = (cone, lp_table)
+
+
+def _run_samples(adoption, samples, seed):
+    """
+    Evaluates random assignments at an adoption level in a worker process.
+
+    :return: List of hijacked fractions (ASes other than hacker and victim routing to the hacker).
+    """
+    cone, lp_table = _cone
+    rng = np.random.default_rng(seed)
+    nodes_count = len(cone["nodes"])
+    rpki_count = int(nodes_count * adoption / 100)
+    fractions = []
+    for _ in range(samples):
+        rpki = np.zeros(nodes_count, dtype=bool)
+        rpki[rng.choice(nodes_count, rpki_count, replace=False)] = True
+        hacker, victim = rng.choice(nodes_count, 2, replace=False)
+        hijacked = simulate(cone, lp_table, rpki, hacker, victim)
+        fractions.append((int(hijacked.sum()) - 1) / max(nodes_count - 2, 1))
+    return fractions
+
+
+def run_sweep(topology, adoption_levels, samples, prefer_customer, invalid_prefixes_in_bgp_table, workers=None, seed=None, chunk_size=50):
+    """
+    Samples random RPKI/hacker/victim assignments for every adoption level across a process pool.
+
+    :param topology: Dictionary representing the customer cone.
+    :param adoption_levels: List of RPKI adoption percentages.
+    :param samples: Number of assignments per adoption level.
+    :param prefer_customer: Boolean flag to prefer customer routes.
+    :param invalid_prefixes_in_bgp_table: Boolean flag to keep invalid routes.
+    :param workers: Number of worker processes (defaults to the number of CPUs).
+    :param seed: Optional seed, for reproducible sweeps.
+    :param chunk_size: Number of samples evaluated by each task.
+    :return: List with the hijack success statistics of every adoption level.
+    """
+    cone = cone_arrays(topology)
+    lp_table = local_pref_table(prefer_customer, invalid_prefixes_in_bgp_table)
+    seeds = np.random.SeedSequence(seed)
+
+    tasks = []
+    for adoption in adoption_levels:
+        for start in range(0, samples, chunk_size):
+            tasks.append((adoption, min(chunk_size, samples - start), seeds.spawn(1)[0]))
+
+    fractions = {adoption: [] for adoption in adoption_levels}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cone, lp_table)) as executor:
+        futures = [(adoption, executor.submit(_run_samples, adoption, count, task_seed)) for adoption, count, task_seed in tasks]
+        for adoption, future in futures:
+            fractions[adoption].extend(future.result())
+
+    results = []
+    for adoption in adoption_levels:
+        values = np.array(fractions[adoption])
+        mean = float(values.mean())
+        # 95% confidence interval of the mean (normal approximation)
+        margin = 1.96 * float(values.std(ddof=1)) / len(values) ** 0.5 if len(values) > 1 else 0.0
+        results.append({
+            "adoption_rpki": adoption,
+            "samples": len(values),
+            "mean_hijacked_fraction": round(mean, 4),
+            "ci_low": round(max(mean - margin, 0.0), 4),
+            "ci_high": round(min(mean + margin, 1.0), 4),
+            "median": round(float(np.median(values)), 4),
+            "p10": round(float(np.percentile(values, 10)), 4),
+            "p90": round(float(np.percentile(values, 90)), 4)
+        })
+    return results
+
+
+if __name__ == "__main__":
+    # Run from the project root, after kat_rpki.py has created the customer cone
+    with open("input/config.json", "r") as f:
+        config = json.load(f)
+    sweep_config = config.get("adoption_sweep", {})
+
+    with open("output/customer_cone.json", "r") as f:
+        topology = json.load(f)
+
+    start = time.perf_counter()
+    results = run_sweep(topology,
+                        sweep_config.get("adoption_levels", list(range(0, 101, 10))),
+                        sweep_config.get("samples", 1000),
+                        config.get("prefer_customer", False),
+                        config.get("invalid_prefixes_in_bgp_table", False),
+                        sweep_config.get("workers") or os.cpu_count(),
+                        sweep_config.get("seed"))
+
+    output_file = "output/adoption_sweep.json"
+    with open(output_file, "w") as f:
+        json.dump(results, f, indent=4)
+
+    for result in results:
+        print(f"RPKI adoption {result['adoption_rpki']:>3}%: hijacked fraction {result['mean_hijacked_fraction']:.3f} "
+              f"[{result['ci_low']:.3f}, {result['ci_high']:.3f}] over {result['samples']} samples")
+    print(f"Sweep completed in {time.perf_counter() - start:.1f} seconds, results saved in '{output_file}'")
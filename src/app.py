@@ -1,24 +1,37 @@
 import dash
-from dash import Dash, dcc, html, Input, Output, State
+from dash import Dash, dcc, html, Input, Output, State, Patch
 import dash_bootstrap_components as dbc
 import plotly.graph_objects as go
 import networkx as nx
+import layout_cache
+import graph_rendering
+import cone_clustering
+import functools
 import json
 import os
 import signal
 import threading
 import time
+from hijack_simulator import HijackPreview
 
-def run_dash_app(as_data, start_configuration):
+def run_dash_app(as_data, start_configuration, prefer_customer=False, invalid_prefixes_in_bgp_table=False,
+                 webgl_edge_threshold=graph_rendering.DEFAULT_WEBGL_EDGE_THRESHOLD, clustering_options=None):
     """
     Run the Dash app for visualizing and interacting with the AS topology.
     
     :param as_data: Dictionary containing the Autonomous System (AS) topology.
     :param start_configuration: Initial configuration for RPKI, Collector, Hacker, and Victim nodes.
+    :param prefer_customer: Boolean flag to prefer customer routes (used by the hijack preview).
+    :param invalid_prefixes_in_bgp_table: Boolean flag to keep invalid routes (used by the hijack preview).
+    :param webgl_edge_threshold: Number of edges above which the graph is drawn with WebGL.
+    :param clustering_options: Keyword arguments of cone_clustering.build_clustering (None for the defaults).
     """
 
     start_as = list(as_data.keys())[0]  # Define the root AS for the graph
 
+    # Predicts the hijacked ASes while the nodes are selected, recomputing only what a click can change
+    hijack_preview = HijackPreview(as_data, prefer_customer, invalid_prefixes_in_bgp_table)
+
     def build_graph_from_topology(as_data):
         """
         Build a directed graph from the given AS topology using NetworkX.
@@ -28,10 +41,16 @@ def run_dash_app(as_data, start_configuration):
         """
         G = nx.DiGraph()
 
+        visited = set()  # Multi-homed ASes are reached once per provider, their sub-cone is walked only once
+
         def add_to_graph(node):
             """
             Recursively add nodes and edges to the graph based on parent-to-customer and peer-to-peer relationships.
             """
+            if node in visited:
+                return
+            visited.add(node)
+
             # Add child nodes (provider-to-customer relationship)       
             for child in as_data[node].get("p2c", []):
                 G.add_edge(node, child, relation="c2p")  # Add c2p relationship
@@ -49,15 +68,20 @@ def run_dash_app(as_data, start_configuration):
     # Build the graph from the AS topology
     G = build_graph_from_topology(as_data)
 
-    # Generate positions for the nodes using Graphviz for a tree structure layout
-    pos = nx.nx_agraph.graphviz_layout(G, prog="dot", root=start_as)
+    # Generate positions for the nodes using Graphviz for a tree structure layout (cached, so the same cone is laid out only once)
+    pos = layout_cache.graph_layout(G, start_as)
 
     # Add positions to the graph nodes
     for node in G.nodes:
         x, y = pos[node]
         G.nodes[node]['pos'] = (x, y)
-    
-    traceRecode = []  # contains edge_trace, node_trace, text_trace
+
+    # Large cones are drawn with WebGL traces, with the edge directions as markers instead of annotations
+    webgl = graph_rendering.use_webgl(G, webgl_edge_threshold)
+    Scatter = graph_rendering.scatter_class(webgl)
+
+    # Huge cones are shown by level of detail: collapsed sub-cones are drawn as single aggregate nodes
+    clustering = cone_clustering.build_clustering(as_data, **(clustering_options or {}))
 
     # Define colors for edges based on their type
     edge_colors = {
@@ -66,32 +90,24 @@ def run_dash_app(as_data, start_configuration):
         'p2p': 'rgba(105, 105, 105, 0.5)'
     }
 
-    # Function to create the Dash figure for the graph
-    def create_figure(selected_square_nodes=None, selected_blackCircle_nodes=None, 
-                      selected_red_node=None, selected_green_node=None, 
-                      xaxis_range=None, yaxis_range=None):
+    def build_edge_elements(graph):
         """
-        Create the figure for the AS topology graph with visual elements for different node types.
+        Build the edge traces and the arrow annotations of the graph.
 
-        :param selected_square_nodes: List of nodes selected as RPKI.
-        :param selected_blackCircle_nodes: List of nodes selected as Collectors.
-        :param selected_red_node: List of nodes selected as Hackers.
-        :param selected_green_node: List of nodes selected as Victims.
-        :param xaxis_range: Range for the x-axis in the graph.
-        :param yaxis_range: Range for the y-axis in the graph.
-        :return: A Plotly figure object.
-        """
-        traceRecode = []  # Contains edge traces, node traces, and legend elements
+        The edges of a view never change, so they are built once and reused by every figure of the view.
 
+        :param graph: NetworkX graph of the shown ASes.
+        :return: Tuple with the list of edge traces (arrow heads included in WebGL mode) and the list of arrow annotations.
+        """
         # Separate edges based on their relationship types (p2p, c2p)
         p2p_edges_x, p2p_edges_y = [], []
         c2p_edges_x, c2p_edges_y = [], []
 
         # Iterate over edges in the graph
-        for edge in G.edges:
-            x0, y0 = G.nodes[edge[1]]['pos']  # Position of the child node
-            x1, y1 = G.nodes[edge[0]]['pos']  # Position of the parent node
-            relation = G.edges[edge]['relation']
+        for edge in graph.edges:
+            x0, y0 = graph.nodes[edge[1]]['pos']  # Position of the child node
+            x1, y1 = graph.nodes[edge[0]]['pos']  # Position of the parent node
+            relation = graph.edges[edge]['relation']
 
             # Categorize edges based on relationship type
             if relation == 'p2p':
@@ -102,7 +118,7 @@ def run_dash_app(as_data, start_configuration):
                 c2p_edges_y.extend([y0, y1, None])
 
         # Create a scatter trace for p2p edges
-        p2p_trace = go.Scatter(
+        p2p_trace = Scatter(
             x=p2p_edges_x,
             y=p2p_edges_y,
             mode='lines',
@@ -112,10 +128,9 @@ def run_dash_app(as_data, start_configuration):
             name='peer-to-peer (bidirectional)',
             showlegend=True
         )
-        traceRecode.append(p2p_trace)
 
         # Create a scatter trace for c2p edges
-        c2p_trace = go.Scatter(
+        c2p_trace = Scatter(
             x=c2p_edges_x,
             y=c2p_edges_y,
             mode='lines',
@@ -125,7 +140,94 @@ def run_dash_app(as_data, start_configuration):
             name='customer-to-provider',
             showlegend=True
         )
-        traceRecode.append(c2p_trace)
+
+        # One arrow per edge, from the middle of the edge towards the parent node
+        arrow_traces, annotations = graph_rendering.edge_arrows(
+            graph, [(edge, edge_colors[graph.edges[edge]['relation']]) for edge in graph.edges], webgl
+        )
+        return [p2p_trace, c2p_trace] + arrow_traces, annotations
+
+    @functools.lru_cache(maxsize=8)
+    def graph_view(expanded):
+        """
+        Build the view of the graph with the given sub-cones expanded.
+
+        :param expanded: Tuple of the expanded ASes (ignored if the cone is not clustered).
+        :return: Tuple with the ClusterView, its edge traces, its arrow annotations and the position of every shown node in the node trace.
+        """
+        view = cone_clustering.ClusterView(G) if clustering is None else clustering.view(G, list(expanded))
+        edge_traces, edge_annotations = build_edge_elements(view.graph)
+        node_index = {node: i for i, node in enumerate(view.graph.nodes())}
+        return view, edge_traces, edge_annotations, node_index
+
+    # Starting view, with the hacker and the victim shown
+    start_expanded = [] if clustering is None else clustering.initial_expanded(
+        reveal=start_configuration["hacker_node"] + start_configuration["victim_node"])
+    edge_traces = graph_view(tuple(start_expanded))[1]
+
+    # Position of the traces in the figure
+    PREDICTED_TRACE = len(edge_traces) + 5  # edge traces, then the legend elements
+    NODE_TRACE = len(edge_traces) + 6
+
+    def predict_hijacked(rpki_nodes, hacker_node, victim_node):
+        """
+        Predict the ASes routing the victim prefix to the hacker, once both are selected.
+
+        :param rpki_nodes: List of nodes selected as RPKI.
+        :param hacker_node: List of nodes selected as Hackers.
+        :param victim_node: List of nodes selected as Victims.
+        :return: Set of the predicted hijacked nodes.
+        """
+        if not hacker_node or not victim_node or hacker_node[0] == victim_node[0]:
+            return set()
+        start = time.perf_counter()
+        predicted_hijacked = hijack_preview.hijacked(rpki_nodes, hacker_node[0], victim_node[0])
+        print(f"Predicted hijack: {len(predicted_hijacked)} of {len(as_data) - 2} ASes "
+              f"route to the hacker ({(time.perf_counter() - start) * 1000:.1f} ms)")
+        return predicted_hijacked
+
+    def node_style(node, selected_square_nodes, selected_blackCircle_nodes, selected_red_node, selected_green_node, predicted_hijacked):
+        """
+        Compute the marker of a node from the current selections.
+
+        :return: Tuple (fill color, border color, symbol).
+        """
+        # Determine the fill color based on node type
+        if node in selected_red_node:
+            node_color = 'rgba(139, 0, 0, 0.7)'  # Hacker
+        elif node in selected_green_node:
+            node_color = 'rgba(173, 255, 47, 0.7)'  # Victim
+        elif node in predicted_hijacked:
+            node_color = 'rgba(250, 128, 114, 0.7)'  # Predicted to route to the hacker
+        else:
+            node_color = 'rgba(135, 206, 235, 0.7)'  # Default color
+
+        # Determine border color for Collector nodes
+        border_color = 'rgba(0, 0, 0, 0.3)' if node in selected_blackCircle_nodes else 'rgba(211, 211, 211, 0.5)'
+
+        # Determine shape based on RPKI selection
+        node_shape = 'square' if node in selected_square_nodes else 'circle'
+        return node_color, border_color, node_shape
+
+    # Function to create the Dash figure for the graph
+    def create_figure(selected_square_nodes=None, selected_blackCircle_nodes=None, 
+                      selected_red_node=None, selected_green_node=None, 
+                      predicted_hijacked=frozenset(), xaxis_range=None, yaxis_range=None, expanded=()):
+        """
+        Create the figure for the AS topology graph with visual elements for different node types.
+
+        :param selected_square_nodes: List of nodes selected as RPKI.
+        :param selected_blackCircle_nodes: List of nodes selected as Collectors.
+        :param selected_red_node: List of nodes selected as Hackers.
+        :param selected_green_node: List of nodes selected as Victims.
+        :param predicted_hijacked: Set of the nodes predicted to route to the hacker.
+        :param xaxis_range: Range for the x-axis in the graph.
+        :param yaxis_range: Range for the y-axis in the graph.
+        :param expanded: List of the expanded ASes of a clustered cone.
+        :return: A Plotly figure object.
+        """
+        view, edge_traces, edge_annotations, _ = graph_view(tuple(expanded))
+        traceRecode = list(edge_traces)  # Contains edge traces, node traces, and legend elements
 
         # Create legend elements for node types
         not_rpki_trace = go.Scatter(
@@ -192,56 +294,52 @@ def run_dash_app(as_data, start_configuration):
             name='Victim',
             showlegend=True
         )
+        predicted_trace = go.Scatter(
+            x=[None],
+            y=[None],
+            mode='markers',
+            marker=dict(
+                size=20,
+                color='rgba(250, 128, 114, 0.7)',
+                line=dict(width=2, color='rgba(250, 128, 114, 0.7)'),
+                symbol='circle'
+            ),
+            name=f'Predicted hijacked ({len(predicted_hijacked)})',
+            showlegend=True
+        )
         # Add legend traces
         traceRecode.append(not_rpki_trace)
         traceRecode.append(rpki_trace)
         traceRecode.append(collector_trace)
         traceRecode.append(hacker_trace)
         traceRecode.append(victim_trace)
+        traceRecode.append(predicted_trace)
         # Create node traces with colors, shapes, and text labels
-        node_trace = go.Scatter(
-            x=[],
-            y=[],
+        selections = (set(selected_square_nodes), set(selected_blackCircle_nodes), set(selected_red_node),
+                      set(selected_green_node), predicted_hijacked)
+        nodes = list(view.graph.nodes())
+        styles = [node_style(node, *selections) for node in nodes]
+        # Aggregates are labelled with the size of their sub-cone and its predicted hijacked fraction
+        hijacked_counts = view.member_counts(predicted_hijacked)
+        labels = [view.label(node, hijacked_counts[node] or None) for node in nodes]
+        node_trace = Scatter(
+            x=[view.graph.nodes[node]['pos'][0] for node in nodes],
+            y=[view.graph.nodes[node]['pos'][1] for node in nodes],
             mode='markers+text',  # Add 'text' to include labels
             hoverinfo="text",
             marker={
-                'size': 40,
-                'color': [],  # Fill colors
-                'line': {'width': 4, 'color': []},  # Border colors
-                'symbol': [] # Circle or square
+                'size': view.marker_sizes(),  # Larger for aggregates of larger sub-cones
+                'color': [style[0] for style in styles],  # Fill colors
+                'line': {'width': 4, 'color': [style[1] for style in styles]},  # Border colors
+                'symbol': [style[2] for style in styles] # Circle or square
             },
-            text=[],  # Add the node names as text for labels
+            text=[label[0] for label in labels],  # Add the node names as text for labels
             textposition='middle center',  # Position text in the center of the nodes
-            hovertext=[],  # Add hovertext for clickData
+            hovertext=[label[1] for label in labels],
+            customdata=nodes,  # Add the node names for clickData
             showlegend=False
         )
 
-        for node in G.nodes():
-            x, y = G.nodes[node]['pos']
-            node_trace['x'] += tuple([x])
-            node_trace['y'] += tuple([y])
-            node_trace['text'] += tuple([node])  # Node name as label
-            node_trace['hovertext'] += tuple([node])  # Node name for hover text
-
-            # Determine the fill color based on node type
-            if node in selected_red_node:
-                node_color = 'rgba(139, 0, 0, 0.7)'  # Hacker
-            elif node in selected_green_node:
-                node_color = 'rgba(173, 255, 47, 0.7)'  # Victim
-            else:
-                node_color = 'rgba(135, 206, 235, 0.7)'  # Default color
-
-            # Determine shape based on RPKI selection
-            node_shape = 'square' if node in selected_square_nodes else 'circle'
-
-            # Determine border color for Collector nodes
-            border_color = 'rgba(0, 0, 0, 0.3)' if node in selected_blackCircle_nodes else 'rgba(211, 211, 211, 0.5)'
-
-            # Add color, border, and shape to node markers
-            node_trace['marker']['color'] += tuple([node_color])
-            node_trace['marker']['line']['color'] += tuple([border_color])
-            node_trace['marker']['symbol'] += tuple([node_shape])
-
         traceRecode.append(node_trace)
 
         # Set axis ranges if not provided
@@ -270,24 +368,44 @@ def run_dash_app(as_data, start_configuration):
                 margin={'b': 0, 'l': 0, 'r': 0, 't': 0},
                 xaxis={'showgrid': False, 'zeroline': False, 'showticklabels': False, 'range': xaxis_range},
                 yaxis={'showgrid': False, 'zeroline': False, 'showticklabels': False, 'range': yaxis_range},
-                annotations=[
-                    dict(
-                        ax=(G.nodes[edge[1]]['pos'][0] + G.nodes[edge[0]]['pos'][0]) / 2,
-                        ay=(G.nodes[edge[1]]['pos'][1] + G.nodes[edge[0]]['pos'][1]) / 2, axref='x', ayref='y',
-                        x=(G.nodes[edge[0]]['pos'][0] * 3 + G.nodes[edge[1]]['pos'][0]) / 4,
-                        y=(G.nodes[edge[0]]['pos'][1] * 3 + G.nodes[edge[1]]['pos'][1]) / 4, xref='x', yref='y',
-                        showarrow=True,
-                        arrowhead=3,
-                        arrowsize=3,
-                        arrowwidth=0.8,
-                        arrowcolor=edge_colors[G.edges[edge]['relation']],
-                        opacity=1
-                    ) for edge in G.edges
-                ]
+                annotations=edge_annotations
             )
         }
         return figure
 
+    def patch_figure(changed_nodes, selected_square_nodes, selected_blackCircle_nodes, selected_red_node,
+                     selected_green_node, predicted_hijacked, expanded=()):
+        """
+        Build a partial update of the figure with the markers of the changed nodes only.
+
+        :param changed_nodes: Nodes whose marker may have changed.
+        :param selected_square_nodes: List of nodes selected as RPKI.
+        :param selected_blackCircle_nodes: List of nodes selected as Collectors.
+        :param selected_red_node: List of nodes selected as Hackers.
+        :param selected_green_node: List of nodes selected as Victims.
+        :param predicted_hijacked: Set of the nodes predicted to route to the hacker.
+        :param expanded: List of the expanded ASes of a clustered cone.
+        :return: Dash Patch of the figure.
+        """
+        view, _, _, node_index = graph_view(tuple(expanded))
+        selections = (set(selected_square_nodes), set(selected_blackCircle_nodes), set(selected_red_node),
+                      set(selected_green_node), predicted_hijacked)
+        hijacked_counts = view.member_counts(predicted_hijacked)
+        patched_figure = Patch()
+        node_patch = patched_figure["data"][NODE_TRACE]
+        marker = node_patch["marker"]
+        # A hidden AS changes the label of the aggregate standing for it
+        for node in {view.representative[node] for node in changed_nodes if node in view.representative}:
+            node_color, border_color, node_shape = node_style(node, *selections)
+            marker["color"][node_index[node]] = node_color
+            marker["line"]["color"][node_index[node]] = border_color
+            marker["symbol"][node_index[node]] = node_shape
+            if view.is_aggregate(node):
+                text, hovertext = view.label(node, hijacked_counts[node] or None)
+                node_patch["text"][node_index[node]] = text
+                node_patch["hovertext"][node_index[node]] = hovertext
+        patched_figure["data"][PREDICTED_TRACE]["name"] = f'Predicted hijacked ({len(predicted_hijacked)})'
+        return patched_figure
 
     def shutdown_server():
         """
@@ -297,6 +415,13 @@ def run_dash_app(as_data, start_configuration):
         shutdown_event.set()
         os.kill(os.getpid(), signal.SIGTERM)
 
+    # The full figure is built only once; every click then patches the markers of the changed nodes
+    start_predicted = predict_hijacked(start_configuration["rpki_nodes"], start_configuration["hacker_node"],
+                                       start_configuration["victim_node"])
+    start_figure = create_figure(start_configuration["rpki_nodes"], start_configuration["collector_nodes"],
+                                 start_configuration["hacker_node"], start_configuration["victim_node"], start_predicted,
+                                 expanded=start_expanded)
+
     # Initialize the Dash app
     app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
 
@@ -310,17 +435,17 @@ def run_dash_app(as_data, start_configuration):
             html.Button("RESET", id="reset-button", n_clicks=0, style={"background-color": "lightgrey", "margin-right": "15px"}),
             html.Button("SAVE", id="save-button", n_clicks=0, style={"background-color": "lightgrey"})
         ], style={"margin-bottom": "20px"}),
-        dcc.Graph(id="graph", config={"scrollZoom": True}, clear_on_unhover=True),
+        dcc.Graph(id="graph", figure=start_figure, config={"scrollZoom": True}, clear_on_unhover=True),
         dcc.Store(id="square-nodes-store", data=start_configuration["rpki_nodes"]),
         dcc.Store(id="blackCircle-nodes-store", data=start_configuration["collector_nodes"]),
         dcc.Store(id="hacker-node-store", data=start_configuration["hacker_node"]),
         dcc.Store(id="victim-node-store", data=start_configuration["victim_node"]),
+        dcc.Store(id="predicted-nodes-store", data=sorted(start_predicted)),
+        dcc.Store(id="expanded-nodes-store", data=start_expanded),
         dcc.Store(id="rpki-mode", data=False),
         dcc.Store(id="collector-mode", data=False),
         dcc.Store(id="hacker-mode", data=False),
         dcc.Store(id="victim-mode", data=False),
-        dcc.Store(id="xaxis-range", data=None),
-        dcc.Store(id="yaxis-range", data=None),
 
         # Modal for error message when saving without valid selections
         dbc.Modal(
@@ -363,8 +488,30 @@ def run_dash_app(as_data, start_configuration):
         ),
     ])
 
-    # Callback for toggling modes (RPKI, Collector, Hacker, Victim)
-    @app.callback(
+    # Callback for toggling modes (RPKI, Collector, Hacker, Victim), run in the browser without a server round-trip
+    app.clientside_callback(
+        """
+        function(rpki_clicks, collector_clicks, hacker_clicks, victim_clicks, reset_clicks,
+                 rpki_mode, collector_mode, hacker_mode, victim_mode) {
+            // Identify the button that triggered the callback (none on the initial call and on RESET)
+            const triggered = dash_clientside.callback_context.triggered;
+            const button_id = triggered.length ? triggered[0].prop_id.split(".")[0] : "";
+            const modes = [
+                ["rpki-button", rpki_mode],
+                ["collector-button", collector_mode],
+                ["hacker-button", hacker_mode],
+                ["victim-button", victim_mode]
+            ];
+
+            // Activate the mode of the clicked button (or deactivate it if it was active) and reset the others
+            const result = [];
+            for (const [id, mode] of modes) {
+                const active = button_id === id && !mode;
+                result.push({"background-color": active ? "lightblue" : "white", "margin-right": "15px"}, active);
+            }
+            return result;
+        }
+        """,
         [
             Output("rpki-button", "style"),
             Output("rpki-mode", "data"),
@@ -389,48 +536,6 @@ def run_dash_app(as_data, start_configuration):
             State("victim-mode", "data"),
         ]
     )
-    def toggle_modes(rpki_clicks, collector_clicks, hacker_clicks, victim_clicks, reset_clicks, rpki_mode, collector_mode, hacker_mode, victim_mode):
-        """
-        Handle button clicks to toggle modes (RPKI, Collector, Hacker, Victim).
-        
-        :param rpki_clicks: Number of clicks on the RPKI button.
-        :param collector_clicks: Number of clicks on the Collector button.
-        :param hacker_clicks: Number of clicks on the Hacker button.
-        :param victim_clicks: Number of clicks on the Victim button.
-        :param reset_clicks: Number of clicks on the Reset button.
-        :param rpki_mode: Current state of RPKI mode.
-        :param collector_mode: Current state of Collector mode.
-        :param hacker_mode: Current state of Hacker mode.
-        :param victim_mode: Current state of Victim mode.
-        :return: Updated button styles and mode states.
-        """
-        ctx = dash.callback_context
-
-        # Reset all modes and button styles when RESET is clicked
-        if not ctx.triggered or ctx.triggered[0]["prop_id"] == "reset-button.n_clicks":
-            return (
-                {"background-color": "white", "margin-right": "15px"}, False,
-                {"background-color": "white", "margin-right": "15px"}, False,
-                {"background-color": "white", "margin-right": "15px"}, False,
-                {"background-color": "white", "margin-right": "15px"}, False,
-            )
-
-        # Identify the button that triggered the callback
-        button_id = ctx.triggered[0]["prop_id"].split(".")[0]
-
-        # Determine which mode to activate or deactivate
-        rpki_active = button_id == "rpki-button" and not rpki_mode
-        collector_active = button_id == "collector-button" and not collector_mode
-        hacker_active = button_id == "hacker-button" and not hacker_mode
-        victim_active = button_id == "victim-button" and not victim_mode
-
-        # Update button styles and mode states
-        return (
-            {"background-color": "lightblue" if rpki_active else "white", "margin-right": "15px"}, rpki_active,
-            {"background-color": "lightblue" if collector_active else "white", "margin-right": "15px"}, collector_active,
-            {"background-color": "lightblue" if hacker_active else "white", "margin-right": "15px"}, hacker_active,
-            {"background-color": "lightblue" if victim_active else "white", "margin-right": "15px"}, victim_active,
-        )
 
 
     # Callback to update graph on node click or reset
@@ -441,6 +546,8 @@ def run_dash_app(as_data, start_configuration):
             Output("blackCircle-nodes-store", "data"),
             Output("hacker-node-store", "data"),
             Output("victim-node-store", "data"),
+            Output("predicted-nodes-store", "data"),
+            Output("expanded-nodes-store", "data"),
         ],
         [
             Input("graph", "clickData"),
@@ -451,20 +558,25 @@ def run_dash_app(as_data, start_configuration):
             State("blackCircle-nodes-store", "data"),
             State("hacker-node-store", "data"),
             State("victim-node-store", "data"),
+            State("predicted-nodes-store", "data"),
+            State("expanded-nodes-store", "data"),
             State("rpki-mode", "data"),
             State("collector-mode", "data"),
             State("hacker-mode", "data"),
             State("victim-mode", "data"),
-            State("xaxis-range", "data"),
-            State("yaxis-range", "data"),
-        ]
+        ],
+        prevent_initial_call=True
     )
     def update_graph(
-        clickData, reset_clicks, square_nodes, blackCircle_nodes, hacker_node, victim_node,
-        rpki_mode, collector_mode, hacker_mode, victim_mode, xaxis_range, yaxis_range
+        clickData, reset_clicks, square_nodes, blackCircle_nodes, hacker_node, victim_node, predicted_nodes,
+        expanded_nodes, rpki_mode, collector_mode, hacker_mode, victim_mode
     ):
         """
         Update the graph based on user interactions such as node clicks or reset button clicks.
+
+        Only the markers of the nodes whose selection or predicted outcome changed are sent to the
+        browser, so the cost of a click does not depend on the size of the graph. On a clustered
+        cone, a click with no active mode expands an aggregate node or collapses an expanded one.
         
         :param clickData: Data about the node clicked on the graph.
         :param reset_clicks: Number of clicks on the Reset button.
@@ -472,27 +584,44 @@ def run_dash_app(as_data, start_configuration):
         :param blackCircle_nodes: List of nodes marked as Collector nodes.
         :param hacker_node: Node selected as Hacker.
         :param victim_node: Node selected as Victim.
+        :param predicted_nodes: Nodes currently shown as predicted hijacked.
+        :param expanded_nodes: Expanded ASes of a clustered cone.
         :param rpki_mode: Whether RPKI mode is active.
         :param collector_mode: Whether Collector mode is active.
         :param hacker_mode: Whether Hacker mode is active.
         :param victim_mode: Whether Victim mode is active.
-        :param xaxis_range: Current x-axis range of the graph.
-        :param yaxis_range: Current y-axis range of the graph.
-        :return: Updated graph figure and node lists.
+        :return: Patch of the graph figure and updated node lists.
         """
         ctx = dash.callback_context
+        previous_predicted = set(predicted_nodes)
         if ctx.triggered and ctx.triggered[0]["prop_id"] == "reset-button.n_clicks":
-            # Reset zoom as well when resetting nodes
             print("Reset clicked. Square nodes (RPKI): [], BlackCircle nodes (Collector): [], Red nodes (Hacker): [], Green nodes (Victim): []")
-            return create_figure([], [], [], [], xaxis_range, yaxis_range), [], [], [], []
+            # Every node drawn with a non-default marker goes back to the default one
+            changed_nodes = set(square_nodes) | set(blackCircle_nodes) | set(hacker_node) | set(victim_node) | previous_predicted
+            return patch_figure(changed_nodes, [], [], [], [], set(), expanded_nodes), [], [], [], [], [], expanded_nodes
 
-        # If no clickData or invalid clickData, just return the same figure with updated zoom
-        if not clickData or "points" not in clickData or "text" not in clickData["points"][0] or clickData["points"][0]["text"] not in G.nodes():
+        # If no clickData or invalid clickData, leave the figure unchanged
+        if not clickData or "points" not in clickData or clickData["points"][0].get("customdata") not in G.nodes():
             print(f"Updated Zoom. Square nodes (RPKI): {square_nodes}, BlackCircle nodes (Collector): {blackCircle_nodes},"
                   f" Red node (Hacker): {hacker_node}, Green node (Victim): {victim_node}")
-            return create_figure(square_nodes, blackCircle_nodes, hacker_node, victim_node, xaxis_range, yaxis_range), square_nodes, blackCircle_nodes, hacker_node, victim_node
-
-        clicked_node = clickData["points"][0]["text"]
+            return dash.no_update, square_nodes, blackCircle_nodes, hacker_node, victim_node, predicted_nodes, expanded_nodes
+
+        clicked_node = clickData["points"][0]["customdata"]
+
+        # No active mode on a clustered cone: expand the clicked aggregate, or collapse the clicked sub-cone
+        if clustering is not None and not (hacker_mode or victim_mode or rpki_mode or collector_mode):
+            new_expanded = expanded_nodes
+            if graph_view(tuple(expanded_nodes))[0].is_aggregate(clicked_node):
+                new_expanded = clustering.expand(expanded_nodes, clicked_node)
+            if new_expanded == expanded_nodes:
+                new_expanded = clustering.collapse(expanded_nodes, clicked_node)
+            if new_expanded == expanded_nodes:
+                return dash.no_update, square_nodes, blackCircle_nodes, hacker_node, victim_node, predicted_nodes, expanded_nodes
+            print(f"View of AS{clicked_node} changed: {len(clustering.visible_nodes(new_expanded))} of {len(as_data)} ASes shown")
+            return (create_figure(square_nodes, blackCircle_nodes, hacker_node, victim_node, previous_predicted,
+                                  expanded=new_expanded),
+                    square_nodes, blackCircle_nodes, hacker_node, victim_node, predicted_nodes, new_expanded)
+        changed_nodes = {clicked_node} | set(hacker_node) | set(victim_node)
 
         # Hacker mode: only one node can be selected
         if hacker_mode:
@@ -500,56 +629,35 @@ def run_dash_app(as_data, start_configuration):
                 hacker_node.remove(clicked_node)  # Deselect node
             else:
                 hacker_node = [clicked_node]  # Replace with new Hacker node
-            return create_figure(square_nodes, blackCircle_nodes, hacker_node, victim_node, xaxis_range, yaxis_range), square_nodes, blackCircle_nodes, hacker_node, victim_node
 
         # Victim mode: only one node can be selected
-        if victim_mode:
+        elif victim_mode:
             if clicked_node in victim_node:
                 victim_node.remove(clicked_node)  # Deseleziona il nodo
             else:
                 victim_node = [clicked_node]  # Sostituisci con il nuovo nodo VICTIM
-            return create_figure(square_nodes, blackCircle_nodes, hacker_node, victim_node, xaxis_range, yaxis_range), square_nodes, blackCircle_nodes, hacker_node, victim_node
         
         # RPKI mode: multiple nodes can be selected
-        if rpki_mode:
+        elif rpki_mode:
             if clicked_node in square_nodes:
                 square_nodes.remove(clicked_node)
             else:
                 square_nodes.append(clicked_node)
 
         # Collector mode: multiple nodes can be selected
-        if collector_mode:
+        elif collector_mode:
             if clicked_node in blackCircle_nodes:
                 blackCircle_nodes.remove(clicked_node)
             else:
                 blackCircle_nodes.append(clicked_node)
 
-        # Preserve zoom and update the graph
-        print(f"Updated node selections - RPKI: {square_nodes}, Collector: {blackCircle_nodes}, Hacker: {hacker_node}, Victim: {victim_node}")
-        return create_figure(square_nodes, blackCircle_nodes, hacker_node, victim_node, xaxis_range, yaxis_range), square_nodes, blackCircle_nodes, hacker_node, victim_node
+        # Recompute the prediction and redraw only the nodes whose predicted outcome changed
+        predicted = predict_hijacked(square_nodes, hacker_node, victim_node)
+        changed_nodes |= previous_predicted ^ predicted
 
-    
-    # Callback to handle zoom adjustments
-    @app.callback(
-        [Output("xaxis-range", "data"),
-        Output("yaxis-range", "data")],
-        [Input("graph", "relayoutData")],
-        [State("xaxis-range", "data"),
-        State("yaxis-range", "data")]
-    )
-    def update_zoom(relayoutData, xaxis_range, yaxis_range):
-        """
-        Update the graph's zoom level based on user interactions.
-        
-        :param relayoutData: Data from user zoom interactions.
-        :param xaxis_range: Current x-axis range.
-        :param yaxis_range: Current y-axis range.
-        :return: Updated x-axis and y-axis ranges.
-        """
-        if relayoutData and "xaxis.range[0]" in relayoutData:
-            xaxis_range = [relayoutData["xaxis.range[0]"], relayoutData["xaxis.range[1]"]]
-            yaxis_range = [relayoutData["yaxis.range[0]"], relayoutData["yaxis.range[1]"]]
-        return xaxis_range, yaxis_range
+        print(f"Updated node selections - RPKI: {square_nodes}, Collector: {blackCircle_nodes}, Hacker: {hacker_node}, Victim: {victim_node}")
+        return (patch_figure(changed_nodes, square_nodes, blackCircle_nodes, hacker_node, victim_node, predicted, expanded_nodes),
+                square_nodes, blackCircle_nodes, hacker_node, victim_node, sorted(predicted), expanded_nodes)
 
     # Callback to handle save functionality
     @app.callback(
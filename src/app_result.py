@@ -2,16 +2,23 @@ import dash
 from dash import Dash, dcc, html, Input, Output, State
 import plotly.graph_objects as go
 import networkx as nx
+import layout_cache
+import graph_rendering
+import cone_clustering
+import functools
 import threading
 
 # Main function to run the Dash app
-def run_dash_app(as_data, results, saved_nodes):
+def run_dash_app(as_data, results, saved_nodes, webgl_edge_threshold=graph_rendering.DEFAULT_WEBGL_EDGE_THRESHOLD,
+                 clustering_options=None):
     """
     Launch the Dash app to visualize the AS topology and attack impact.
 
     :param as_data: Dictionary containing AS topology data.
     :param results: Results of the attack analysis (red/green nodes and edges).
     :param saved_nodes: Saved node configurations for RPKI, Collectors, Hacker, and Victim.
+    :param webgl_edge_threshold: Number of edges above which the graph is drawn with WebGL.
+    :param clustering_options: Keyword arguments of cone_clustering.build_clustering (None for the defaults).
     """
     start_as = list(as_data.keys())[0]  # Start from the root AS
 
@@ -24,7 +31,13 @@ def run_dash_app(as_data, results, saved_nodes):
         """
         G = nx.DiGraph()
 
+        visited = set()  # Multi-homed ASes are reached once per provider, their sub-cone is walked only once
+
         def add_to_graph(node):
+            if node in visited:
+                return
+            visited.add(node)
+
             # Add child nodes (customer-to-provider relationship)
             for child in as_data[node].get("p2c", []):
                 G.add_edge(node, child, relation="c2p", color=None)
@@ -41,14 +54,35 @@ def run_dash_app(as_data, results, saved_nodes):
 
     G = build_graph_from_topology(as_data)  # Build the graph
 
-    # Use Graphviz layout to position the nodes in a tree structure
-    pos = nx.nx_agraph.graphviz_layout(G, prog="dot", root=start_as)
+    # Use Graphviz layout to position the nodes in a tree structure (cached, so the same cone is laid out only once)
+    pos = layout_cache.graph_layout(G, start_as)
 
     # Assign calculated positions to each node in the graph
     for node in G.nodes:
         x, y = pos[node]
         G.nodes[node]['pos'] = (x, y)
 
+    # Large cones are drawn with WebGL traces, with the edge directions as markers instead of annotations
+    webgl = graph_rendering.use_webgl(G, webgl_edge_threshold)
+    Scatter = graph_rendering.scatter_class(webgl)
+
+    # Huge cones are shown by level of detail: collapsed sub-cones are drawn as single aggregate nodes
+    clustering = cone_clustering.build_clustering(as_data, **(clustering_options or {}))
+
+    @functools.lru_cache(maxsize=8)
+    def graph_view(expanded):
+        """
+        Build the view of the graph with the given sub-cones expanded.
+
+        :param expanded: Tuple of the expanded ASes (ignored if the cone is not clustered).
+        :return: ClusterView of the shown ASes.
+        """
+        return cone_clustering.ClusterView(G) if clustering is None else clustering.view(G, list(expanded))
+
+    # Starting view, with the hacker and the victim shown
+    start_expanded = [] if clustering is None else clustering.initial_expanded(
+        reveal=saved_nodes["hacker_node"][:1] + saved_nodes["victim_node"][:1])
+
     traceRecode = []  # List to hold all graph traces (nodes and edges)
 
     # Define edge colors for different relationship types
@@ -61,7 +95,7 @@ def run_dash_app(as_data, results, saved_nodes):
     # Function to create the figure (visualization of the graph)
     def create_figure(selected_square_nodes=None, selected_blackCircle_nodes=None, selected_red_node=None, 
                       selected_green_node=None, red_nodes=None, green_nodes=None, red_edges=None, 
-                      green_edges=None, xaxis_range=None, yaxis_range=None):
+                      green_edges=None, xaxis_range=None, yaxis_range=None, expanded=()):
         """
         Generate the Plotly figure for the AS topology visualization.
 
@@ -75,9 +109,12 @@ def run_dash_app(as_data, results, saved_nodes):
         :param green_edges: Edges unaffected by the attack.
         :param xaxis_range: X-axis range for zoom.
         :param yaxis_range: Y-axis range for zoom.
+        :param expanded: List of the expanded ASes of a clustered cone.
         :return: A Plotly figure.
         """
         traceRecode = []  # Reset trace list for each figure update
+        view = graph_view(tuple(expanded))
+        graph = view.graph
 
         # Initialize lists to store edge coordinates based on types
         p2p_edges_x = []
@@ -90,40 +127,50 @@ def run_dash_app(as_data, results, saved_nodes):
         green_edges_y = []
         red_green_edges_x = []
         red_green_edges_y = []
+        edge_arrow_colors = []  # (edge, arrow color) of every edge
+
+        # Sets of the edges between shown ASes in both directions, for constant-time lookups
+        red_edges = {edge for edge in map(view.edge, red_edges) if edge}
+        green_edges = {edge for edge in map(view.edge, green_edges) if edge}
+        red_edge_set = red_edges | {"->".join(reversed(edge.split("->"))) for edge in red_edges}
+        green_edge_set = green_edges | {"->".join(reversed(edge.split("->"))) for edge in green_edges}
 
         # Iterate over edges in the graph to classify and collect coordinates
-        for edge in G.edges:
-            x0, y0 = G.nodes[edge[1]]['pos']
-            x1, y1 = G.nodes[edge[0]]['pos']
+        for edge in graph.edges:
+            x0, y0 = graph.nodes[edge[1]]['pos']
+            x1, y1 = graph.nodes[edge[0]]['pos']
             edge_str = f"{edge[0]}->{edge[1]}"
-            edge_str_rev = f"{edge[1]}->{edge[0]}"
-            relation = G.edges[edge]['relation']
+            relation = graph.edges[edge]['relation']
             
-            if (edge_str in red_edges or edge_str_rev in red_edges) and (edge_str in green_edges or edge_str_rev in green_edges):
+            if edge_str in red_edge_set and edge_str in green_edge_set:
                 red_green_edges_x.extend([x0, x1, None])
                 red_green_edges_y.extend([y0, y1, None])
-                continue
+                arrowcolor = 'rgba(255, 255, 0, 0.5)'
 
-            elif edge_str in red_edges or edge_str_rev in red_edges:
+            elif edge_str in red_edge_set:
                 red_edges_x.extend([x0, x1, None])
                 red_edges_y.extend([y0, y1, None])
-                continue
+                arrowcolor = 'rgba(255, 99, 71, 0.5)'
 
-            elif edge_str in green_edges or edge_str_rev in green_edges:
+            elif edge_str in green_edge_set:
                 green_edges_x.extend([x0, x1, None])
                 green_edges_y.extend([y0, y1, None])
-                continue
+                arrowcolor = 'rgba(0, 128, 0, 0.5)'
 
             elif relation == 'p2p':
                 p2p_edges_x.extend([x0, x1, None])
                 p2p_edges_y.extend([y0, y1, None])
+                arrowcolor = 'rgba(105, 105, 105, 0.5)'
 
-            elif relation in ['c2p', 'p2c']:
+            else:
                 c2p_edges_x.extend([x0, x1, None])
                 c2p_edges_y.extend([y0, y1, None])
+                arrowcolor = 'rgba(211, 211, 211, 0.5)'
+
+            edge_arrow_colors.append((edge, arrowcolor))
 
         # Append traces for each edge type
-        p2p_trace = go.Scatter(
+        p2p_trace = Scatter(
             x=p2p_edges_x,
             y=p2p_edges_y,
             mode='lines',
@@ -135,7 +182,7 @@ def run_dash_app(as_data, results, saved_nodes):
         )
         traceRecode.append(p2p_trace)
 
-        c2p_trace = go.Scatter(
+        c2p_trace = Scatter(
             x=c2p_edges_x,
             y=c2p_edges_y,
             mode='lines',
@@ -147,7 +194,7 @@ def run_dash_app(as_data, results, saved_nodes):
         )
         traceRecode.append(c2p_trace)
 
-        red_edge_trace = go.Scatter(
+        red_edge_trace = Scatter(
             x=red_edges_x,
             y=red_edges_y,
             mode='lines',
@@ -159,7 +206,7 @@ def run_dash_app(as_data, results, saved_nodes):
         )
         traceRecode.append(red_edge_trace)
         
-        green_edge_trace = go.Scatter(
+        green_edge_trace = Scatter(
             x=green_edges_x,
             y=green_edges_y,
             mode='lines',
@@ -171,7 +218,7 @@ def run_dash_app(as_data, results, saved_nodes):
         )
         traceRecode.append(green_edge_trace)
 
-        red_green_edge_trace = go.Scatter(
+        red_green_edge_trace = Scatter(
             x=red_green_edges_x,
             y=red_green_edges_y,
             mode='lines',
@@ -289,38 +336,23 @@ def run_dash_app(as_data, results, saved_nodes):
         traceRecode.append(as_hijacked_trace)
         traceRecode.append(as_not_affected_trace)
 
-        # Create node traces
-        node_trace = go.Scatter(
-            x=[],
-            y=[],
-            mode='markers+text',  # Add 'text' to include labels
-            hoverinfo="text",
-            marker={
-                'size': 40,
-                'color': [],  # Fill colors
-                'line': {'width': 4, 'color': []},  # Border colors
-                'symbol': [] # Circle or square
-            },
-            text=[],  # Add the node names as text for labels
-            textposition='middle center',  # Position text in the center of the nodes
-            hovertext=[],  # Add hovertext for clickData
-            showlegend=False
-        )
+        # Sets of the node selections, for constant-time lookups
+        red_node_set, green_node_set = set(red_nodes), set(green_nodes)
+        square_node_set, blackCircle_node_set = set(selected_square_nodes), set(selected_blackCircle_nodes)
 
-        for node in G.nodes():
-            x, y = G.nodes[node]['pos']
-            node_trace['x'] += tuple([x])
-            node_trace['y'] += tuple([y])
-            node_trace['text'] += tuple([node])  # Use node names as text labels
-            node_trace['hovertext'] += tuple([node])  # Use node names for hovertext
+        # Aggregates are labelled with the size of their sub-cone and its hijacked fraction
+        hijacked_counts = view.member_counts(red_node_set - {selected_red_node})
 
+        nodes = list(graph.nodes())
+        node_colors, border_colors, node_shapes, labels = [], [], [], []
+        for node in nodes:
             # Determine color (red for HACKER, green VICTIM)
-            if node in red_nodes:
+            if node in red_node_set:
                 if node == selected_red_node:
                     node_color = 'rgba(139, 0, 0, 0.7)'
                 else:
                     node_color = 'rgba(255, 99, 71, 0.7)'  # HACKER node
-            elif node in green_nodes:
+            elif node in green_node_set:
                 if node == selected_green_node:
                     node_color = 'rgba(173, 255, 47, 0.7)'
                 else:
@@ -329,20 +361,40 @@ def run_dash_app(as_data, results, saved_nodes):
                 node_color = 'rgba(135, 206, 235, 0.7)'
 
             # Determine color/shape inside node(square if RPKI mode)
-            if node in selected_square_nodes:
+            if node in square_node_set:
                 node_shape = 'square' # change shape to square for RPKI
             else:
                 node_shape = 'circle'
 
             # Determine node border color (black if collector mode)
-            if node in selected_blackCircle_nodes:
+            if node in blackCircle_node_set:
                 border_color = 'rgba(0, 0, 0, 0.3)'
             else:
                 border_color = 'rgba(211, 211, 211, 0.5)'
 
-            node_trace['marker']['color'] += tuple([node_color])
-            node_trace['marker']['line']['color'] += tuple([border_color])
-            node_trace['marker']['symbol'] += tuple([node_shape])
+            node_colors.append(node_color)
+            border_colors.append(border_color)
+            node_shapes.append(node_shape)
+            labels.append(view.label(node, hijacked_counts[node]))
+
+        # Create node traces
+        node_trace = Scatter(
+            x=[graph.nodes[node]['pos'][0] for node in nodes],
+            y=[graph.nodes[node]['pos'][1] for node in nodes],
+            mode='markers+text',  # Add 'text' to include labels
+            hoverinfo="text",
+            marker={
+                'size': view.marker_sizes(),  # Larger for aggregates of larger sub-cones
+                'color': node_colors,  # Fill colors
+                'line': {'width': 4, 'color': border_colors},  # Border colors
+                'symbol': node_shapes # Circle or square
+            },
+            text=[label[0] for label in labels],  # Use node names as text labels
+            textposition='middle center',  # Position text in the center of the nodes
+            hovertext=[label[1] for label in labels],
+            customdata=nodes,  # Use node names for clickData
+            showlegend=False
+        )
 
         traceRecode.append(node_trace)
 
@@ -352,44 +404,9 @@ def run_dash_app(as_data, results, saved_nodes):
         yaxis_range = yaxis_range or [min([pos[1] for pos in nx.get_node_attributes(G, 'pos').values()]),
                                     max([pos[1] for pos in nx.get_node_attributes(G, 'pos').values()])]
         
-        annotations = []
-        
-        for edge in G.edges:
-            # Calculate edge coordinate
-            ax = (G.nodes[edge[1]]['pos'][0] + G.nodes[edge[0]]['pos'][0]) / 2
-            ay = (G.nodes[edge[1]]['pos'][1] + G.nodes[edge[0]]['pos'][1]) / 2
-            x = (G.nodes[edge[0]]['pos'][0] * 3 + G.nodes[edge[1]]['pos'][0]) / 4
-            y = (G.nodes[edge[0]]['pos'][1] * 3 + G.nodes[edge[1]]['pos'][1]) / 4
-
-            # Determine arrow color
-            edge_str = f"{edge[0]}->{edge[1]}"
-            edge_str_rev = f"{edge[1]}->{edge[0]}"
-
-            if (edge_str in red_edges or edge_str_rev in red_edges) and (edge_str in green_edges or edge_str_rev in green_edges):
-                arrowcolor = 'rgba(255, 255, 0, 0.5)'
-
-            elif (edge_str in red_edges or edge_str_rev in red_edges):
-                arrowcolor = 'rgba(255, 99, 71, 0.5)'
-
-            elif (edge_str in green_edges or edge_str_rev in green_edges):
-                arrowcolor = 'rgba(0, 128, 0, 0.5)'
-
-            elif G.edges[edge]['relation'] == 'p2p':
-                arrowcolor = 'rgba(105, 105, 105, 0.5)'
-
-            elif G.edges[edge]['relation'] in ['c2p', 'p2c']:
-                arrowcolor = 'rgba(211, 211, 211, 0.5)'
-
-            annotations.append(dict(
-                ax=ax, ay=ay, axref='x', ayref='y',
-                x=x, y=y, xref='x', yref='y',
-                showarrow=True,
-                arrowhead=3,
-                arrowsize=3,
-                arrowwidth=0.8,
-                arrowcolor=arrowcolor,  # use calculate color
-                opacity=1
-            ))
+        # Arrows for the direction of the edges (markers of a single trace in WebGL mode)
+        arrow_traces, annotations = graph_rendering.edge_arrows(graph, edge_arrow_colors, webgl)
+        traceRecode[5:5] = arrow_traces  # Drawn over the edges, before the legend elements and the nodes
 
         figure = {
             "data": traceRecode,
@@ -424,7 +441,8 @@ def run_dash_app(as_data, results, saved_nodes):
         dcc.Store(id="victim-node-store", data=saved_nodes["victim_node"][0]),
         dcc.Store(id="xaxis-range", data=None),
         dcc.Store(id="yaxis-range", data=None),
-        dcc.Store(id="results-store", data=results)
+        dcc.Store(id="results-store", data=results),
+        dcc.Store(id="expanded-nodes-store", data=start_expanded)
     ])
 
 
@@ -434,7 +452,8 @@ def run_dash_app(as_data, results, saved_nodes):
         Output("square-nodes-store", "data"),
         Output("blackCircle-nodes-store", "data"),
         Output("hacker-node-store", "data"),
-        Output("victim-node-store", "data")],
+        Output("victim-node-store", "data"),
+        Output("expanded-nodes-store", "data")],
         [Input("graph", "clickData"),
         Input("reset-button", "n_clicks")],
         [State("square-nodes-store", "data"),
@@ -443,13 +462,17 @@ def run_dash_app(as_data, results, saved_nodes):
         State("victim-node-store", "data"),
         State("xaxis-range", "data"),
         State("yaxis-range", "data"),
-        State("results-store", "data")]
+        State("results-store", "data"),
+        State("expanded-nodes-store", "data")]
     )
 
-    def update_graph(clickData, reset_clicks, square_nodes, blackCircle_nodes, hacker_node, victim_node, xaxis_range, yaxis_range, results):
+    def update_graph(clickData, reset_clicks, square_nodes, blackCircle_nodes, hacker_node, victim_node, xaxis_range, yaxis_range, results,
+                     expanded_nodes):
         """
         Update the graph based on user interactions (node clicks or reset).
 
+        On a clustered cone, clicking an aggregate node expands it, and reset restores the starting view.
+
         :param clickData: Data about the clicked node on the graph.
         :param reset_clicks: Number of clicks on the reset button.
         :param square_nodes: List of RPKI-enabled nodes.
@@ -459,6 +482,7 @@ def run_dash_app(as_data, results, saved_nodes):
         :param xaxis_range: X-axis zoom range.
         :param yaxis_range: Y-axis zoom range.
         :param results: Attack analysis results.
+        :param expanded_nodes: Expanded ASes of a clustered cone.
         :return: Updated figure and node data.
         """
         ctx = dash.callback_context  # Get the context of the callback trigger
@@ -469,6 +493,7 @@ def run_dash_app(as_data, results, saved_nodes):
 
         # Check if the reset button was clicked
         if ctx.triggered and ctx.triggered[0]["prop_id"] == "reset-button.n_clicks":
+            expanded_nodes = start_expanded
             return create_figure(
                 selected_square_nodes=square_nodes,
                 selected_blackCircle_nodes=blackCircle_nodes,
@@ -479,11 +504,16 @@ def run_dash_app(as_data, results, saved_nodes):
                 red_edges=results["red_edges"],
                 green_edges=results["green_edges"],
                 xaxis_range=xaxis_range,
-                yaxis_range=yaxis_range
-            ), square_nodes, blackCircle_nodes, hacker_node, victim_node
-
-        # Handle invalid or missing clickData
-        if not clickData or "points" not in clickData or "text" not in clickData["points"][0] or clickData["points"][0]["text"] not in G.nodes():
+                yaxis_range=yaxis_range,
+                expanded=expanded_nodes
+            ), square_nodes, blackCircle_nodes, hacker_node, victim_node, expanded_nodes
+
+        # Handle invalid or missing clickData, and clicks on aggregate nodes (expanded on demand)
+        if (clickData and "points" in clickData and clustering is not None
+                and graph_view(tuple(expanded_nodes)).is_aggregate(clickData["points"][0].get("customdata"))):
+            expanded_nodes = clustering.expand(expanded_nodes, clickData["points"][0]["customdata"])
+            clickData = None
+        if not clickData or "points" not in clickData or clickData["points"][0].get("customdata") not in G.nodes():
             return create_figure(
                 selected_square_nodes=square_nodes,
                 selected_blackCircle_nodes=blackCircle_nodes,
@@ -494,14 +524,15 @@ def run_dash_app(as_data, results, saved_nodes):
                 red_edges=results["red_edges"],
                 green_edges=results["green_edges"],
                 xaxis_range=xaxis_range,
-                yaxis_range=yaxis_range
-            ), square_nodes, blackCircle_nodes, hacker_node, victim_node
+                yaxis_range=yaxis_range,
+                expanded=expanded_nodes
+            ), square_nodes, blackCircle_nodes, hacker_node, victim_node, expanded_nodes
 
         # Handle valid node clicks
         clicked_node = None
         # Check if clickData is valido
-        if clickData and "points" in clickData and "text" in clickData["points"][0]:
-            clicked_node = clickData["points"][0]["text"]
+        if clickData and "points" in clickData and "customdata" in clickData["points"][0]:
+            clicked_node = clickData["points"][0]["customdata"]
 
         # Determine edges to highlight based on the clicked node
         if clicked_node:
@@ -531,8 +562,9 @@ def run_dash_app(as_data, results, saved_nodes):
                 red_edges=red_edges_results,
                 green_edges=green_edges_results,
                 xaxis_range=xaxis_range,
-                yaxis_range=yaxis_range
-            ), square_nodes, blackCircle_nodes, hacker_node, victim_node
+                yaxis_range=yaxis_range,
+                expanded=expanded_nodes
+            ), square_nodes, blackCircle_nodes, hacker_node, victim_node, expanded_nodes
         
         # Print updated store in terminal
         print(f"Square nodes (RPKI): {square_nodes}")
@@ -551,8 +583,9 @@ def run_dash_app(as_data, results, saved_nodes):
             red_edges=results["red_edges"],
             green_edges=results["green_edges"],
             xaxis_range=xaxis_range,
-            yaxis_range=yaxis_range
-        ), square_nodes, blackCircle_nodes, hacker_node, victim_node
+            yaxis_range=yaxis_range,
+            expanded=expanded_nodes
+        ), square_nodes, blackCircle_nodes, hacker_node, victim_node, expanded_nodes
 
     # Callback to handle zoom updates
     @app.callback(
@@ -0,0 +1,73 @@
+import sys
+
+RED = "red"  # Reached by the hacker's announcement
+GREEN = "green"  # Still routed towards the victim
+
+
+def edge_key(node_a, node_b):
+    """
+    Returns the canonical key of an undirected edge, so "a->b" and "b->a" share the same key.
+
+    :param node_a: First AS of the edge.
+    :param node_b: Second AS of the edge.
+    :return: Tuple with the two ASes in a fixed order.
+    """
+    return (node_a, node_b) if node_a <= node_b else (node_b, node_a)
+
+
+class AttackImpact:
+    """
+    Nodes and edges reached by the hacker's and the victim's announcements.
+
+    Node membership is kept in insertion-ordered dictionaries and edges are indexed by
+    their canonical undirected key, so every insertion and lookup is O(1) and duplicates
+    are ignored. AS ids are interned, as the same ASes appear in many AS paths.
+    """
+
+    def __init__(self, hacker_node, victim_node):
+        """
+        :param hacker_node: AS number of the hacker.
+        :param victim_node: AS number of the victim.
+        """
+        self.hacker_node = sys.intern(str(hacker_node))
+        self.victim_node = sys.intern(str(victim_node))
+        self.nodes = {RED: {}, GREEN: {}}
+        self.edges = {RED: {}, GREEN: {}}  # canonical key -> direction in which the edge was first seen
+        self.paths = {}  # router -> list of "a->b" edges of its best path
+
+    def add_node(self, color, node):
+        """
+        Marks a node as reached by the announcement of the given color.
+        """
+        self.nodes[color].setdefault(sys.intern(str(node)), None)
+
+    def add_edge(self, color, node_a, node_b):
+        """
+        Marks an edge (in any direction) as traversed by the announcement of the given color.
+        """
+        node_a, node_b = sys.intern(str(node_a)), sys.intern(str(node_b))
+        self.edges[color].setdefault(edge_key(node_a, node_b), (node_a, node_b))
+
+    def add_path(self, router_name, as_path):
+        """
+        Records the best path of a router, as the chain of edges from the router to the origin.
+
+        :param router_name: AS number of the router.
+        :param as_path: List of the ASes in the best path.
+        """
+        hops = [sys.intern(str(router_name))] + [sys.intern(str(node)) for node in as_path]
+        self.paths[hops[0]] = [f"{hops[i]}->{hops[i + 1]}" for i in range(len(hops) - 1)]
+
+    def to_dict(self):
+        """
+        Serialises the impact with the schema of bgp_analysis_results.json.
+        """
+        return {
+            "hacker_node": self.hacker_node,
+            "victim_node": self.victim_node,
+            "red_nodes": list(self.nodes[RED]),
+            "red_edges": [f"{a}->{b}" for a, b in self.edges[RED].values()],
+            "green_nodes": list(self.nodes[GREEN]),
+            "green_edges": [f"{a}->{b}" for a, b in self.edges[GREEN].values()],
+            "paths": self.paths
+        }
@@ -1,20 +1,75 @@
 import json
 import app_result
-from Kathara.manager.Kathara import Kathara
+import graph_rendering
+import rov
+from attack_impact import AttackImpact, RED, GREEN
+import container_exec
+from container_exec import execute_command_in_container
 
-def execute_command_in_container(machine_name, lab, command):
+def bestpath_command(prefixes):
     """
-    Executes a command inside a container.
+    Returns the command that prints the best path towards one or more prefixes in JSON format.
 
-    :param machine_name: Machine object kathara
-    :param command: Command to execute inside the container.
-    :return: Output of the command as a string.
+    A single vtysh call runs one "sh ip bgp" per prefix, so the cost is one exec per router
+    whatever the number of prefixes.
+
+    :param prefixes: BGP prefix, or list of BGP prefixes, to analyze.
+    :return: Command string.
+    """
+    if isinstance(prefixes, str):
+        prefixes = [prefixes]
+    commands = " ".join(f'-c "sh ip bgp {prefix} bestpath json"' for prefix in prefixes)
+    return f"vtysh {commands}"
+
+def prefix_matches(requested, reported):
+    """
+    Checks if the prefix reported by vtysh is the one requested.
+
+    :param requested: Prefix passed to bestpath_command, with or without its length.
+    :param reported: "prefix" field of the JSON output (in CIDR notation).
+    :return: True if they match.
     """
-    # Execute the command in the container
-    result, stderr, return_code = Kathara.get_instance().manager.exec(machine_name, command, wait=False, stream=False, lab=lab)
-    return result, stderr, return_code
+    if "/" in requested:
+        return reported == requested
+    return reported.split("/")[0] == requested
 
-def analyze_bgp_path(router, lab, hacker_node, victim_node, prefix, red_nodes, red_edge, green_nodes, green_edge, paths):
+def parse_bestpaths(output, prefixes):
+    """
+    Splits the output of bestpath_command into the JSON object of each prefix.
+
+    vtysh prints one JSON object per command (an empty one if the prefix is not in the table).
+    Objects are matched to the prefixes by their "prefix" field rather than by their position,
+    since a command that fails prints an error instead of an object.
+
+    :param output: Command output as string.
+    :param prefixes: List of the prefixes passed to bestpath_command.
+    :return: Dictionary mapping each prefix to its parsed BGP data (empty if not in the table).
+    :raises ValueError: If the output holds no JSON object (vtysh failed) or an invalid one.
+    """
+    decoder = json.JSONDecoder()
+    objects = []
+    position = output.find("{")
+    while position != -1:
+        bgp_data, end = decoder.raw_decode(output, position)
+        objects.append(bgp_data)
+        position = output.find("{", end)
+    if not objects:
+        raise ValueError("no JSON object in the output")
+
+    parsed = {prefix: {} for prefix in prefixes}
+    for bgp_data in objects:
+        reported = bgp_data.get("prefix")
+        if reported is None:
+            continue  # Prefix not in the table
+        matching = [prefix for prefix in prefixes if prefix_matches(prefix, reported)]
+        if not matching:
+            # e.g. a less specific route covering the requested address: the prefix itself is not in the table
+            print(f"Ignoring the best path towards {reported}, which was not requested.")
+        for prefix in matching:
+            parsed[prefix] = bgp_data
+    return parsed
+
+def analyze_bgp_path(router, lab, hacker_node, victim_node, prefix, impact, vrp_trie=None, rov_mismatches=None, bgp_data=None):
     """
     Analyzes the BGP path for a given prefix in a specific container.
 
@@ -23,11 +78,10 @@ def analyze_bgp_path(router, lab, hacker_node, victim_node, prefix, red_nodes, r
     :param hacker_node: AS number of the hacker.
     :param victim_node: AS number of the victim.
     :param prefix: BGP prefix to analyze.
-    :param red_nodes: List to store nodes originating from the hacker.
-    :param red_edge: List to store edges originating from the hacker.
-    :param green_nodes: List to store nodes originating from the victim.
-    :param green_edge: List to store edges originating from the victim.
-    :param paths: Dictionary to store paths observed in the BGP analysis.
+    :param impact: AttackImpact storing the nodes, edges and paths reached by the hacker and the victim.
+    :param vrp_trie: Optional VRP trie (see rov.build_vrp_trie) used to cross-check the validation state.
+    :param rov_mismatches: Dictionary to store routers whose validation state differs from the expected one.
+    :param bgp_data: Best path of the prefix already fetched for this router (see parse_bestpaths), if any.
     """
     try:
         # Extract the router name (AS number) from the container name
@@ -36,22 +90,21 @@ def analyze_bgp_path(router, lab, hacker_node, victim_node, prefix, red_nodes, r
 
         # Identify if the router is the hacker or victim
         if router_name == hacker_node:
-            red_nodes.append(router_name)
+            impact.add_node(RED, router_name)
         elif router_name == victim_node:
-            green_nodes.append(router_name)
+            impact.add_node(GREEN, router_name)
 
-        # Execute the BGP command inside the container
-        command = f'vtysh -c "sh ip bgp {prefix} bestpath json"'
-        exec_result, stderr, return_code = execute_command_in_container(router.name, lab, command)
-        output = exec_result.decode("utf-8").strip()
+        # Execute the BGP command inside the container, unless its output was already fetched
+        if bgp_data is None:
+            command = bestpath_command(prefix)
+            exec_result = execute_command_in_container(router.name, lab, command)
+            output = exec_result[0].decode("utf-8").strip()
+            bgp_data = json.loads(output) if output else {}
 
-        if not output or output == "{}":
+        if not bgp_data:
             print(f"No valid JSON output for container {router_name} with prefix {prefix}.")
             return
 
-        # Parse the JSON result
-        bgp_data = json.loads(output)
-
         # Analyze the BGP paths
         aspath_segments = bgp_data.get("paths", [{}])[0].get("aspath", {}).get("segments", [])
         origin_as = None
@@ -59,42 +112,45 @@ def analyze_bgp_path(router, lab, hacker_node, victim_node, prefix, red_nodes, r
             as_path = aspath_segments[0]["list"]
             origin_as = str(as_path[-1])  # The last element is the origin AS
 
+            # Cross-check the validation state reported by the router against the expected one
+            if vrp_trie is not None and rov_mismatches is not None:
+                best_path = bgp_data["paths"][0]
+                reported_state = rov.normalize_state(best_path.get("rpkiValidationState"))
+                if reported_state is not None:
+                    announced_prefix = bgp_data.get("prefix", prefix if "/" in prefix else f"{prefix}/24")
+                    expected_state = rov.validate(vrp_trie, announced_prefix, origin_as)
+                    if reported_state != expected_state:
+                        print(f"Validation mismatch on router {router_name}: {announced_prefix} from AS {origin_as} "
+                              f"is {reported_state} (expected: {expected_state})")
+                        rov_mismatches[router_name] = {
+                            "prefix": announced_prefix,
+                            "origin_as": origin_as,
+                            "reported": reported_state,
+                            "expected": expected_state
+                        }
+
             # Add the router to the appropriate list based on the origin
             if origin_as == hacker_node:
-                red_nodes.append(router_name)
+                impact.add_node(RED, router_name)
             elif origin_as == victim_node:
-                green_nodes.append(router_name)
-
-            # Add edges to the paths dictionary
-            paths[router_name] = []
-            if as_path:
-                # Add the first edge router_name -> as_path[0]
-                first_edge = f"{router_name}->{as_path[0]}"
-                paths[router_name].append(first_edge)
+                impact.add_node(GREEN, router_name)
 
-                # Add internal edges as_path[i] -> as_path[i+1]
-                for i in range(len(as_path) - 1):
-                    edge = f"{as_path[i]}->{as_path[i + 1]}"
-                    paths[router_name].append(edge)
+            # Add the edges router_name -> as_path[0] -> ... -> origin to the paths
+            impact.add_path(router_name, as_path)
 
         # Handle edges in the advertisedTo section
         advertised_to = bgp_data.get("advertisedTo", {})
         for to_router, details in advertised_to.items():
             to_router_short = details["hostname"].replace("router", "")
-            edge = f"{router_name}->{to_router_short}"
-            reverse_edge = f"{to_router_short}->{router_name}"
-
             if router_name == hacker_node or origin_as == hacker_node:
-                if edge not in red_edge and reverse_edge not in red_edge:
-                    red_edge.append(edge)
+                impact.add_edge(RED, router_name, to_router_short)
             elif router_name == victim_node or origin_as == victim_node:
-                if edge not in green_edge and reverse_edge not in green_edge:
-                    green_edge.append(edge)
+                impact.add_edge(GREEN, router_name, to_router_short)
 
     except Exception as e:
         print(f"Error while analyzing container {router_name}: {e}")
 
-def bgp_check(routers, lab, hacker_node, victim_node, prefix_to_check):
+def bgp_check(routers, lab, hacker_node, victim_node, prefix_to_check, roa_list=None, extra_prefixes=None):
     """
     Performs a BGP analysis to identify paths, nodes, and edges related to a hacker and a victim.
 
@@ -103,49 +159,93 @@ def bgp_check(routers, lab, hacker_node, victim_node, prefix_to_check):
     :param hacker_node: AS number of the hacker.
     :param victim_node: AS number of the victim.
     :param prefix_to_check: BGP prefix to analyze.
+    :param roa_list: Optional list of ROAs, used to cross-check each router's validation state offline.
+    :param extra_prefixes: Optional list of other prefixes (e.g. the Krill LAN) analyzed from the same snapshot.
+    :return: Dictionary with the analysis results (as saved in bgp_analysis_results.json), or None on error.
     """
-    # Global lists for storing analysis results
-    red_nodes = []
-    red_edge = []
-    green_nodes = []
-    green_edge = []
-    paths = {}
+    # Analysis results of each prefix, the first one being the victim prefix
+    prefixes = [prefix_to_check] + [prefix for prefix in (extra_prefixes or []) if prefix != prefix_to_check]
+    impacts = {prefix: AttackImpact(hacker_node, victim_node) for prefix in prefixes}
+    rov_mismatches = {prefix: {} for prefix in prefixes}
+
+    # Build the VRP trie once, so validation states are checked without extra container round-trips
+    vrp_trie = rov.build_vrp_trie(roa_list) if roa_list is not None else None
 
     try:
         print("\nStarting BGP route analysis on routers...")
+        # Fetch the best paths towards all the prefixes with one exec per router, concurrently
+        exec_results = container_exec.exec_on_routers(routers, lab, bestpath_command(prefixes))
+        failed_routers = []  # Routers whose best paths could not be read, even after a retry
         for router in routers.values():
-            analyze_bgp_path(router, lab, hacker_node, victim_node, prefix_to_check, red_nodes, red_edge, green_nodes, green_edge, paths)
-
-        # Save the results to a JSON file
-        output_data = {
-            "hacker_node": hacker_node,
-            "victim_node": victim_node,
-            "red_nodes": red_nodes,
-            "red_edges": red_edge,
-            "green_nodes": green_nodes,
-            "green_edges": green_edge,
-            "paths": paths
-        }
+            snapshot = None
+            for attempt in range(2):
+                # A failed or truncated output is fetched again once, on its own
+                exec_result = exec_results[router.name] if attempt == 0 else \
+                    execute_command_in_container(router.name, lab, bestpath_command(prefixes))
+                if exec_result is None or exec_result[0] is None:
+                    print(f"Error while analyzing container {router.name}: no output received.")
+                    continue
+                try:
+                    snapshot = parse_bestpaths(exec_result[0].decode("utf-8"), prefixes)
+                    break
+                except ValueError as e:
+                    print(f"Error while analyzing container {router.name}: invalid JSON output ({e}).")
+
+            if snapshot is None:
+                router_name = router.name.split("router")[1]
+                failed_routers.append(router_name)
+                # The hacker and the victim always route to themselves, even if their table was not read
+                for prefix in prefixes:
+                    if router_name == hacker_node:
+                        impacts[prefix].add_node(RED, router_name)
+                    elif router_name == victim_node:
+                        impacts[prefix].add_node(GREEN, router_name)
+                continue
+
+            # Evaluate every prefix from the same snapshot
+            for prefix in prefixes:
+                analyze_bgp_path(router, lab, hacker_node, victim_node, prefix, impacts[prefix], vrp_trie,
+                                 rov_mismatches[prefix], snapshot[prefix])
+
+        # Save the results to a JSON file, with the other prefixes under "prefixes"
+        output_data = {}
+        for prefix in prefixes:
+            result = impacts[prefix].to_dict()
+            if vrp_trie is not None:
+                result["rov_mismatches"] = rov_mismatches[prefix]
+            if prefix == prefix_to_check:
+                output_data.update(result)
+            else:
+                del result["hacker_node"], result["victim_node"]
+                output_data.setdefault("prefixes", {})[prefix] = result
+        # Routers missing from the red and green nodes because their tables could not be read
+        output_data["failed_routers"] = failed_routers
 
         output_file = "output/bgp_analysis_results.json"
         with open(output_file, "w") as json_file:
             json.dump(output_data, json_file, indent=4)
 
         print(f"\nBGP route analysis results saved in {output_file}")
+        return output_data
 
-        # Load additional input files for visualization
-        input_file = "output/customer_cone.json"
-        with open(input_file, "r") as f:
-            topology = json.load(f)
+    except Exception as e:
+        print(f"Error: {e}")
+        return None
 
-        with open("output/bgp_analysis_results.json", 'r') as file:
-            results = json.load(file)
+def show_results(results, webgl_edge_threshold=graph_rendering.DEFAULT_WEBGL_EDGE_THRESHOLD, clustering_options=None):
+    """
+    Runs the Dash app to visualize the results of the BGP analysis.
 
-        with open("output/saved_nodes.json", 'r') as file:
-            saved_nodes = json.load(file)
+    :param results: Dictionary returned by bgp_check.
+    :param webgl_edge_threshold: Number of edges above which the graph is drawn with WebGL.
+    :param clustering_options: Level-of-detail options of the graph (None for the defaults).
+    """
+    # Load additional input files for visualization
+    input_file = "output/customer_cone.json"
+    with open(input_file, "r") as f:
+        topology = json.load(f)
 
-        # Run the Dash app to visualize the results
-        app_result.run_dash_app(topology, results, saved_nodes)
+    with open("output/saved_nodes.json", 'r') as file:
+        saved_nodes = json.load(file)
 
-    except Exception as e:
-        print(f"Error: {e}")
+    app_result.run_dash_app(topology, results, saved_nodes, webgl_edge_threshold, clustering_options)
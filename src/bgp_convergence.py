@@ -1,113 +1,241 @@
+import re
 import time
-from Kathara.manager.Kathara import Kathara
+import container_exec
+import bgp_table
+from container_exec import execute_command_in_container
 
 
-def execute_command_in_container(machine_name, lab, command):
+def convergence_parameters(topology, routers_count, overrides=None):
     """
-    Executes a command inside a container.
+    Derives the convergence polling parameters from the size of the customer cone.
 
-    :param machine_name: Machine object kathara
-    :param lab: Kathara lab instance.
-    :param command: Command to execute inside the container.
-    :return: Output of the command as a string.
+    The stability window grows with the depth of the cone (levelMax), since every level
+    adds a hop to the propagation of an update, plus the RPKI polling period. The timeout
+    grows with both the depth and the number of routers to query.
+
+    :param topology: Dictionary representing the customer cone (with "levelMax" for each AS).
+    :param routers_count: Number of routers in the lab.
+    :param overrides: Optional dictionary of parameters set explicitly (e.g. from config.json); None values are ignored.
+    :return: Dictionary of keyword arguments for wait_for_convergence.
     """
-    result, stderr, return_code = Kathara.get_instance().manager.exec(machine_name, command, wait=False, stream=False, lab=lab)
-    return result, stderr, return_code
+    depth = max((int(details.get("levelMax", 0)) for details in topology.values()), default=0)
+    parameters = {
+        "min_interval": 1,  # Fast re-polls while routes move
+        "max_interval": 10,  # Back-off limit while nothing changes
+        "stable_window": 10 + 2 * depth,  # RPKI polling period + 2 seconds per level
+        "max_wait_time": 120 + 30 * depth + routers_count,
+        "stop_condition": "route_count"
+    }
+    for key, value in (overrides or {}).items():
+        if key in parameters and value is not None:
+            parameters[key] = value
+    return parameters
 
 
-def wait_for_convergence(routers, routers_count, lab, check_interval=5, max_wait_time=600):
+def wait_for_convergence(routers, routers_count, lab, min_interval=1, max_interval=10, stable_window=25, max_wait_time=600, stop_condition="route_count", timeline=None, expected_ribs=None):
     """
-    Waits until all routers have at least the expected number of BGP routes,
-    and the route tables remain stable for 5 consecutive iterations.
+    Waits until the route tables of all routers remain stable for a time window and,
+    depending on the stop condition, all routers have at least the expected number of BGP routes.
+    With the "expected_rib" stop condition convergence is declared as soon as every router
+    holds exactly the prefixes computed by route_propagation.expected_ribs.
+
+    Stability is checked on a canonical digest of each routing table (prefix, best path,
+    next hop and validation state), so only one digest per router is kept in memory.
+    Polling is adaptive: routers are re-polled after min_interval seconds while routes
+    move, and the interval doubles up to max_interval while nothing changes.
 
     :param routers: Dictionary of router instances.
     :param routers_count: Expected number of routes per router.
     :param lab: Kathara lab instance.
-    :param check_interval: Time interval in seconds between checks.
+    :param min_interval: Shortest time interval in seconds between checks.
+    :param max_interval: Longest time interval in seconds between checks.
+    :param stable_window: Time in seconds the route tables must remain unchanged.
     :param max_wait_time: Maximum time in seconds to wait for convergence.
+    :param stop_condition: "route_count" to also require the expected number of routes, "stable" to only require stability,
+                           "expected_rib" to stop when every router holds its expected prefixes (falling back to stability).
+    :param timeline: Optional ConvergenceTimeline recording the route counts and changes of every router.
+    :param expected_ribs: Dictionary mapping router names to their expected sets of prefixes (for "expected_rib").
     :return: True if convergence is reached, False otherwise.
     """
-    print("\nWaiting for route convergence...")
-    elapsed = 0
-    stable_iterations = 0  # Counter for stable iterations
-    previous_routes = {}  # Route count for each router in the previous iteration
-    previous_outputs = {}  # "show ip bgp" output for each router in the previous iteration
+    print(f"\nWaiting for route convergence (stable window {stable_window}s, timeout {max_wait_time}s)...")
+    start = time.monotonic()
+    last_change = start  # Time of the last change in any routing table
+    check_interval = min_interval
+    previous_digests = {}  # Routing table digest for each router in the previous iteration
 
-    while elapsed < max_wait_time:
+    while time.monotonic() - start < max_wait_time:
         all_converged = True  # Indicates if all routers have converged
-        current_routes = {}  # Current route count for each router
-        current_outputs = {}  # Current "show ip bgp" output for each router
+        all_expected = expected_ribs is not None  # Indicates if all routers hold exactly their expected prefixes
+        current_digests = {}  # Current routing table digest for each router
+
+        # Query all the routers concurrently
+        command = ["vtysh", "-c", "show ip bgp json"]
+        exec_results = container_exec.exec_on_routers(routers, lab, command)
 
         for machine in routers.values():
-            command = ["vtysh", "-c", "show ip bgp"]
-            try:
-                result, stderr, return_code = execute_command_in_container(machine.name, lab, command)
-                if result is not None:
-                    result = result.decode('utf-8')
-                else:
-                    print(f"Error on {machine.name}: no output received.")
-                    all_converged = False  # if there's no output, consider the convergence not reached
-                    continue  # Pass to the next router
-
-            except Exception as e:
-                print(f"Errore on {machine.name}: {str(e)}")
-                all_converged = False  # If there's an exception, consider the convergence not reached
+            exec_result = exec_results[machine.name]
+            if exec_result is None or exec_result[0] is None:
+                print(f"Error on {machine.name}: no output received.")
+                all_converged = False  # if there's no output, consider the convergence not reached
+                all_expected = False
                 continue  # Pass to the next router
 
-            routes = result.strip().split("\n")
-            current_routes[machine.name] = len(routes)
-            current_outputs[machine.name] = result.strip()
+            best_routes = bgp_table.parse_bgp_json(exec_result[0].decode('utf-8'))
+            if best_routes is None:
+                print(f"Error on {machine.name}: invalid JSON output.")
+                all_converged = False
+                all_expected = False
+                continue
+
+            current_digests[machine.name] = bgp_table.rib_digest(best_routes)
+            if timeline is not None:
+                timeline.record(machine.name, best_routes, current_digests[machine.name])
 
             # Check if the router has fewer routes than expected
-            if len(routes) < routers_count:
+            if stop_condition == "route_count" and len(best_routes) < routers_count:
                 all_converged = False
-                print(f"Convergence not reached: {machine.name} has {len(routes)} routes (expected: {routers_count}).")
+                print(f"Convergence not reached: {machine.name} has {len(best_routes)} routes (expected: {routers_count}).")
 
-        # Check if routes and outputs are unchanged compared to the previous iteration
-        for machine_name, current_output in current_outputs.items():
-            if machine_name in previous_outputs and current_output != previous_outputs[machine_name]:
-                print(f"BGP table content has changed for {machine_name}")
-
-        if previous_routes == current_routes and previous_outputs == current_outputs and all_converged:
-            stable_iterations += 1
-            print(f"Stable iteration {stable_iterations}/5")
-        else:
-            stable_iterations = 0  # Reset the counter if there's a variation
+            # Compare the prefixes with the ones the router is expected to hold
+            if stop_condition == "expected_rib" and expected_ribs is not None:
+                expected = expected_ribs.get(machine.name, set())
+                if best_routes.keys() != expected:
+                    all_expected = False
+                    missing = len(expected - best_routes.keys())
+                    unexpected = len(best_routes.keys() - expected)
+                    print(f"Convergence not reached: {machine.name} misses {missing} and has {unexpected} unexpected prefixes.")
 
-        # If the routes and outputs are stable for 5 consecutive iterations
-        if stable_iterations >= 5:
-            print("Convergence reached!")
+        if stop_condition == "expected_rib" and all_expected:
+            print(f"Convergence reached in {time.monotonic() - start:.0f} seconds: all routers hold their expected prefixes!")
+            if timeline is not None:
+                timeline.mark_converged()
+            container_exec.print_latency_summary()
             return True
 
-        # Update previous routes and outputs
-        previous_routes = current_routes.copy()
-        previous_outputs = current_outputs.copy()
+        # Report the routers whose table changed compared to the previous iteration
+        churning = sorted(machine_name for machine_name, digest in current_digests.items()
+                          if previous_digests.get(machine_name) != digest)
+        if previous_digests and churning:
+            print(f"BGP table content has changed for {len(churning)} routers: {', '.join(churning)}")
 
-        print(f"\nConvergence not yet reached, retrying in {check_interval} seconds...")
+        if previous_digests != current_digests or not all_converged:
+            # Routes are moving: restart the stability window and poll again quickly
+            last_change = time.monotonic()
+            check_interval = min_interval
+        else:
+            stable_time = time.monotonic() - last_change
+            print(f"Stable for {stable_time:.0f}/{stable_window} seconds")
+            # If the routing tables are stable for the whole window
+            if stable_time >= stable_window:
+                if stop_condition == "expected_rib" and expected_ribs is not None:
+                    print("Warning: routing tables are stable but differ from the expected ones.")
+                print(f"Convergence reached in {time.monotonic() - start:.0f} seconds!")
+                if timeline is not None:
+                    timeline.mark_converged()
+                container_exec.print_latency_summary()
+                return True
+            # Nothing changes: back off, without overshooting the end of the window
+            check_interval = min(check_interval * 2, max_interval, max(stable_window - stable_time, min_interval))
+
+        # Keep only the digests for the next iteration
+        previous_digests = current_digests
+
+        print(f"\nConvergence not yet reached, retrying in {check_interval:.0f} seconds...")
         time.sleep(check_interval)
-        elapsed += check_interval
 
     print("Timeout reached: Convergence not achieved.")
     return False
 
 
-def execute_attack(routers, hacker_router, lab):
+def parse_rpki_prefix_count(output):
+    """
+    Extracts the number of IPv4 VRPs from the output of "show rpki prefix-count".
+
+    :param output: Command output as string.
+    :return: Number of IPv4 prefixes, or None if the router is not connected to its RPKI cache.
+    """
+    match = re.search(r"IPv4 Prefixes:\s*(\d+)", output)
+    return int(match.group(1)) if match else None
+
+
+def rpki_sync_wait_time(convergence_params, roa_count, override=None):
+    """
+    Derives the time allowed to the RPKI routers to load the VRPs.
+
+    Krill publishes the ROAs one update at a time, so the time grows with their number,
+    and it is never shorter than the convergence timeout.
+
+    :param convergence_params: Dictionary returned by convergence_parameters.
+    :param roa_count: Number of ROAs created in Krill.
+    :param override: Optional time in seconds set explicitly (e.g. from config.json).
+    :return: Maximum time in seconds to wait for the RPKI routers.
+    """
+    if override is not None:
+        return override
+    return max(convergence_params["max_wait_time"], 120 + 2 * roa_count)
+
+
+def wait_for_rpki_sync(routers, rpki_nodes, lab, expected_vrps, check_interval=2, max_wait_time=120):
+    """
+    Waits until every RPKI router has received all the VRPs from its validator.
+
+    :param routers: Dictionary of router instances.
+    :param rpki_nodes: List of the ASes using RPKI.
+    :param lab: Kathara lab instance.
+    :param expected_vrps: Number of VRPs expected (one per ROA created in Krill).
+    :param check_interval: Time interval in seconds between checks.
+    :param max_wait_time: Maximum time in seconds to wait.
+    :return: True if all the validators are in sync, False otherwise.
+    """
+    rpki_routers = {as_number: routers[as_number] for as_number in rpki_nodes if as_number in routers}
+    if not rpki_routers:
+        return True
+
+    print(f"\nWaiting for {len(rpki_routers)} RPKI routers to load {expected_vrps} VRPs...")
+    start = time.monotonic()
+    while True:
+        # Query all the RPKI routers concurrently
+        exec_results = container_exec.exec_on_routers(rpki_routers, lab, ["vtysh", "-c", "show rpki prefix-count"])
+
+        not_synced = []
+        for machine in rpki_routers.values():
+            exec_result = exec_results[machine.name]
+            output = exec_result[0].decode('utf-8') if exec_result and exec_result[0] else ""
+            vrps = parse_rpki_prefix_count(output)
+            if vrps != expected_vrps:
+                not_synced.append(f"{machine.name} ({'not connected' if vrps is None else vrps})")
+
+        if not not_synced:
+            print("All RPKI routers are in sync with their validators.")
+            return True
+        if time.monotonic() - start >= max_wait_time:
+            print(f"Timeout reached: RPKI routers not in sync: {', '.join(not_synced)}")
+            return False
+        print(f"RPKI routers not yet in sync: {', '.join(not_synced[:10])}")
+        time.sleep(check_interval)
+
+
+def execute_attack(routers, hacker_router, lab, timeline=None):
     """
     Copies and executes the attack.sh script in a specific container.
     
     :param routers: Dictionary of router instances.
     :param hacker_router: Name of the hacker router.
     :param lab: Kathara lab instance.
+    :param timeline: Optional ConvergenceTimeline recording the time of the attack.
     """
 
     print(f"\nExecuting attack.sh in router {hacker_router}...")
     command = "bash /shared/attack.sh" # Execute the attack script
     machine = routers[hacker_router] 
+    if timeline is not None:
+        timeline.mark_attack()
     execute_command_in_container(machine.name, lab, command) 
     print("Attack executed successfully!")
 
 
-def ensure_bgp_convergence_and_execute_attack(routers, routers_count, lab, target_container_name):
+def ensure_bgp_convergence_and_execute_attack(routers, routers_count, lab, target_container_name, wait_function=wait_for_convergence, timeline=None, rpki_nodes=None, expected_vrps=None,
+                                              rpki_wait_time=120):
     """
     Manages the wait for BGP convergence and executes the attack script.
 
@@ -115,13 +243,29 @@ def ensure_bgp_convergence_and_execute_attack(routers, routers_count, lab, targe
     :param routers_count: Number of routers in the lab.
     :param lab: Kathara lab instance.
     :param target_container_name: Name of the target container for the attack.
+    :param wait_function: Function called as wait_function(routers, routers_count, lab) to wait for convergence.
+    :param timeline: Optional ConvergenceTimeline recording the time of the attack.
+    :param rpki_nodes: Optional list of the ASes using RPKI; the attack waits until they hold expected_vrps VRPs.
+    :param expected_vrps: Number of VRPs every RPKI router must hold before the attack.
+    :param rpki_wait_time: Maximum time in seconds to wait for the RPKI routers to load the VRPs.
     """
     print("\nStarting the route convergence phase to execute the attack.")
     print("All containers are running.")
 
+    # Routes are validated only once the VRPs are loaded, so wait for them before the routes converge
+    if rpki_nodes and not wait_for_rpki_sync(routers, rpki_nodes, lab, expected_vrps, max_wait_time=rpki_wait_time):
+        print("Error: RPKI validators are not in sync, the attack is not executed.")
+        return
+
     # Wait for BGP convergence
-    if wait_for_convergence(routers, routers_count, lab):
-        # Copy and execute the script in the specified container
-        execute_attack(routers, target_container_name, lab)
-    else:
-        print("Error: Convergence was not reached.")
\ No newline at end of file
+    if not wait_function(routers, routers_count, lab):
+        print("Error: Convergence was not reached.")
+        return
+
+    # Check again right before the attack, in case a router lost its RPKI cache meanwhile
+    if rpki_nodes and not wait_for_rpki_sync(routers, rpki_nodes, lab, expected_vrps, max_wait_time=rpki_wait_time):
+        print("Error: RPKI validators are not in sync, the attack is not executed.")
+        return
+
+    # Copy and execute the script in the specified container
+    execute_attack(routers, target_container_name, lab, timeline)
\ No newline at end of file
@@ -0,0 +1,56 @@
+import json
+import hashlib
+
+
+def parse_bgp_json(output):
+    """
+    Extracts the best route of every prefix from the output of "show ip bgp json".
+
+    Only the fields that identify the routing decision are kept, so volatile
+    columns (table version, uptime, ...) do not affect comparisons.
+
+    :param output: Output of "show ip bgp json" as string or bytes.
+    :return: Dictionary mapping prefixes to {"as_path", "next_hop", "validation"}, or None if the output is not valid JSON.
+    """
+    try:
+        table = json.loads(output or "{}")
+    except ValueError:
+        return None
+
+    best_routes = {}
+    for prefix, paths in table.get("routes", {}).items():
+        if not paths:
+            continue
+        best = next((path for path in paths if path.get("bestpath")), paths[0])
+        next_hops = [next_hop.get("ip", "") for next_hop in best.get("nexthops", [])]
+        best_routes[prefix] = {
+            "as_path": best.get("path", ""),
+            "next_hop": ",".join(next_hops),
+            "validation": best.get("rpkiValidationState", "")
+        }
+    return best_routes
+
+
+def rib_digest(best_routes):
+    """
+    Computes a canonical digest of a routing table.
+
+    :param best_routes: Dictionary returned by parse_bgp_json.
+    :return: Hexadecimal SHA-1 digest of the (prefix, best path, next hop, validation state) tuples.
+    """
+    digest = hashlib.sha1()
+    for prefix in sorted(best_routes):
+        route = best_routes[prefix]
+        digest.update(f"{prefix}|{route['as_path']}|{route['next_hop']}|{route['validation']}\n".encode())
+    return digest.hexdigest()
+
+
+def origin_as(route):
+    """
+    Returns the origin AS of a route, i.e. the last AS in its path.
+
+    :param route: Route entry returned by parse_bgp_json.
+    :return: Origin AS as string, or None for locally originated routes.
+    """
+    as_path = route["as_path"].split()
+    return as_path[-1] if as_path else None
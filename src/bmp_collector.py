@@ -0,0 +1,310 @@
+import re
+import time
+import socket
+import struct
+import threading
+import socketserver
+
+# BMP message types (RFC 7854)
+ROUTE_MONITORING = 0
+STATISTICS_REPORT = 1
+PEER_DOWN = 2
+PEER_UP = 3
+INITIATION = 4
+TERMINATION = 5
+
+# Peer type of the Loc-RIB instance (RFC 9069)
+LOC_RIB_PEER = 3
+
+# Flags and attribute types used while decoding
+PEER_FLAG_IPV6 = 0x80
+PEER_FLAG_LEGACY_AS_PATH = 0x20
+ATTR_FLAG_EXTENDED_LENGTH = 0x10
+ATTR_AS_PATH = 2
+INFO_SYSNAME = 2
+BGP_UPDATE = 2
+
+COMMON_HEADER = struct.Struct("!BIB")  # version, length, type
+PER_PEER_HEADER = struct.Struct("!BB8s16sI4sII")  # type, flags, distinguisher, address, AS, BGP ID, sec, usec
+
+
+def decode_prefixes(data):
+    """
+    Decodes a list of IPv4 prefixes encoded as in the BGP UPDATE message.
+
+    :param data: Bytes containing (length, prefix) pairs.
+    :return: List of prefixes in CIDR notation.
+    """
+    prefixes = []
+    offset = 0
+    while offset < len(data):
+        length = data[offset]
+        size = (length + 7) // 8
+        address = data[offset + 1:offset + 1 + size] + b"\0" * (4 - size)
+        prefixes.append(f"{socket.inet_ntoa(address)}/{length}")
+        offset += 1 + size
+    return prefixes
+
+
+def decode_as_path(data, as_size):
+    """
+    Decodes the AS_PATH attribute.
+
+    :param data: Bytes of the attribute value.
+    :param as_size: Size in bytes of each AS number (2 or 4).
+    :return: List of AS numbers as strings (AS_SET members are listed in order).
+    """
+    as_path = []
+    offset = 0
+    as_format = "!H" if as_size == 2 else "!I"
+    while offset + 2 <= len(data):
+        count = data[offset + 1]
+        offset += 2
+        for _ in range(count):
+            as_path.append(str(struct.unpack_from(as_format, data, offset)[0]))
+            offset += as_size
+    return as_path
+
+
+def decode_update(message, as_size):
+    """
+    Decodes a BGP UPDATE message.
+
+    :param message: BGP message, starting with the 16-byte marker.
+    :param as_size: Size in bytes of the AS numbers in the AS_PATH.
+    :return: Tuple (withdrawn prefixes, announced prefixes, AS path), or None for other message types.
+    """
+    if len(message) < 19 or message[18] != BGP_UPDATE:
+        return None
+    offset = 19
+    withdrawn_length = struct.unpack_from("!H", message, offset)[0]
+    withdrawn = decode_prefixes(message[offset + 2:offset + 2 + withdrawn_length])
+    offset += 2 + withdrawn_length
+
+    attributes_length = struct.unpack_from("!H", message, offset)[0]
+    offset += 2
+    attributes_end = offset + attributes_length
+    as_path = []
+    while offset < attributes_end:
+        flags, attribute_type = message[offset], message[offset + 1]
+        if flags & ATTR_FLAG_EXTENDED_LENGTH:
+            length = struct.unpack_from("!H", message, offset + 2)[0]
+            offset += 4
+        else:
+            length = message[offset + 2]
+            offset += 3
+        if attribute_type == ATTR_AS_PATH:
+            as_path = decode_as_path(message[offset:offset + length], as_size)
+        offset += length
+
+    announced = decode_prefixes(message[attributes_end:])
+    return withdrawn, announced, as_path
+
+
+class BmpCollector:
+    """
+    BMP receiver keeping an in-memory Adj-RIB-In and Loc-RIB per router.
+
+    Every route entry records the time of the update that installed it, and every router
+    records the time of its last update, so convergence and hijack timelines can be read
+    from a single push stream.
+    """
+
+    def __init__(self, port=5000, address="0.0.0.0"):
+        """
+        :param port: TCP port the routers connect to.
+        :param address: Local address to listen on.
+        """
+        self.address = address
+        self.port = port
+        self.lock = threading.Lock()
+        self.routers = {}  # router name -> {"adj_rib_in", "loc_rib", "last_update", "updates"}
+        self.server = None
+
+    def start(self):
+        """
+        Starts listening for BMP sessions in a background thread.
+        """
+        collector = self
+
+        class BmpHandler(socketserver.BaseRequestHandler):
+            def handle(self):
+                collector.handle_session(self.request, self.client_address[0])
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.server = socketserver.ThreadingTCPServer((self.address, self.port), BmpHandler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"BMP collector listening on {self.address}:{self.port}")
+
+    def stop(self):
+        """
+        Stops the BMP listener.
+        """
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def _router_state(self, router_name):
+        """
+        Returns the RIB state of a router, creating it if needed.
+        """
+        return self.routers.setdefault(router_name, {"adj_rib_in": {}, "loc_rib": {}, "last_update": None, "updates": 0})
+
+    def handle_session(self, connection, remote_address):
+        """
+        Reads BMP messages from a router until the session is closed.
+
+        :param connection: Connected socket.
+        :param remote_address: Address of the router, used as name until the Initiation message is received.
+        """
+        router_name = remote_address
+        stream = connection.makefile("rb")
+        while True:
+            header = stream.read(COMMON_HEADER.size)
+            if len(header) < COMMON_HEADER.size:
+                break
+            version, length, message_type = COMMON_HEADER.unpack(header)
+            body = stream.read(length - COMMON_HEADER.size)
+            if version != 3 or len(body) < length - COMMON_HEADER.size:
+                break
+            try:
+                router_name = self.process_message(router_name, message_type, body)
+            except (struct.error, IndexError, OSError) as e:
+                print(f"BMP: malformed message from {router_name}: {e}")
+        print(f"BMP session closed by {router_name}")
+
+    def process_message(self, router_name, message_type, body):
+        """
+        Applies a BMP message to the RIB state of a router.
+
+        :param router_name: Current name of the router sending the message.
+        :param message_type: BMP message type.
+        :param body: Message bytes following the common header.
+        :return: Router name, updated if the message carries the router's sysName.
+        """
+        if message_type == INITIATION:
+            offset = 0
+            while offset + 4 <= len(body):
+                info_type, info_length = struct.unpack_from("!HH", body, offset)
+                value = body[offset + 4:offset + 4 + info_length].decode(errors="replace")
+                match = re.match(r"router\d+", value)
+                if info_type == INFO_SYSNAME and match:
+                    router_name = match.group(0)
+                offset += 4 + info_length
+            return router_name
+
+        if message_type not in (ROUTE_MONITORING, PEER_DOWN):
+            return router_name
+
+        peer_type, flags, _, address, peer_as, _, seconds, microseconds = PER_PEER_HEADER.unpack_from(body)
+        if flags & PEER_FLAG_IPV6:
+            peer_address = socket.inet_ntop(socket.AF_INET6, address)
+        else:
+            peer_address = socket.inet_ntoa(address[12:])
+        timestamp = seconds + microseconds / 1e6 if seconds else time.time()
+        message = body[PER_PEER_HEADER.size:]
+
+        with self.lock:
+            state = self._router_state(router_name)
+
+            if message_type == PEER_DOWN:
+                state["adj_rib_in"].pop(peer_address, None)
+                state["last_update"] = timestamp
+                return router_name
+
+            as_size = 2 if flags & PEER_FLAG_LEGACY_AS_PATH else 4
+            update = decode_update(message, as_size)
+            if update is None:
+                return router_name
+            withdrawn, announced, as_path = update
+
+            if peer_type == LOC_RIB_PEER:
+                rib = state["loc_rib"]
+            else:
+                rib = state["adj_rib_in"].setdefault(peer_address, {})
+            for prefix in withdrawn:
+                rib.pop(prefix, None)
+            for prefix in announced:
+                rib[prefix] = {"as_path": as_path, "peer_as": str(peer_as), "timestamp": timestamp}
+
+            state["last_update"] = timestamp
+            state["updates"] += 1
+        return router_name
+
+    def loc_rib(self, router_name):
+        """
+        Returns a copy of the Loc-RIB of a router.
+
+        :param router_name: Name of the router (e.g. "router65000").
+        :return: Dictionary mapping prefixes to {"as_path", "peer_as", "timestamp"}.
+        """
+        with self.lock:
+            return dict(self.routers.get(router_name, {}).get("loc_rib", {}))
+
+    def router_summary(self, router_name, prefix):
+        """
+        Summarises the Loc-RIB of a router, without copying it.
+
+        :param router_name: Name of the router (e.g. "router65000").
+        :param prefix: Prefix whose best AS path is returned, in CIDR notation.
+        :return: Tuple (number of prefixes, number of updates received, time of the last update, AS path towards the prefix or None).
+        """
+        with self.lock:
+            state = self.routers.get(router_name)
+            if state is None:
+                return 0, 0, None, None
+            route = state["loc_rib"].get(prefix)
+            return len(state["loc_rib"]), state["updates"], state["last_update"], route["as_path"] if route else None
+
+    def last_update(self):
+        """
+        Returns the time of the last update received from any router, or None.
+        """
+        with self.lock:
+            timestamps = [state["last_update"] for state in self.routers.values() if state["last_update"]]
+        return max(timestamps) if timestamps else None
+
+
+def wait_for_convergence(collector, routers, routers_count, stable_time=25, max_wait_time=600, check_interval=1, timeline=None):
+    """
+    Waits until the Loc-RIB of every router holds at least the expected number of prefixes
+    and no BMP update is received for stable_time seconds since the call.
+
+    :param collector: Running BmpCollector.
+    :param routers: Dictionary of router instances.
+    :param routers_count: Expected number of routes per router.
+    :param stable_time: Time in seconds without updates required for convergence.
+    :param max_wait_time: Maximum time in seconds to wait for convergence.
+    :param check_interval: Time interval in seconds between checks.
+    :param timeline: Optional ConvergenceTimeline recording the route counts and changes of every router.
+    :return: True if convergence is reached, False otherwise.
+    """
+    print("\nWaiting for route convergence (BMP)...")
+    router_names = [machine.name for machine in routers.values()]
+    start = time.time()
+
+    while time.time() - start < max_wait_time:
+        if timeline is not None:
+            # The update counter changes with every update, the Loc-RIB is never copied
+            for name in router_names:
+                route_count, updates, last_update, victim_path = collector.router_summary(name, timeline.victim_prefix)
+                timeline.record_state(name, route_count, updates, victim_path, last_update)
+        incomplete = [name for name in router_names if len(collector.loc_rib(name)) < routers_count]
+        last_update = collector.last_update()
+        # The quiet time counts from the start of this call at the earliest: after the attack, the
+        # updates of the previous convergence are old, but the hijack may not have propagated yet
+        if (not incomplete and last_update is not None
+                and time.time() - max(last_update, start) >= stable_time):
+            if timeline is not None:
+                timeline.mark_converged()
+            print("Convergence reached!")
+            return True
+        time.sleep(check_interval)
+
+    for name in router_names:
+        if len(collector.loc_rib(name)) < routers_count:
+            print(f"Convergence not reached: {name} has {len(collector.loc_rib(name))} routes (expected: {routers_count}).")
+    print("Timeout reached: Convergence not achieved.")
+    return False
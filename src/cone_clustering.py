@@ -0,0 +1,253 @@
+import math
+from collections import Counter, deque
+import networkx as nx
+
+DEFAULT_MIN_NODES = 1000  # Smaller cones are drawn AS by AS
+DEFAULT_LEVEL = 2
+DEFAULT_MIN_CLUSTER_SIZE = 10
+DEFAULT_MAX_VISIBLE_NODES = 500
+
+
+class ClusterView:
+    """
+    Graph of the ASes shown by a view of the customer cone, each standing for the ASes it aggregates.
+    """
+
+    def __init__(self, G, representative=None):
+        """
+        :param G: NetworkX graph of the whole cone, with the 'pos' attribute of every node.
+        :param representative: Dictionary mapping every AS to the shown AS aggregating it (None to show every AS).
+        """
+        if representative is None:
+            # Every AS is shown: the graph of the cone is used as it is
+            self.representative = {node: node for node in G}
+            self.members = Counter(self.representative.values())
+            self.graph = G
+            return
+
+        self.representative = dict(representative)
+        for node in G:
+            self.representative.setdefault(node, node)  # ASes outside the customer tree are always shown
+        self.members = Counter(self.representative.values())
+
+        self.graph = nx.DiGraph()
+        for node in G:
+            if self.members[node]:
+                self.graph.add_node(node, pos=G.nodes[node]['pos'])
+        # Edges between aggregated ASes become edges between their aggregates, c2p taking precedence over p2p
+        for node_a, node_b, relation in G.edges(data="relation"):
+            aggregate_a, aggregate_b = self.representative[node_a], self.representative[node_b]
+            if aggregate_a != aggregate_b and (relation == "c2p" or not self.graph.has_edge(aggregate_a, aggregate_b)):
+                self.graph.add_edge(aggregate_a, aggregate_b, relation=relation)
+
+    def is_aggregate(self, node):
+        """
+        Returns True if the AS is shown in place of some of its customers.
+        """
+        return self.members[node] > 1
+
+    def member_counts(self, nodes):
+        """
+        Counts the ASes of a set aggregated by every shown AS.
+
+        :param nodes: Iterable of AS numbers.
+        :return: Counter mapping shown ASes to the number of their members in the set.
+        """
+        return Counter(self.representative[node] for node in nodes if node in self.representative)
+
+    def edge(self, edge_str):
+        """
+        Maps an edge in "a->b" notation to the edge between the shown ASes, or None if both ends are aggregated together.
+        """
+        node_a, node_b = edge_str.split("->")
+        aggregate_a, aggregate_b = self.representative.get(node_a, node_a), self.representative.get(node_b, node_b)
+        return f"{aggregate_a}->{aggregate_b}" if aggregate_a != aggregate_b else None
+
+    def label(self, node, hijacked_count=None):
+        """
+        Builds the label and the hover text of a shown AS.
+
+        :param node: Shown AS.
+        :param hijacked_count: Number of its members routing to the hacker (None if unknown).
+        :return: Tuple (text, hover text).
+        """
+        members = self.members[node]
+        if members == 1:
+            return node, node
+        text = f"{node}<br>+{members - 1}"
+        hovertext = f"{node}: sub-cone of {members} ASes"
+        if hijacked_count is not None:
+            text += f" ({hijacked_count / members:.0%})"
+            hovertext += f", {hijacked_count} hijacked ({hijacked_count / members:.0%})"
+        return text, hovertext
+
+    def marker_sizes(self):
+        """
+        Returns the marker size of every shown AS, growing with the number of ASes it aggregates.
+        """
+        return [40 if self.members[node] == 1 else min(40 + 10 * math.log10(self.members[node]), 80)
+                for node in self.graph.nodes()]
+
+
+class ConeClustering:
+    """
+    Level-of-detail views of a large customer cone.
+
+    Every AS is assigned to a single provider, the first one reached from the root, so the cone
+    becomes a tree whose sub-trees are the sub-cones. A collapsed AS is drawn as an aggregate
+    standing for its whole sub-cone; expanding it shows its customers, each one collapsed in turn.
+    A view is the list of the expanded ASes, from the least to the most recently expanded, so it
+    fits in a Dash store; it never shows more than max_visible_nodes ASes, the least recently
+    expanded sub-cones being collapsed again to make room for a new one.
+    """
+
+    def __init__(self, as_data, level=DEFAULT_LEVEL, min_cluster_size=DEFAULT_MIN_CLUSTER_SIZE,
+                 max_visible_nodes=DEFAULT_MAX_VISIBLE_NODES):
+        """
+        :param as_data: Dictionary representing the customer cone (its first AS is the root).
+        :param level: Depth from which the sub-cones start collapsed (None for no limit).
+        :param min_cluster_size: Sub-cones smaller than this start collapsed (None for no limit).
+        :param max_visible_nodes: Maximum number of ASes shown at once.
+        """
+        self.root = next(iter(as_data))
+        self.level = level
+        self.min_cluster_size = min_cluster_size
+        self.max_visible_nodes = max_visible_nodes
+
+        # Breadth-first visit of the customer links: each AS gets the provider closest to the root
+        self.parent = {self.root: None}
+        self.depth = {self.root: 0}
+        self.children = {}
+        self.order = []
+        queue = deque([self.root])
+        while queue:
+            node = queue.popleft()
+            self.order.append(node)
+            self.children[node] = []
+            for child in as_data.get(node, {}).get("p2c", []):
+                if child not in self.parent:
+                    self.parent[child] = node
+                    self.depth[child] = self.depth[node] + 1
+                    self.children[node].append(child)
+                    queue.append(child)
+        self.rank = {node: i for i, node in enumerate(self.order)}
+
+        # Sub-cone sizes, accumulated from the leaves up
+        self.size = dict.fromkeys(self.order, 1)
+        for node in reversed(self.order[1:]):
+            self.size[self.parent[node]] += self.size[node]
+
+        # When a sub-cone does not fit, the customers with the largest sub-cones are shown first
+        for children in self.children.values():
+            children.sort(key=lambda child: -self.size[child])
+
+    def ancestors(self, node):
+        """
+        Returns the providers of an AS in the tree, from its own provider up to the root.
+        """
+        ancestors = []
+        while self.parent.get(node) is not None:
+            node = self.parent[node]
+            ancestors.append(node)
+        return ancestors
+
+    def visible_nodes(self, expanded):
+        """
+        Computes the ASes shown by a view.
+
+        :param expanded: List of the expanded ASes.
+        :return: Set of the shown ASes.
+        """
+        visible = {self.root}
+        # Providers are expanded before their customers, the closest to the root first
+        for node in sorted((node for node in expanded if node in self.rank), key=self.rank.get):
+            if node in visible:
+                visible.update(self.children[node][:max(self.max_visible_nodes - len(visible), 0)])
+        return visible
+
+    def collapse(self, expanded, node):
+        """
+        Collapses the sub-cone of an AS.
+
+        :param expanded: List of the expanded ASes.
+        :param node: AS to collapse.
+        :return: New list of the expanded ASes, without the AS and its expanded customers.
+        """
+        return [other for other in expanded if other != node and node not in self.ancestors(other)]
+
+    def expand(self, expanded, node):
+        """
+        Expands the sub-cone of a shown AS, collapsing the least recently expanded ones if needed.
+
+        :param expanded: List of the expanded ASes.
+        :param node: AS to expand.
+        :return: New list of the expanded ASes.
+        """
+        visible = self.visible_nodes(expanded)
+        if node not in visible or not self.children[node] or self.children[node][-1] in visible:
+            return list(expanded)  # Hidden, without customers, or already fully expanded
+
+        expanded = [other for other in expanded if other != node] + [node]
+        keep = set(self.ancestors(node)) | {node}
+        while self.children[node][-1] not in self.visible_nodes(expanded):
+            oldest = next((other for other in expanded if other not in keep), None)
+            if oldest is None:
+                break  # The customers of the AS alone exceed the limit: the largest ones are shown
+            expanded = self.collapse(expanded, oldest)
+        return expanded
+
+    def initial_expanded(self, reveal=()):
+        """
+        Builds the starting view: the sub-cones above the chosen level and size are expanded.
+
+        :param reveal: ASes that must be shown (e.g. the hacker and the victim).
+        :return: List of the expanded ASes.
+        """
+        expanded = []
+        expanded_set = set()
+        visible_count = 1
+        for node in self.order:
+            if (self.children[node]
+                    and (node == self.root or self.parent[node] in expanded_set)
+                    and (self.level is None or self.depth[node] < self.level)
+                    and (self.min_cluster_size is None or self.size[node] >= self.min_cluster_size)
+                    and visible_count + len(self.children[node]) <= self.max_visible_nodes):
+                expanded.append(node)
+                expanded_set.add(node)
+                visible_count += len(self.children[node])
+
+        for node in reveal:
+            for ancestor in reversed(self.ancestors(node)):
+                expanded = self.expand(expanded, ancestor)
+        return expanded
+
+    def view(self, G, expanded):
+        """
+        Builds the graph of a view.
+
+        :param G: NetworkX graph of the whole cone, with the 'pos' attribute of every node.
+        :param expanded: List of the expanded ASes.
+        :return: ClusterView of the shown ASes.
+        """
+        visible = self.visible_nodes(expanded)
+        representative = {}
+        for node in self.order:
+            representative[node] = node if node in visible else representative[self.parent[node]]
+        return ClusterView(G, representative)
+
+
+def build_clustering(as_data, min_nodes=DEFAULT_MIN_NODES, level=DEFAULT_LEVEL,
+                     min_cluster_size=DEFAULT_MIN_CLUSTER_SIZE, max_visible_nodes=DEFAULT_MAX_VISIBLE_NODES):
+    """
+    Builds the level-of-detail views of a cone, if it is large enough to need them.
+
+    :param as_data: Dictionary representing the customer cone.
+    :param min_nodes: Number of ASes above which the cone is clustered (None to never cluster).
+    :param level: Depth from which the sub-cones start collapsed (None for no limit).
+    :param min_cluster_size: Sub-cones smaller than this start collapsed (None for no limit).
+    :param max_visible_nodes: Maximum number of ASes shown at once.
+    :return: ConeClustering, or None if every AS is shown.
+    """
+    if min_nodes is None or len(as_data) <= min_nodes:
+        return None
+    return ConeClustering(as_data, level, min_cluster_size, max_visible_nodes)
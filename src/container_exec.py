@@ -0,0 +1,147 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from Kathara.manager.Kathara import Kathara
+import shell_sessions
+
+# Per-router latency metrics, updated by every call to exec_on_routers
+latency_metrics = {}
+_metrics_lock = threading.Lock()
+
+# Pool of persistent shell sessions, used instead of one docker exec per command when enabled
+_session_pool = None
+
+
+def enable_persistent_sessions(lab):
+    """
+    Routes all the following commands through one persistent shell session per container.
+
+    :param lab: Kathara lab instance.
+    """
+    global _session_pool
+    _session_pool = shell_sessions.SessionPool(lab)
+
+
+def close_persistent_sessions():
+    """
+    Closes the persistent shell sessions, going back to one docker exec per command.
+    """
+    global _session_pool
+    if _session_pool is not None:
+        _session_pool.close()
+        _session_pool = None
+
+
+def execute_command_in_container(machine_name, lab, command):
+    """
+    Executes a command inside a container.
+
+    :param machine_name: Machine object kathara
+    :param lab: Kathara lab instance.
+    :param command: Command to execute inside the container.
+    :return: Output of the command as a string.
+    """
+    if _session_pool is not None:
+        return _session_pool.exec(machine_name, command)
+    result, stderr, return_code = Kathara.get_instance().manager.exec(machine_name, command, wait=False, stream=False, lab=lab)
+    return result, stderr, return_code
+
+
+def _timed_exec(machine_name, lab, command):
+    """
+    Executes a command inside a container and measures its latency.
+
+    :return: Tuple (exec result triple, latency in seconds).
+    """
+    start = time.monotonic()
+    exec_result = execute_command_in_container(machine_name, lab, command)
+    return exec_result, time.monotonic() - start
+
+
+def _record_latency(machine_name, latency):
+    """
+    Updates the latency metrics of a router.
+    """
+    with _metrics_lock:
+        stats = latency_metrics.setdefault(machine_name, {"calls": 0, "total": 0.0, "max": 0.0, "last": 0.0})
+        stats["calls"] += 1
+        stats["total"] += latency
+        stats["max"] = max(stats["max"], latency)
+        stats["last"] = latency
+
+
+def exec_on_routers(routers, lab, command, max_workers=10, timeout=60, retries=2):
+    """
+    Executes a command in all the given containers concurrently.
+
+    Commands are fanned out on a bounded thread pool, so a polling round takes about
+    as long as the slowest container instead of the sum of all exec latencies.
+    Calls that raise an exception or do not complete within the timeout are retried.
+
+    :param routers: Dictionary of router instances.
+    :param lab: Kathara lab instance.
+    :param command: Command to execute, or a function returning the command for a given machine.
+    :param max_workers: Maximum number of concurrent exec calls (the Docker client keeps 10 pooled connections).
+    :param timeout: Time in seconds each attempt is allowed to take.
+    :param retries: Number of additional attempts for failed or timed out calls.
+    :return: Dictionary mapping machine names to (result, stderr, return_code), or to None if every attempt failed.
+    """
+    machines = list(routers.values())
+    results = {machine.name: None for machine in machines}
+    if not machines:
+        return results
+
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(machines)))
+    pending = machines
+    try:
+        for attempt in range(retries + 1):
+            futures = {}
+            for machine in pending:
+                machine_command = command(machine) if callable(command) else command
+                futures[executor.submit(_timed_exec, machine.name, lab, machine_command)] = machine
+
+            done, not_done = wait(futures, timeout=timeout)
+
+            failed = []
+            for future in done:
+                machine = futures[future]
+                try:
+                    exec_result, latency = future.result()
+                except Exception as e:
+                    print(f"Error on {machine.name} (attempt {attempt + 1}/{retries + 1}): {str(e)}")
+                    failed.append(machine)
+                    continue
+                results[machine.name] = exec_result
+                _record_latency(machine.name, latency)
+
+            for future in not_done:
+                machine = futures[future]
+                future.cancel()
+                print(f"Timeout on {machine.name} (attempt {attempt + 1}/{retries + 1}): no answer within {timeout} seconds.")
+                _record_latency(machine.name, timeout)
+                failed.append(machine)
+
+            if not failed:
+                break
+            pending = failed
+    finally:
+        # Do not wait for calls stuck past their timeout
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return results
+
+
+def print_latency_summary(top=5):
+    """
+    Prints the average and maximum exec latency of the slowest routers.
+
+    :param top: Number of routers to print.
+    """
+    with _metrics_lock:
+        stats = sorted(latency_metrics.items(), key=lambda item: item[1]["max"], reverse=True)
+    if not stats:
+        return
+    print("Slowest containers (exec latency):")
+    for machine_name, machine_stats in stats[:top]:
+        average = machine_stats["total"] / machine_stats["calls"]
+        print(f"  {machine_name}: avg {average:.3f}s, max {machine_stats['max']:.3f}s over {machine_stats['calls']} calls")
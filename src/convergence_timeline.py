@@ -0,0 +1,118 @@
+import json
+import time
+
+
+class ConvergenceTimeline:
+    """
+    Per-router time series recorded while waiting for convergence.
+
+    For every router it keeps the route count (a sample is stored only when the count
+    changes), the first time the expected number of routes was reached, the last time
+    the routing table changed and, after the attack, the time the best path towards
+    the victim prefix flipped. Times are saved in seconds from the start of the timeline.
+
+    Every convergence detector feeds it from the data it already collects, so the time
+    resolution depends on the detector (see the "detector" field of the saved timeline).
+    """
+
+    def __init__(self, expected_routes, victim_prefix, detector="polling"):
+        """
+        :param expected_routes: Number of routes every router is expected to hold.
+        :param victim_prefix: Prefix of the victim in CIDR notation.
+        :param detector: Convergence detector feeding the timeline.
+        """
+        self.start = time.time()
+        self.expected_routes = expected_routes
+        self.victim_prefix = victim_prefix
+        self.detector = detector
+        self.attack_time = None
+        self.converged = []  # Times at which convergence was declared
+        self.routers = {}
+        self.digests = {}  # router -> last routing table digest
+
+    def _elapsed(self, timestamp=None):
+        """
+        Returns the seconds from the start of the timeline, rounded to milliseconds.
+        """
+        return round((timestamp if timestamp is not None else time.time()) - self.start, 3)
+
+    def record(self, router_name, best_routes, digest, timestamp=None):
+        """
+        Records the state of a router's routing table.
+
+        :param router_name: Name of the router.
+        :param best_routes: Dictionary returned by bgp_table.parse_bgp_json.
+        :param digest: Digest of the routing table (bgp_table.rib_digest).
+        :param timestamp: Time of the observation (defaults to now).
+        """
+        victim_route = best_routes.get(self.victim_prefix)
+        self.record_state(router_name, len(best_routes), digest, victim_route["as_path"] if victim_route else None, timestamp)
+
+    def record_state(self, router_name, route_count, digest, victim_path, timestamp=None):
+        """
+        Records the state of a router's routing table, summarised by the convergence detector.
+
+        :param router_name: Name of the router.
+        :param route_count: Number of prefixes in the routing table.
+        :param digest: Any value that changes whenever the routing table changes.
+        :param victim_path: Best path (or its hash) towards the victim prefix, or None.
+        :param timestamp: Time of the observation (defaults to now).
+        """
+        now = self._elapsed(timestamp)
+        state = self.routers.setdefault(router_name, {
+            "samples": [],
+            "first_complete": None,
+            "last_change": None,
+            "victim_path": None,
+            "victim_flip": None
+        })
+
+        if not state["samples"] or state["samples"][-1][1] != route_count:
+            state["samples"].append([now, route_count])
+        if state["first_complete"] is None and route_count >= self.expected_routes:
+            state["first_complete"] = now
+        if self.digests.get(router_name) != digest:
+            self.digests[router_name] = digest
+            state["last_change"] = now
+
+        if victim_path != state["victim_path"]:
+            # Only the first flip after the attack is the hijack propagation time
+            if self.attack_time is not None and state["victim_flip"] is None:
+                state["victim_flip"] = now
+            state["victim_path"] = victim_path
+
+    def mark_attack(self):
+        """
+        Records the time the attack was launched.
+        """
+        self.attack_time = self._elapsed()
+
+    def mark_converged(self):
+        """
+        Records the time convergence was declared.
+        """
+        self.converged.append(self._elapsed())
+
+    def to_dict(self):
+        """
+        Returns the timeline as a dictionary.
+        """
+        return {
+            "start": round(self.start, 3),
+            "expected_routes": self.expected_routes,
+            "victim_prefix": self.victim_prefix,
+            "detector": self.detector,
+            "attack": self.attack_time,
+            "converged": self.converged,
+            "routers": self.routers
+        }
+
+    def save(self, output_file):
+        """
+        Saves the timeline as compact JSON.
+
+        :param output_file: Path of the output file.
+        """
+        with open(output_file, "w") as f:
+            json.dump(self.to_dict(), f, separators=(",", ":"))
+        print(f"Convergence timeline saved in '{output_file}'")
@@ -1,12 +1,13 @@
 import os
 
-def create_daemons_file(neighbor_dict, input_file):
+def create_daemons_file(neighbor_dict, input_file, bmp=False):
     """
     Creates the daemons files with enabled daemons in the 'daemons' directory
     based on the value of the RPKI parameter in the neighbor dictionary.
 
     :param neighbor_dict: Dictionary containing neighbor configurations.
     :param input_file: Name of the input file.
+    :param bmp: Boolean flag to load the BMP module in bgpd.
     """
     # Default content for routers without RPKI
     default_content = """
@@ -88,6 +89,11 @@ bfdd_options="  --daemon -A 127.0.0.1"
 fabricd_options="  --daemon -A 127.0.0.1"
 """.strip()
 
+    # Load the BMP module in bgpd if required
+    if bmp:
+        default_content = default_content.replace('bgpd_options="   --daemon -A 127.0.0.1"', 'bgpd_options="   --daemon -A 127.0.0.1 -M bmp"')
+        rpki_content = rpki_content.replace('bgpd_options="   --daemon -A 127.0.0.1 -M rpki"', 'bgpd_options="   --daemon -A 127.0.0.1 -M rpki -M bmp"')
+
     # Create the daemons file for each router
     for as_number, details in neighbor_dict.items():
         # Ensure the '/lab_.../routerX/etc/frr' directory exists
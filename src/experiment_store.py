@@ -0,0 +1,169 @@
+import sys
+import json
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at TEXT NOT NULL,
+    root_as TEXT NOT NULL,
+    config TEXT NOT NULL,
+    seed INTEGER,
+    nodes_count INTEGER NOT NULL,
+    rpki_count INTEGER NOT NULL,
+    adoption_rpki REAL NOT NULL,
+    hacker_node TEXT NOT NULL,
+    victim_node TEXT NOT NULL,
+    victim_prefix TEXT NOT NULL,
+    hijacked_count INTEGER,
+    hijack_rate REAL,
+    attack_time REAL,
+    converged_time REAL
+);
+CREATE TABLE IF NOT EXISTS run_nodes (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    as_number TEXT NOT NULL,
+    rpki INTEGER NOT NULL,
+    collector INTEGER NOT NULL,
+    outcome TEXT,
+    PRIMARY KEY (run_id, as_number)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS run_paths (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    prefix TEXT NOT NULL,
+    as_number TEXT NOT NULL,
+    as_path TEXT NOT NULL,
+    PRIMARY KEY (run_id, prefix, as_number)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS run_convergence (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    router TEXT NOT NULL,
+    first_complete REAL,
+    last_change REAL,
+    victim_flip REAL,
+    samples TEXT NOT NULL,
+    PRIMARY KEY (run_id, router)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_runs_root_adoption ON runs (root_as, adoption_rpki, hijack_rate);
+CREATE INDEX IF NOT EXISTS idx_runs_pair ON runs (hacker_node, victim_node);
+CREATE INDEX IF NOT EXISTS idx_run_nodes_as ON run_nodes (as_number, outcome);
+"""
+
+
+class ExperimentStore:
+    """
+    Append-only SQLite store of the experiment runs.
+
+    Each run gets its own run_id; nothing is ever updated or deleted, so a campaign keeps the
+    results of every run. The summary of a run (root AS, adoption, hacker/victim, hijack rate)
+    sits in one indexed row of "runs", while per-router outcomes, paths and convergence times go
+    in separate tables, so aggregate queries never load the per-router data.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: Path of the SQLite database (created if missing).
+        """
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(SCHEMA)
+
+    def record_run(self, config, seed, topology, saved_nodes, victim_prefix, results, timeline=None):
+        """
+        Appends a run to the store.
+
+        :param config: Configuration dictionary of the run.
+        :param seed: Seed of the random node selection, or None.
+        :param topology: Dictionary representing the customer cone (its first AS is the root).
+        :param saved_nodes: Dictionary with the selected 'rpki_nodes', 'collector_nodes', 'hacker_node' and 'victim_node'.
+        :param victim_prefix: Prefix of the victim in CIDR notation.
+        :param results: Dictionary returned by bgp_aspath_check.bgp_check (None if the analysis failed).
+        :param timeline: Optional ConvergenceTimeline of the run.
+        :return: Id of the new run.
+        """
+        nodes = list(topology)
+        rpki_nodes = set(saved_nodes.get("rpki_nodes", []))
+        collector_nodes = set(saved_nodes.get("collector_nodes", []))
+        hacker_node = saved_nodes["hacker_node"][0]
+        victim_node = saved_nodes["victim_node"][0]
+        timeline_data = timeline.to_dict() if timeline is not None else {}
+
+        outcomes = {}
+        hijacked_count = hijack_rate = None
+        if results is not None:
+            outcomes.update((node, "green") for node in results.get("green_nodes", []))
+            outcomes.update((node, "red") for node in results.get("red_nodes", []))
+            outcomes.update((node, "failed") for node in results.get("failed_routers", []) if node not in outcomes)
+            # The hacker always routes to itself
+            hijacked_count = len([node for node in results.get("red_nodes", []) if node != hacker_node])
+            hijack_rate = hijacked_count / max(len(nodes) - 2, 1)
+
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO runs (started_at, root_as, config, seed, nodes_count, rpki_count, adoption_rpki,"
+                " hacker_node, victim_node, victim_prefix, hijacked_count, hijack_rate, attack_time, converged_time)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.strftime("%Y-%m-%dT%H:%M:%S"), nodes[0], json.dumps(config, sort_keys=True), seed,
+                 len(nodes), len(rpki_nodes), round(100 * len(rpki_nodes) / len(nodes), 2),
+                 hacker_node, victim_node, victim_prefix, hijacked_count, hijack_rate,
+                 timeline_data.get("attack"), (timeline_data.get("converged") or [None])[-1])
+            )
+            run_id = cursor.lastrowid
+
+            self.connection.executemany(
+                "INSERT INTO run_nodes (run_id, as_number, rpki, collector, outcome) VALUES (?, ?, ?, ?, ?)",
+                ((run_id, node, node in rpki_nodes, node in collector_nodes, outcomes.get(node)) for node in nodes)
+            )
+
+            if results is not None:
+                # Paths are stored as the space-separated ASes after the router, as in the AS_PATH
+                paths = {victim_prefix: results.get("paths", {})}
+                for prefix, prefix_results in results.get("prefixes", {}).items():
+                    paths[prefix] = prefix_results.get("paths", {})
+                self.connection.executemany(
+                    "INSERT INTO run_paths (run_id, prefix, as_number, as_path) VALUES (?, ?, ?, ?)",
+                    ((run_id, prefix, node, " ".join(edge.split("->")[1] for edge in edges))
+                     for prefix, prefix_paths in paths.items() for node, edges in prefix_paths.items())
+                )
+
+            self.connection.executemany(
+                "INSERT INTO run_convergence (run_id, router, first_complete, last_change, victim_flip, samples)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                ((run_id, router, state["first_complete"], state["last_change"], state["victim_flip"],
+                  json.dumps(state["samples"], separators=(",", ":")))
+                 for router, state in timeline_data.get("routers", {}).items())
+            )
+        return run_id
+
+    def hijack_rate_by_adoption(self, root_as):
+        """
+        Aggregates the hijack rate of the runs on a customer cone by RPKI adoption level.
+
+        :param root_as: Root AS of the customer cone.
+        :return: List of (adoption_rpki, runs, average hijack rate, minimum, maximum) tuples.
+        """
+        return self.connection.execute(
+            "SELECT adoption_rpki, COUNT(*), AVG(hijack_rate), MIN(hijack_rate), MAX(hijack_rate) FROM runs"
+            " WHERE root_as = ? AND hijack_rate IS NOT NULL GROUP BY adoption_rpki ORDER BY adoption_rpki",
+            (root_as,)
+        ).fetchall()
+
+    def close(self):
+        """
+        Closes the database.
+        """
+        self.connection.close()
+
+
+if __name__ == "__main__":
+    # Run from the project root: python src/experiment_store.py [root AS]
+    with open("input/config.json", "r") as f:
+        config = json.load(f)
+    store = ExperimentStore(config.get("experiment_store") or "output/experiments.sqlite")
+    root_as = sys.argv[1] if len(sys.argv) > 1 else config.get("specified_as")
+    print(f"Hijack rate vs RPKI adoption for the customer cone of AS{root_as}")
+    for adoption, runs, average, minimum, maximum in store.hijack_rate_by_adoption(root_as):
+        print(f"{adoption:6.2f}%: {average:.3f} (min {minimum:.3f}, max {maximum:.3f}) over {runs} runs")
+    store.close()
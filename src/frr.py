@@ -1,7 +1,7 @@
 import os
 
 # Function to create FRR configuration files
-def create_frr(neighbor_dict, input_file, prefix_lan_krill, prefer_customer, invalid_prefixes_in_bgp_table):
+def create_frr(neighbor_dict, input_file, prefix_lan_krill, prefer_customer, invalid_prefixes_in_bgp_table, bmp_target=None, mrt_rotation_interval=None):
     """
     Creates FRR configuration files for each router.
 
@@ -10,6 +10,8 @@ def create_frr(neighbor_dict, input_file, prefix_lan_krill, prefer_customer, inv
     :param prefix_lan_krill: LAN prefix for the Krill server.
     :param prefer_customer: Boolean flag to prefer customer routes.
     :param invalid_prefixes_in_bgp_table: Boolean flag to allow invalid prefixes in the BGP table.
+    :param bmp_target: Optional (address, port) of a BMP collector to stream the RIB changes to.
+    :param mrt_rotation_interval: Optional interval in seconds after which collectors start a new MRT dump file (None for a single dump file).
     """
     isFirstRouter = True  # Flag to identify the first router, which is directly connected to Krill
     for as_number, details in neighbor_dict.items():
@@ -31,6 +33,7 @@ def create_frr(neighbor_dict, input_file, prefix_lan_krill, prefer_customer, inv
             "enable password zebra",
             "!",
             "log file /var/log/frr/frr.log",
+            "log timestamp precision 3",  # Millisecond timestamps, used to time the BGP updates
             "!",
             "! BGP CONFIGURATION",
             "!",
@@ -46,7 +49,11 @@ def create_frr(neighbor_dict, input_file, prefix_lan_krill, prefer_customer, inv
         # Add dump configuration if the router is a collector
         if isCollector:
             config_lines.append("!")
-            config_lines.append(f"dump bgp all-et /shared/dumps/dump-router{as_number}")
+            if mrt_rotation_interval:
+                # The timestamp in the file name lets FRR start a new file at every rotation interval
+                config_lines.append(f"dump bgp all-et /shared/dumps/dump-router{as_number}-%Y%m%d%H%M%S {mrt_rotation_interval}")
+            else:
+                config_lines.append(f"dump bgp all-et /shared/dumps/dump-router{as_number}")
             config_lines.append("!")
 
         # Add RPKI configuration if the router uses RPKI
@@ -117,6 +124,18 @@ def create_frr(neighbor_dict, input_file, prefix_lan_krill, prefer_customer, inv
 
                     config_lines.append("!")
 
+        # Stream Adj-RIB-In and Loc-RIB changes to the BMP collector
+        if bmp_target is not None:
+            bmp_address, bmp_port = bmp_target
+            config_lines.extend([
+                "bmp targets collector",
+                f" bmp connect {bmp_address} port {bmp_port} min-retry 100 max-retry 1000",
+                " bmp monitor ipv4 unicast pre-policy",
+                " bmp monitor ipv4 unicast loc-rib",
+                "exit",
+                "!"
+            ])
+
         # Create prefix-lists for each relationship type
         if prefer_customer:
             seq = 10  # Initialize sequence number
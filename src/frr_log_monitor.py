@@ -0,0 +1,193 @@
+import re
+import time
+import calendar
+import threading
+from Kathara.manager.Kathara import Kathara
+import bgp_table
+import container_exec
+
+# Streams only the BGP UPDATE debug lines ("debug bgp updates in/out") of the FRR log
+TAIL_COMMAND = "tail -n {start} -F /var/log/frr/frr.log | grep --line-buffered -e ' rcvd UPDATE' -e ' send UPDATE'"
+
+# Timestamp at the start of every FRR log line, e.g. "2025/01/31 10:15:42.123"
+LOG_TIMESTAMP = re.compile(rb"^(\d{4})/(\d{2})/(\d{2}) (\d{2}):(\d{2}):(\d{2})(\.\d+)?")
+
+
+def parse_log_timestamp(line):
+    """
+    Extracts the timestamp of an FRR log line.
+
+    :param line: Log line as bytes.
+    :return: Unix timestamp (the containers log in UTC), or None if the line has no timestamp.
+    """
+    match = LOG_TIMESTAMP.match(line)
+    if not match:
+        return None
+    fields = [int(value) for value in match.groups()[:6]]
+    fraction = float(match.group(7)) if match.group(7) else 0.0
+    return calendar.timegm(tuple(fields)) + fraction
+
+
+class FrrLogMonitor:
+    """
+    Tails the BGP UPDATE debug lines of the FRR log of every router through one streaming exec.
+
+    For each router it keeps the number of UPDATE lines seen, the log timestamp of the
+    last one and the (host) time it was received, so quiescence can be detected without
+    reading the routing tables.
+    """
+
+    def __init__(self, routers, lab):
+        """
+        :param routers: Dictionary of router instances.
+        :param lab: Kathara lab instance.
+        """
+        self.machines = routers
+        self.lab = lab
+        self.router_names = [machine.name for machine in routers.values()]
+        self.lock = threading.Lock()
+        self.running = False
+        self.routers = {name: {"updates": 0, "last_update": None, "last_seen": None} for name in self.router_names}
+
+    def start(self):
+        """
+        Starts one background reader per router.
+        """
+        self.running = True
+        for router_name in self.router_names:
+            threading.Thread(target=self._follow, args=(router_name,), daemon=True).start()
+        print(f"Tailing the FRR logs of {len(self.router_names)} routers...")
+
+    def stop(self):
+        """
+        Stops the readers and terminates the tail processes in the containers.
+        """
+        self.running = False
+        container_exec.exec_on_routers(self.machines, self.lab, ["pkill", "-f", "tail -n .* -F /var/log/frr/frr.log"], retries=0)
+
+    def _follow(self, router_name):
+        """
+        Reads the UPDATE lines of a router, reopening the stream if it is interrupted.
+        """
+        start = "+1"  # The first stream also reads the updates logged before the monitor started
+        while self.running:
+            try:
+                stream = Kathara.get_instance().manager.exec(router_name, ["bash", "-c", TAIL_COMMAND.format(start=start)],
+                                                             wait=False, stream=True, lab=self.lab)
+                pending = b""
+                for stdout, _ in stream:
+                    if not self.running:
+                        break
+                    if not stdout:
+                        continue
+                    lines = (pending + stdout).split(b"\n")
+                    pending = lines.pop()
+                    self._record(router_name, [line for line in lines if line])
+            except Exception as e:
+                print(f"Error while tailing the log of {router_name}: {str(e)}")
+            start = "0"  # Lines already read must not count as new updates
+            time.sleep(1)
+
+    def _record(self, router_name, lines):
+        """
+        Updates the state of a router with the UPDATE lines just received.
+        """
+        if not lines:
+            return
+        received = time.monotonic()
+        timestamp = parse_log_timestamp(lines[-1]) or time.time()
+        with self.lock:
+            state = self.routers[router_name]
+            state["updates"] += len(lines)
+            state["last_update"] = timestamp
+            state["last_seen"] = received
+
+    def quiet_time(self, since=None):
+        """
+        Returns the seconds elapsed since any router received or sent an UPDATE, or None if none was seen yet.
+
+        :param since: Optional monotonic time counted as the last UPDATE if it is more recent.
+        """
+        with self.lock:
+            last_seen = [state["last_seen"] for state in self.routers.values() if state["last_seen"] is not None]
+        if not last_seen:
+            return None
+        return time.monotonic() - max(last_seen + ([since] if since is not None else []))
+
+    def silent_routers(self):
+        """
+        Returns the routers that did not log any UPDATE yet.
+        """
+        with self.lock:
+            return [name for name, state in self.routers.items() if not state["updates"]]
+
+
+def wait_for_convergence(monitor, routers, routers_count, lab, stable_time=25, max_wait_time=600, check_interval=1, stop_condition="route_count",
+                         timeline=None):
+    """
+    Waits until every router logged at least one UPDATE and no UPDATE is logged for stable_time seconds.
+
+    With the "route_count" stop condition the routing tables are read when the network is
+    quiet, to confirm every router holds the expected number of routes; while it stays quiet
+    and a read fails, the tables are read again with a doubling interval up to stable_time.
+
+    :param monitor: Running FrrLogMonitor.
+    :param routers: Dictionary of router instances.
+    :param routers_count: Expected number of routes per router.
+    :param lab: Kathara lab instance.
+    :param stable_time: Time in seconds without UPDATE messages required for convergence.
+    :param max_wait_time: Maximum time in seconds to wait for convergence.
+    :param check_interval: Time interval in seconds between checks.
+    :param stop_condition: "route_count" to also require the expected number of routes, "stable" to only require quiescence.
+    :param timeline: Optional ConvergenceTimeline; the logs carry no routing tables, so it is fed only by the table reads.
+    :return: True if convergence is reached, False otherwise.
+    """
+    print("\nWaiting for route convergence (FRR update logs)...")
+    start = time.monotonic()
+    next_verification = 0  # Quiet time at which the route counts are read next
+    verify_interval = check_interval
+    previous_quiet = None
+
+    while time.monotonic() - start < max_wait_time:
+        time.sleep(check_interval)
+        # The quiet time counts from the start of this call at the earliest: after the attack, the
+        # updates of the previous convergence are old, but the hijack may not have propagated yet
+        quiet = monitor.quiet_time(since=start)
+        if quiet is not None and previous_quiet is not None and quiet < previous_quiet:
+            # A new UPDATE starts a new quiet period
+            next_verification = 0
+            verify_interval = check_interval
+        previous_quiet = quiet
+        if quiet is None or quiet < stable_time or monitor.silent_routers():
+            continue
+        if stop_condition != "route_count":
+            if timeline is not None:
+                timeline.mark_converged()
+            print("Convergence reached!")
+            return True
+
+        # Re-read the route counts with a back-off while the network stays quiet
+        if quiet < next_verification:
+            continue
+        next_verification = quiet + verify_interval
+        verify_interval = min(verify_interval * 2, stable_time)
+        incomplete = False
+        exec_results = container_exec.exec_on_routers(routers, lab, ["vtysh", "-c", "show ip bgp json"])
+        for machine_name, exec_result in exec_results.items():
+            best_routes = bgp_table.parse_bgp_json(exec_result[0].decode('utf-8')) if exec_result and exec_result[0] else None
+            if timeline is not None and best_routes is not None:
+                timeline.record(machine_name, best_routes, bgp_table.rib_digest(best_routes))
+            if best_routes is None or len(best_routes) < routers_count:
+                incomplete = True
+                routes = len(best_routes) if best_routes is not None else 0
+                print(f"Convergence not reached: {machine_name} has {routes} routes (expected: {routers_count}).")
+        if not incomplete:
+            if timeline is not None:
+                timeline.mark_converged()
+            print("Convergence reached!")
+            return True
+
+    for machine_name in monitor.silent_routers():
+        print(f"Convergence not reached: no UPDATE logged by {machine_name}.")
+    print("Timeout reached: Convergence not achieved.")
+    return False
@@ -0,0 +1,84 @@
+import math
+import plotly.graph_objects as go
+
+DEFAULT_WEBGL_EDGE_THRESHOLD = 2000  # Browsers slow down with more SVG arrow annotations than this
+
+
+def use_webgl(G, webgl_edge_threshold=DEFAULT_WEBGL_EDGE_THRESHOLD):
+    """
+    Decides whether a graph is drawn with WebGL traces instead of SVG ones.
+
+    :param G: NetworkX graph of the customer cone.
+    :param webgl_edge_threshold: Number of edges above which WebGL is used (None to never use it).
+    :return: True if the graph must be drawn with WebGL.
+    """
+    return webgl_edge_threshold is not None and G.number_of_edges() > webgl_edge_threshold
+
+
+def scatter_class(webgl):
+    """
+    Returns the trace class used for edges and nodes: Scattergl in WebGL mode, Scatter otherwise.
+    """
+    return go.Scattergl if webgl else go.Scatter
+
+
+def arrow_geometry(G, edge):
+    """
+    Computes the arrow of an edge, from the middle of the edge to a quarter of the way from its first node.
+
+    :param G: NetworkX graph with the 'pos' attribute of every node.
+    :param edge: Tuple (node towards which the arrow points, other node).
+    :return: Tuple (tail x, tail y, head x, head y).
+    """
+    x0, y0 = G.nodes[edge[0]]['pos']
+    x1, y1 = G.nodes[edge[1]]['pos']
+    return (x0 + x1) / 2, (y0 + y1) / 2, (x0 * 3 + x1) / 4, (y0 * 3 + y1) / 4
+
+
+def edge_arrows(G, edge_colors, webgl):
+    """
+    Draws the direction of the edges.
+
+    In SVG mode every edge gets its own arrow annotation, as browsers handle a few thousand of
+    them at most. In WebGL mode all the arrow heads are markers of a single Scattergl trace,
+    rotated along their edge, so the cost does not grow with one DOM element per edge.
+
+    :param G: NetworkX graph with the 'pos' attribute of every node.
+    :param edge_colors: List of (edge, color) tuples.
+    :param webgl: Whether the graph is drawn with WebGL.
+    :return: Tuple (list of traces, list of layout annotations).
+    """
+    if not webgl:
+        annotations = []
+        for edge, color in edge_colors:
+            ax, ay, x, y = arrow_geometry(G, edge)
+            annotations.append(dict(
+                ax=ax, ay=ay, axref='x', ayref='y',
+                x=x, y=y, xref='x', yref='y',
+                showarrow=True,
+                arrowhead=3,
+                arrowsize=3,
+                arrowwidth=0.8,
+                arrowcolor=color,
+                opacity=1
+            ))
+        return [], annotations
+
+    heads_x, heads_y, angles, colors = [], [], [], []
+    for edge, color in edge_colors:
+        ax, ay, x, y = arrow_geometry(G, edge)
+        heads_x.append(x)
+        heads_y.append(y)
+        # Marker angles are clockwise from the top of the screen
+        angles.append(math.degrees(math.atan2(x - ax, y - ay)))
+        colors.append(color)
+
+    arrow_trace = go.Scattergl(
+        x=heads_x,
+        y=heads_y,
+        mode='markers',
+        marker={'symbol': 'arrow-wide', 'size': 10, 'angle': angles, 'color': colors},
+        hoverinfo='skip',
+        showlegend=False
+    )
+    return [arrow_trace], []
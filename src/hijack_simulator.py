@@ -0,0 +1,159 @@
+import json
+import time
+import route_propagation
+from attack_impact import AttackImpact, RED, GREEN
+
+# The simulation only needs the victim prefix to be covered by the victim's ROA, not its real address
+VICTIM_PREFIX = "10.0.0.0/24"
+
+
+def impact_from_state(relations, state, hacker_node, victim_node):
+    """
+    Converts the result of a propagation into the red/green nodes, edges and paths of bgp_aspath_check.
+
+    :param relations: Dictionary returned by route_propagation.relations_from_topology.
+    :param state: State returned by route_propagation.propagate for the victim prefix.
+    :param hacker_node: AS number of the hacker.
+    :param victim_node: AS number of the victim.
+    :return: AttackImpact of the hijack.
+    """
+    impact = AttackImpact(hacker_node, victim_node)
+    impact.add_node(RED, hacker_node)
+    impact.add_node(GREEN, victim_node)
+    for as_number, route in state["best"].items():
+        path = route[1]
+        origin_as = path[-1] if path else as_number
+        color = RED if origin_as == hacker_node else GREEN
+        impact.add_node(color, as_number)
+        if path:
+            impact.add_path(as_number, path)
+        # Edges over which the route is advertised, as in the advertisedTo section of FRR
+        for neighbor in route_propagation.exported_to(relations, as_number, route):
+            impact.add_edge(color, as_number, neighbor)
+    return impact
+
+
+def hijack_policy(rpki_nodes, victim_node, prefer_customer, invalid_prefixes_in_bgp_table):
+    """
+    Builds the routing policy of the simulated hijack.
+
+    :param rpki_nodes: List of the ASes using RPKI.
+    :param victim_node: AS number of the victim.
+    :param prefer_customer: Boolean flag to prefer customer routes.
+    :param invalid_prefixes_in_bgp_table: Boolean flag to keep invalid routes.
+    :return: RoutingPolicy, with a ROA for the victim prefix if the victim uses RPKI.
+    """
+    # By convention, only ASes using RPKI have a ROA for their own LAN (see roa_entry.generate_roa_entries)
+    roa_list = [f"{VICTIM_PREFIX} => {victim_node}"] if victim_node in rpki_nodes else []
+    return route_propagation.RoutingPolicy(rpki_nodes, roa_list, prefer_customer, invalid_prefixes_in_bgp_table)
+
+
+def propagate_hijack(relations, policy, hacker_node, victim_node):
+    """
+    Propagates the victim prefix, then the hacker's announcement on top of the converged state,
+    so the victim's routes win ties as the oldest paths do in FRR.
+
+    :return: Propagation state returned by route_propagation.propagate.
+    """
+    older_origins = (victim_node,)
+    state = route_propagation.propagate(relations, policy, VICTIM_PREFIX, [victim_node], older_origins=older_origins)
+    return route_propagation.propagate(relations, policy, VICTIM_PREFIX, [victim_node, hacker_node], state=state,
+                                       seeds=[hacker_node], older_origins=older_origins)
+
+
+def simulate_hijack(topology, rpki_nodes, hacker_node, victim_node, prefer_customer, invalid_prefixes_in_bgp_table, relations=None):
+    """
+    Predicts the outcome of the hijack without deploying the lab.
+
+    :param topology: Dictionary representing the customer cone.
+    :param rpki_nodes: List of the ASes using RPKI.
+    :param hacker_node: AS number of the hacker.
+    :param victim_node: AS number of the victim.
+    :param prefer_customer: Boolean flag to prefer customer routes.
+    :param invalid_prefixes_in_bgp_table: Boolean flag to keep invalid routes.
+    :param relations: Relationships already built from the topology, if any.
+    :return: Tuple (AttackImpact, propagation state).
+    """
+    if relations is None:
+        relations = route_propagation.relations_from_topology(topology)
+    policy = hijack_policy(rpki_nodes, victim_node, prefer_customer, invalid_prefixes_in_bgp_table)
+    state = propagate_hijack(relations, policy, hacker_node, victim_node)
+    return impact_from_state(relations, state, hacker_node, victim_node), state
+
+
+class HijackPreview:
+    """
+    Live prediction of the hijacked ASes while the nodes are being selected.
+
+    The propagation state of the last prediction is kept: when only the RPKI flags of a few
+    ASes change, the propagation is resumed from those ASes, so only the part of the cone
+    whose best routes can change is recomputed. A new hacker or victim, or a change of the
+    victim's own flag (which adds or removes its ROA), starts a new propagation.
+
+    When invalid routes are kept, an RPKI AS can still carry an invalid route at a low local
+    preference, so more than one stable state may exist and a resumed propagation can settle in
+    a different one than the emulation; every prediction then starts a new propagation.
+    """
+
+    def __init__(self, topology, prefer_customer, invalid_prefixes_in_bgp_table):
+        """
+        :param topology: Dictionary representing the customer cone.
+        :param prefer_customer: Boolean flag to prefer customer routes.
+        :param invalid_prefixes_in_bgp_table: Boolean flag to keep invalid routes.
+        """
+        self.relations = route_propagation.relations_from_topology(topology)
+        self.prefer_customer = prefer_customer
+        self.invalid_prefixes_in_bgp_table = invalid_prefixes_in_bgp_table
+        self.key = None  # (hacker, victim, victim uses RPKI) of the current state
+        self.policy = None
+        self.state = None
+
+    def hijacked(self, rpki_nodes, hacker_node, victim_node):
+        """
+        Predicts the ASes routing the victim prefix to the hacker.
+
+        :param rpki_nodes: List of the ASes using RPKI.
+        :param hacker_node: AS number of the hacker.
+        :param victim_node: AS number of the victim.
+        :return: Set of the hijacked ASes (the hacker excluded).
+        """
+        rpki_nodes = set(rpki_nodes)
+        key = (hacker_node, victim_node, victim_node in rpki_nodes)
+        if key != self.key or self.invalid_prefixes_in_bgp_table:
+            self.key = key
+            self.policy = hijack_policy(rpki_nodes, victim_node, self.prefer_customer, self.invalid_prefixes_in_bgp_table)
+            self.state = propagate_hijack(self.relations, self.policy, hacker_node, victim_node)
+        else:
+            changed = self.policy.rpki_nodes ^ rpki_nodes
+            if changed:
+                # Only the import policy of the toggled ASes changed
+                self.policy.rpki_nodes = rpki_nodes
+                route_propagation.propagate(self.relations, self.policy, VICTIM_PREFIX, [victim_node, hacker_node],
+                                            state=self.state, seeds=changed, older_origins=(victim_node,))
+        return {as_number for as_number, route in self.state["best"].items() if route[1] and route[1][-1] == hacker_node}
+
+
+def predict_outcome(topology, saved_nodes, prefer_customer, invalid_prefixes_in_bgp_table, output_file="output/predicted_results.json"):
+    """
+    Predicts the outcome of the attack for the selected nodes and saves it with the schema of bgp_analysis_results.json.
+
+    :param topology: Dictionary representing the customer cone.
+    :param saved_nodes: Dictionary with the selected 'rpki_nodes', 'hacker_node' and 'victim_node' (as in saved_nodes.json).
+    :param prefer_customer: Boolean flag to prefer customer routes.
+    :param invalid_prefixes_in_bgp_table: Boolean flag to keep invalid routes.
+    :param output_file: Path of the output file.
+    :return: Dictionary with the predicted results.
+    """
+    start = time.perf_counter()
+    impact, _ = simulate_hijack(topology, saved_nodes.get("rpki_nodes", []), saved_nodes["hacker_node"][0],
+                                saved_nodes["victim_node"][0], prefer_customer, invalid_prefixes_in_bgp_table)
+    elapsed = time.perf_counter() - start
+
+    results = impact.to_dict()
+    with open(output_file, "w") as f:
+        json.dump(results, f, indent=4)
+
+    hijacked = len(results["red_nodes"]) - 1  # The hacker itself is always red
+    print(f"Predicted outcome: {hijacked} of {len(topology) - 2} ASes route the victim prefix to the hacker "
+          f"(computed in {elapsed * 1000:.1f} ms, saved in '{output_file}')")
+    return results
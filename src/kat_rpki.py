@@ -1,6 +1,7 @@
 import os
 import json
 import logging
+import argparse
 from Kathara.manager.Kathara import Kathara
 from Kathara.model.Lab import Lab
 import neighbor_dictionary
@@ -19,8 +20,19 @@ import parse_as_graph
 import attack
 import bgp_convergence
 import bgp_aspath_check
+import container_exec
+import rib_telemetry
+import bmp_collector
+import frr_log_monitor
+import mrt_reader
+import convergence_timeline
+import route_propagation
+import hijack_simulator
+import experiment_store
+import run_cache
 import statistics_customer_cone
 import random
+import functools
 
 def generate_nodes(customer_cone, adoption_rpki_percent, adoption_collector_percent):
     """
@@ -332,6 +344,10 @@ def move_configurations_file(routers, krill, address_krill, image_frr, image_rou
 
 '''MAIN'''
 
+parser = argparse.ArgumentParser(description="Emulates a BGP prefix hijack on a customer cone with RPKI.")
+parser.add_argument("--force", action="store_true", help="emulate the run even if the result of an identical run is cached")
+args = parser.parse_args()
+
 # Check if the state file exists
 state_file = "state.json"
 # Load configuration file
@@ -347,6 +363,23 @@ adoption_rpki = config.get("adoption_rpki", 0)
 adoption_collector = config.get("adoption_collector_peer", 0)
 prefer_customer = config.get("prefer_customer", False)
 invalid_prefixes_in_bgp_table = config.get("invalid_prefixes_in_bgp_table", False)
+persistent_sessions = config.get("persistent_sessions", False)
+convergence_detector = config.get("convergence_detector", "polling")
+telemetry_interval = config.get("telemetry_interval", 2)
+bmp_address = config.get("bmp_address", "172.17.0.1")
+bmp_port = config.get("bmp_port", 5000)
+convergence_config = config.get("convergence", {})
+read_mrt_dumps = config.get("read_mrt_dumps", False)
+mrt_rotation_interval = config.get("mrt_rotation_interval", 300)
+mrt_retention = config.get("mrt_retention", 10)
+analysis_prefixes = config.get("analysis_prefixes", [])
+predict_outcome = config.get("predict_outcome", False)
+start_configuration_file = config.get("start_configuration_file", None)
+seed = config.get("seed", None)
+experiment_store_file = config.get("experiment_store", "output/experiments.sqlite")
+run_cache_dir = config.get("run_cache", "output/run_cache")
+webgl_edge_threshold = config.get("webgl_edge_threshold", 2000)
+clustering_options = config.get("clustering", {})
 
 if not os.path.exists(state_file):
 
@@ -410,11 +443,19 @@ start_configuration = {
     "victim_node": []
 }
 
-if random_configuration:
+if start_configuration_file:
+    # Start from a saved selection, e.g. the adopters chosen by adopter_optimizer.py
+    with open(start_configuration_file, "r") as f:
+        start_configuration.update(json.load(f))
+elif random_configuration:
+    # A fixed seed makes the random selection reproducible (and is recorded with the run)
+    if seed is not None:
+        random.seed(seed)
     start_configuration = generate_nodes(topology, adoption_rpki, adoption_collector)
 
 # Run the Dash app to select RPKI and COLLECTOR nodes
-app.run_dash_app(topology, start_configuration)
+app.run_dash_app(topology, start_configuration, prefer_customer, invalid_prefixes_in_bgp_table, webgl_edge_threshold,
+                 clustering_options)
 
 # After running the Dash App, delete the state file to restart
 if os.path.exists(state_file):
@@ -440,12 +481,28 @@ print(f"BlackCircle nodes (Collector): {collector_nodes}")
 print(f"Red node (Hacker): {hacker_node}")
 print(f"Green node (Victim): {victim_node}")
 
+# Predict the outcome of the attack offline, before the emulation
+if predict_outcome:
+    hijack_simulator.predict_outcome(topology, saved_data, prefer_customer, invalid_prefixes_in_bgp_table)
+
 # Start the Kathara lab
 # Create Lab and Logger
 logger = logging.getLogger("Kathara")
 logger.setLevel(logging.INFO)
 logger.info("Creating Lab BGP Announcement...")
-lab = Lab("BGP Announcement")
+
+# Extract file name without path and extension
+input_file_name = os.path.splitext(os.path.basename(input_file))[0]
+
+# Ensure the '/lab_...' directory exists
+dir_lab = f"output/lab_{os.path.splitext(input_file_name)[0]}"
+os.makedirs(dir_lab, exist_ok=True)
+
+# RIB telemetry and MRT dumps are read through /shared, so the lab directory must be mounted as the shared folder
+if convergence_detector == "telemetry" or read_mrt_dumps:
+    lab = Lab("BGP Announcement", path=os.path.abspath(dir_lab))
+else:
+    lab = Lab("BGP Announcement")
 
 address_router_to_krill = "115.115.115.1"  # IP address of the router connected to Krill
 address_krill = "115.115.115.2"  # IP address of Krill
@@ -456,13 +513,6 @@ image_frr = "kathara/frr3"
 image_routinator = "kathara/routinator3"
 image_krill = "kathara/krill3"
 
-# Extract file name without path and extension
-input_file_name = os.path.splitext(os.path.basename(input_file))[0]
-
-# Ensure the '/lab_...' directory exists
-dir_lab = f"output/lab_{os.path.splitext(input_file_name)[0]}"
-os.makedirs(dir_lab, exist_ok=True)
-
 # Function to modify the topology file by adding 'collector' and 'rpki' attributes
 topology_rpki_coll = modify_topology_rpki(topology, rpki_nodes, collector_nodes)
 # Save the updated topology to a new file
@@ -471,8 +521,10 @@ with open(output_topology, "w") as f:
     json.dump(topology_rpki_coll, f, indent=4)
 
 # Dynamically create routers and links
+# BMP sessions reach the collector through the management network, so routers are bridged
 routers, krill, dict_collision_domain = lab_collision_domain.create_routers_and_links(
-    lab, image_frr, image_routinator, image_krill, topology_rpki_coll, input_file_name
+    lab, image_frr, image_routinator, image_krill, topology_rpki_coll, input_file_name,
+    bridged=convergence_detector == "bmp"
 )
 output_collision = f"{dir_lab}/Collision_domains.json"
 with open(output_collision, "w") as f:
@@ -486,13 +538,16 @@ with open(output_neighbor_dict, "w") as f:
 
 # Dynamically generate router startup configurations
 roa_list = roa_entry.generate_roa_entries(neighbor_dict, prefix_lan_krill)
-startup.startup_routers(lab, neighbor_dict, input_file_name, dict_collision_domain, address_krill, address_router_to_krill, roa_list)
+startup.startup_routers(lab, neighbor_dict, input_file_name, dict_collision_domain, address_krill, address_router_to_krill, roa_list,
+                        telemetry_interval if convergence_detector == "telemetry" else None)
 
 # Create frr.conf files for each router
-frr.create_frr(neighbor_dict, input_file_name, prefix_lan_krill, prefer_customer, invalid_prefixes_in_bgp_table)
+bmp_target = (bmp_address, bmp_port) if convergence_detector == "bmp" else None
+frr.create_frr(neighbor_dict, input_file_name, prefix_lan_krill, prefer_customer, invalid_prefixes_in_bgp_table, bmp_target,
+               mrt_rotation_interval if read_mrt_dumps else None)
 
 # Create daemons files in the daemons folder
-daemons.create_daemons_file(neighbor_dict, input_file_name)
+daemons.create_daemons_file(neighbor_dict, input_file_name, bmp=bmp_target is not None)
 
 # Generate certificates for RPKI-enabled routers
 gen_certificates(input_file_name)
@@ -500,20 +555,128 @@ gen_certificates(input_file_name)
 # Move configuration files to their appropriate locations
 move_configurations_file(routers, krill, address_krill, image_frr, image_routinator, image_krill, input_file_name, hacker_node, victim_node, neighbor_dict)
 
+# Skip the emulation if a run with the same inputs, generated configurations and images was already analyzed
+if run_cache_dir:
+    cache = run_cache.RunCache(run_cache_dir)
+    run_options = {
+        "prefer_customer": prefer_customer,
+        "invalid_prefixes_in_bgp_table": invalid_prefixes_in_bgp_table,
+        "analysis_prefixes": analysis_prefixes
+    }
+    fingerprint, fingerprint_inputs = run_cache.fingerprint(relations_file, topology_rpki_coll, hacker_node, victim_node, run_options,
+                                                            dir_lab, [image_frr, image_routinator, image_krill])
+    cached_results = cache.load(fingerprint) if not args.force else None
+    if cached_results is not None:
+        print(f"Run {fingerprint[:12]} already emulated: using the cached results (run with --force to emulate it again)")
+        with open("output/bgp_analysis_results.json", "w") as f:
+            json.dump(cached_results, f, indent=4)
+        bgp_aspath_check.show_results(cached_results, webgl_edge_threshold, clustering_options)
+        exit(0)
+
+# Start watching the telemetry directory (without digests of previous runs) before the routers publish
+if convergence_detector == "telemetry":
+    shutil.rmtree(f"{dir_lab}/shared/telemetry", ignore_errors=True)
+    telemetry_watcher = rib_telemetry.TelemetryWatcher(f"{dir_lab}/shared/telemetry")
+
+# Read the MRT dumps of the collectors of this run only
+if read_mrt_dumps:
+    shutil.rmtree(f"{dir_lab}/shared/dumps", ignore_errors=True)
+    dump_reader = mrt_reader.MrtReader(f"{dir_lab}/shared/dumps", mrt_retention)
+    dump_reader.start()  # Rotated dumps are compressed and pruned while the lab runs
+
+# Start the BMP collector before the routers open their BMP sessions
+if convergence_detector == "bmp":
+    collector = bmp_collector.BmpCollector(bmp_port)
+    collector.start()
+
 # Deploy the lab with all machines
 Kathara.get_instance().deploy_lab(lab)
 
-routers_count = len(routers) # Number of routers in the lab
+# Keep one shell session open per container instead of a docker exec per query
+if persistent_sessions:
+    container_exec.enable_persistent_sessions(lab)
 
-# Ensure BGP convergence and execute the attack
-bgp_convergence.ensure_bgp_convergence_and_execute_attack(routers, routers_count, lab, hacker_node)
+routers_count = len(routers) # Number of routers in the lab
 
-# Wait for BGP convergence
-bgp_convergence.wait_for_convergence(routers, routers_count, lab)
+# Tail the BGP UPDATE debug logs of the routers
+if convergence_detector == "log":
+    log_monitor = frr_log_monitor.FrrLogMonitor(routers, lab)
+    log_monitor.start()
 
 # Get victim's LAN and prefix
 lan_victim = neighbor_dict.get(f"{victim_node}", {}).get("internalLan", None)
 prefix_base_victim = ".".join(lan_victim.split(".")[:3]) + ".0"
 
+# Record route counts, table changes and the victim prefix flips of every router
+timeline = convergence_timeline.ConvergenceTimeline(routers_count, f"{prefix_base_victim}/24", convergence_detector)
+
+# Derive polling interval, stability window and timeout from the cone depth and the number of routers
+convergence_params = bgp_convergence.convergence_parameters(topology_rpki_coll, routers_count, convergence_config)
+rpki_wait_time = bgp_convergence.rpki_sync_wait_time(convergence_params, len(roa_list), convergence_config.get("rpki_sync_wait_time"))
+
+# Select how convergence is detected
+if convergence_detector == "telemetry":
+    def wait_function(routers, routers_count, lab):
+        return rib_telemetry.wait_for_convergence(telemetry_watcher, routers, routers_count,
+                                                  convergence_params["stable_window"], convergence_params["max_wait_time"],
+                                                  timeline=timeline)
+elif convergence_detector == "bmp":
+    def wait_function(routers, routers_count, lab):
+        return bmp_collector.wait_for_convergence(collector, routers, routers_count,
+                                                  convergence_params["stable_window"], convergence_params["max_wait_time"],
+                                                  timeline=timeline)
+elif convergence_detector == "log":
+    def wait_function(routers, routers_count, lab):
+        return frr_log_monitor.wait_for_convergence(log_monitor, routers, routers_count, lab,
+                                                    convergence_params["stable_window"], convergence_params["max_wait_time"],
+                                                    stop_condition=convergence_params["stop_condition"], timeline=timeline)
+else:
+    wait_function = functools.partial(bgp_convergence.wait_for_convergence, timeline=timeline, **convergence_params)
+
+# Before the attack, stop as soon as every router holds exactly the prefixes computed from the topology and policies
+attack_wait_function = wait_function
+if convergence_detector == "polling" and convergence_params["stop_condition"] == "expected_rib":
+    expected_ribs = route_propagation.expected_ribs(neighbor_dict, roa_list, prefix_lan_krill, prefer_customer, invalid_prefixes_in_bgp_table)
+    attack_wait_function = functools.partial(wait_function, expected_ribs=expected_ribs)
+    # The attack does not change the set of prefixes, so afterwards wait for the expected route count
+    wait_function = functools.partial(wait_function, stop_condition="route_count")
+
+# Ensure BGP convergence and execute the attack
+bgp_convergence.ensure_bgp_convergence_and_execute_attack(routers, routers_count, lab, hacker_node, attack_wait_function, timeline,
+                                                          rpki_nodes, len(roa_list), rpki_wait_time)
+
+# Wait for BGP convergence
+wait_function(routers, routers_count, lab)
+timeline.save("output/convergence_timeline.json")
+
+# Save the updates about the victim prefix seen by each collector
+if read_mrt_dumps:
+    dump_reader.stop()
+    dump_reader.poll()
+    with open("output/mrt_victim_updates.json", "w") as f:
+        json.dump(dump_reader.prefix_updates(f"{prefix_base_victim}/24"), f, indent=4)
+    print("Collector updates about the victim prefix saved in 'output/mrt_victim_updates.json'")
+
 # Perform BGP path checks
-bgp_aspath_check.bgp_check(routers, lab, hacker_node, victim_node, prefix_base_victim)
\ No newline at end of file
+results = bgp_aspath_check.bgp_check(routers, lab, hacker_node, victim_node, prefix_base_victim, roa_list,
+                                     [prefix_lan_krill] + analysis_prefixes)
+
+if convergence_detector == "log":
+    log_monitor.stop()
+
+container_exec.close_persistent_sessions()
+
+# Cache the results, so an identical run is not emulated again (unless some routing tables could not be read)
+if run_cache_dir and results is not None and not results.get("failed_routers"):
+    cache.store(fingerprint, fingerprint_inputs, results)
+
+# Append the run to the experiment store, so the results of previous runs are kept
+if experiment_store_file:
+    store = experiment_store.ExperimentStore(experiment_store_file)
+    run_id = store.record_run(config, seed, topology, saved_data, f"{prefix_base_victim}/24", results, timeline)
+    store.close()
+    print(f"Run {run_id} recorded in '{experiment_store_file}'")
+
+# Run the Dash app to visualize the results
+if results is not None:
+    bgp_aspath_check.show_results(results, webgl_edge_threshold, clustering_options)
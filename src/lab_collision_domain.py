@@ -1,6 +1,6 @@
 import os
 
-def create_routers_and_links(lab, image_frr, image_routinator, image_krill, topology, input_file):
+def create_routers_and_links(lab, image_frr, image_routinator, image_krill, topology, input_file, bridged=False):
     """
     Creates routers and links based on the topology defined in the JSON file.
 
@@ -10,6 +10,7 @@ def create_routers_and_links(lab, image_frr, image_routinator, image_krill, topo
     :param image_krill: Docker image for the Krill server.
     :param topology: Dictionary containing the topology.
     :param input_file: Name of the input file.
+    :param bridged: Boolean flag to connect the routers to the host (management) network.
     :return: A tuple containing the routers dictionary, the Krill server instance, and the router-links map.
     """
     routers = {}
@@ -24,15 +25,15 @@ def create_routers_and_links(lab, image_frr, image_routinator, image_krill, topo
             # If the router uses RPKI, create it with the Routinator image
             routers[as_number] = lab.new_machine(
                 name=f"router{as_number}",
-                image=image_routinator
-                #bridged=True
+                image=image_routinator,
+                bridged=bridged
             )
         else:
             # If the router does not use RPKI, create it with the FRRouting image
             routers[as_number] = lab.new_machine(
                 name=f"router{as_number}",
-                image=image_frr
-                #bridged=True
+                image=image_frr,
+                bridged=bridged
             )
         
         # Initialize the router's link map with an empty list
@@ -113,6 +114,8 @@ def create_routers_and_links(lab, image_frr, image_routinator, image_krill, topo
         for i, value in enumerate(router_collision_list):
             lab_lines.append(f"{name_router}[{i}]=\"{value}\"")  # Add each link to the router configuration
         lab_lines.append(f"{name_router}[image]=\"{image}\"")
+        if bridged:
+            lab_lines.append(f"{name_router}[bridged]=true")
         lab_lines.append("")  # Add a blank line for separation
 
     # Add the Krill server configuration
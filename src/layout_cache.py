@@ -0,0 +1,52 @@
+import os
+import hashlib
+import numpy as np
+import networkx as nx
+
+CACHE_DIRECTORY = "output/layout_cache"
+
+
+def graph_key(G, root, prog="dot"):
+    """
+    Hashes the node and edge set of a graph, with the root and the Graphviz program of the layout.
+
+    :param G: NetworkX graph of the customer cone.
+    :param root: Root AS of the layout.
+    :param prog: Graphviz program.
+    :return: Hexadecimal SHA-256 digest.
+    """
+    digest = hashlib.sha256(f"{prog}|{root}".encode("utf-8"))
+    for node in sorted(G.nodes):
+        digest.update(f"n|{node}\n".encode("utf-8"))
+    for node_a, node_b in sorted(G.edges):
+        digest.update(f"e|{node_a}|{node_b}|{G.edges[node_a, node_b].get('relation')}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def graph_layout(G, root, prog="dot", cache_directory=CACHE_DIRECTORY):
+    """
+    Returns the Graphviz layout of a graph, computing it only if the same graph was never laid out.
+
+    Layouts are saved as compressed NumPy arrays (node ids and coordinates), one file per graph key,
+    so the selection app and the result app of the same cone share them.
+
+    :param G: NetworkX graph of the customer cone.
+    :param root: Root AS of the layout.
+    :param prog: Graphviz program.
+    :param cache_directory: Directory of the cached layouts.
+    :return: Dictionary mapping nodes to (x, y) positions.
+    """
+    path = os.path.join(cache_directory, f"{graph_key(G, root, prog)}.npz")
+    if os.path.exists(path):
+        with np.load(path) as layout:
+            return {str(node): (float(x), float(y)) for node, (x, y) in zip(layout["nodes"], layout["pos"])}
+
+    pos = nx.nx_agraph.graphviz_layout(G, prog=prog, root=root)
+
+    os.makedirs(cache_directory, exist_ok=True)
+    nodes = list(pos)
+    # Written to a temporary file first, so a concurrent reader never sees a truncated layout
+    with open(f"{path}.tmp", "wb") as f:
+        np.savez_compressed(f, nodes=np.array(nodes, dtype=str), pos=np.array([pos[node] for node in nodes], dtype=np.float64))
+    os.replace(f"{path}.tmp", path)
+    return pos
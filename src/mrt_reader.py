@@ -0,0 +1,213 @@
+import os
+import re
+import gzip
+import time
+import shutil
+import socket
+import struct
+import threading
+from bmp_collector import decode_update
+
+# MRT types and BGP4MP subtypes (RFC 6396)
+BGP4MP = 16
+BGP4MP_ET = 17  # Same as BGP4MP, with an extra microsecond timestamp field
+BGP4MP_MESSAGE = 1
+BGP4MP_MESSAGE_AS4 = 4
+BGP4MP_MESSAGE_LOCAL = 6
+BGP4MP_MESSAGE_AS4_LOCAL = 7
+AS4_SUBTYPES = (BGP4MP_MESSAGE_AS4, BGP4MP_MESSAGE_AS4_LOCAL)
+MESSAGE_SUBTYPES = (BGP4MP_MESSAGE, BGP4MP_MESSAGE_AS4, BGP4MP_MESSAGE_LOCAL, BGP4MP_MESSAGE_AS4_LOCAL)
+AFI_IPV6 = 2
+
+MRT_HEADER = struct.Struct("!IHHI")  # timestamp, type, subtype, length
+
+# Dump files written by FRR: dump-router<AS>-<YYYYmmddHHMMSS> (see frr.create_frr)
+DUMP_FILE = re.compile(r"^dump-(router\d+)-(\d{14})$")
+
+
+def decode_record(record_type, subtype, timestamp, body):
+    """
+    Decodes a BGP4MP/BGP4MP_ET record carrying a BGP UPDATE.
+
+    :param record_type: MRT type.
+    :param subtype: MRT subtype.
+    :param timestamp: Seconds from the MRT header.
+    :param body: Record bytes following the MRT header.
+    :return: Dictionary describing the update, or None for other records.
+    """
+    if record_type not in (BGP4MP, BGP4MP_ET) or subtype not in MESSAGE_SUBTYPES:
+        return None
+    offset = 0
+    microseconds = 0
+    if record_type == BGP4MP_ET:
+        microseconds = struct.unpack_from("!I", body, 0)[0]
+        offset = 4
+
+    if subtype in AS4_SUBTYPES:
+        peer_as, local_as, _, afi = struct.unpack_from("!IIHH", body, offset)
+        offset += 12
+        as_size = 4
+    else:
+        peer_as, local_as, _, afi = struct.unpack_from("!HHHH", body, offset)
+        offset += 8
+        as_size = 2
+
+    if afi == AFI_IPV6:
+        peer_ip = socket.inet_ntop(socket.AF_INET6, body[offset:offset + 16])
+        offset += 32
+    else:
+        peer_ip = socket.inet_ntoa(body[offset:offset + 4])
+        offset += 8
+
+    update = decode_update(body[offset:], as_size)
+    if update is None:
+        return None
+    withdrawn, announced, as_path = update
+    return {
+        "timestamp": timestamp + microseconds / 1e6,
+        "peer_as": str(peer_as),
+        "local_as": str(local_as),
+        "peer_ip": peer_ip,
+        "announced": announced,
+        "withdrawn": withdrawn,
+        "as_path": as_path
+    }
+
+
+class MrtReader:
+    """
+    Incremental reader of the BGP4MP_ET dumps written by the collector routers.
+
+    The offset reached in every dump file is remembered, so each call only decodes the
+    bytes appended since the previous one; an incomplete record at the end of a file is
+    left for the next call. Dumps that were rotated by FRR and fully read are compressed,
+    and only the most recent ones are kept for every collector; start() polls in the
+    background, so the dumps are compressed and pruned while the lab runs.
+    """
+
+    def __init__(self, directory, retention=10):
+        """
+        :param directory: Host path of the shared dumps directory.
+        :param retention: Number of compressed dumps kept for every collector.
+        """
+        self.directory = directory
+        self.retention = retention
+        self.offsets = {}  # dump file -> bytes already decoded
+        self.updates = {}  # collector -> list of updates, in arrival order
+        self.lock = threading.Lock()  # Polls from the background thread and the caller never overlap
+        self.running = False
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self, interval=10):
+        """
+        Polls the dumps in a background thread, so the rotated ones are compressed and pruned during the run.
+
+        :param interval: Seconds between two polls.
+        """
+        self.running = True
+
+        def poll_loop():
+            while self.running:
+                time.sleep(interval)
+                try:
+                    self.poll()
+                except OSError as e:
+                    print(f"MRT: error while polling the dumps: {e}")
+
+        threading.Thread(target=poll_loop, daemon=True).start()
+
+    def stop(self):
+        """
+        Stops the background polling.
+        """
+        self.running = False
+
+    def _dump_files(self):
+        """
+        Returns the uncompressed dump files of every collector, oldest first.
+        """
+        dumps = {}
+        for name in sorted(os.listdir(self.directory)):
+            match = DUMP_FILE.match(name)
+            if match:
+                dumps.setdefault(match.group(1), []).append(name)
+        return dumps
+
+    def _read_file(self, name):
+        """
+        Decodes the complete records appended to a dump file since the last read.
+        """
+        updates = []
+        offset = self.offsets.get(name, 0)
+        with open(os.path.join(self.directory, name), "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        position = 0
+        while position + MRT_HEADER.size <= len(data):
+            timestamp, record_type, subtype, length = MRT_HEADER.unpack_from(data, position)
+            end = position + MRT_HEADER.size + length
+            if end > len(data):
+                break  # Record still being written
+            try:
+                update = decode_record(record_type, subtype, timestamp, data[position + MRT_HEADER.size:end])
+            except (struct.error, IndexError, OSError) as e:
+                print(f"MRT: malformed record in {name} at offset {offset + position}: {e}")
+                update = None
+            if update is not None:
+                updates.append(update)
+            position = end
+        self.offsets[name] = offset + position
+        return updates
+
+    def poll(self):
+        """
+        Reads the updates appended to the dumps since the last call and applies the rotation policy.
+
+        :return: Dictionary mapping collector names (e.g. "router65000") to their new updates.
+        """
+        new_updates = {}
+        with self.lock:
+            for collector, names in self._dump_files().items():
+                collector_updates = []
+                for name in names:
+                    try:
+                        collector_updates.extend(self._read_file(name))
+                    except OSError as e:
+                        print(f"MRT: cannot read {name}: {e}")
+                if collector_updates:
+                    self.updates.setdefault(collector, []).extend(collector_updates)
+                    new_updates[collector] = collector_updates
+                self._rotate(names)
+        return new_updates
+
+    def _rotate(self, names):
+        """
+        Compresses the rotated dumps of a collector that were fully read and removes the oldest ones.
+
+        :param names: Uncompressed dump files of the collector, oldest first (the last one is still being written).
+        """
+        for name in names[:-1]:
+            file_path = os.path.join(self.directory, name)
+            if self.offsets.get(name, 0) < os.path.getsize(file_path):
+                continue
+            with open(file_path, "rb") as source, gzip.open(f"{file_path}.gz", "wb") as target:
+                shutil.copyfileobj(source, target)
+            os.remove(file_path)
+            self.offsets.pop(name, None)
+
+        collector = DUMP_FILE.match(names[0]).group(1)
+        compressed = sorted(name for name in os.listdir(self.directory)
+                            if name.startswith(f"dump-{collector}-") and name.endswith(".gz"))
+        for name in compressed[:max(len(compressed) - self.retention, 0)]:
+            os.remove(os.path.join(self.directory, name))
+
+    def prefix_updates(self, prefix):
+        """
+        Returns the updates about a prefix received by every collector so far.
+
+        :param prefix: Prefix in CIDR notation.
+        :return: Dictionary mapping collector names to the updates announcing or withdrawing the prefix.
+        """
+        with self.lock:
+            return {collector: [update for update in updates if prefix in update["announced"] or prefix in update["withdrawn"]]
+                    for collector, updates in self.updates.items()}
@@ -0,0 +1,238 @@
+import os
+import time
+import ctypes
+import select
+import struct
+
+# inotify constants (see inotify(7))
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = 0o4000
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+def exporter_script(router_name, interval=2):
+    """
+    Generates the RIB telemetry exporter run in background by a router.
+
+    The exporter periodically reads "show ip bgp json", hashes the best path of every
+    prefix and writes a versioned digest into /shared/telemetry/<router>. The file is
+    rewritten (atomically) only when the digest changes, and its version is increased.
+
+    Digest format:
+        version <n> <unix timestamp>
+        <prefix> <hash of best AS path, next hop and validation state>
+        ...
+
+    :param router_name: Name of the router (e.g. "router65000").
+    :param interval: Seconds between two reads of the BGP table.
+    :return: List of strings representing the lines of the exporter script.
+    """
+    return [
+        "import hashlib, json, os, subprocess, time",
+        f"path = '/shared/telemetry/{router_name}'",
+        "version, previous = 0, None",
+        "while True:",
+        "    output = subprocess.run(['vtysh', '-c', 'show ip bgp json'], capture_output=True).stdout",
+        "    try:",
+        "        routes = json.loads(output or b'{}').get('routes', {})",
+        "    except ValueError:",
+        "        routes = {}",
+        "    lines = []",
+        "    for prefix in sorted(routes):",
+        "        best = next((p for p in routes[prefix] if p.get('bestpath')), routes[prefix][0])",
+        "        nexthops = ','.join(n.get('ip', '') for n in best.get('nexthops', []))",
+        "        key = '|'.join([best.get('path', ''), nexthops, str(best.get('rpkiValidationState', ''))])",
+        "        lines.append(f'{prefix} {hashlib.sha1(key.encode()).hexdigest()[:16]}')",
+        "    if lines != previous:",
+        "        version += 1",
+        "        with open(path + '.tmp', 'w') as f:",
+        "            f.write(f'version {version} {time.time():.3f}\\n' + '\\n'.join(lines) + '\\n')",
+        "        os.replace(path + '.tmp', path)",
+        "        previous = lines",
+        f"    time.sleep({interval})"
+    ]
+
+
+class TelemetryWatcher:
+    """
+    Watches the telemetry directory and reads only the digests whose version changed.
+
+    Changes are detected with inotify when available, falling back to a scan of the
+    file modification times on other platforms.
+    """
+
+    def __init__(self, directory):
+        """
+        :param directory: Host path of the shared telemetry directory.
+        """
+        self.directory = directory
+        self.versions = {}  # router -> last version read
+        self.digests = {}  # router -> {prefix: hash}
+        self.timestamps = {}  # router -> time of the last digest written by the router
+        self.mtimes = {}  # file -> modification time (fallback mode only)
+        self.inotify_fd = None
+        os.makedirs(directory, exist_ok=True)
+        self._start_inotify()
+
+    def _start_inotify(self):
+        """
+        Registers an inotify watch on the telemetry directory, if supported.
+        """
+        try:
+            libc = ctypes.CDLL("libc.so.6", use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK)
+            if fd < 0:
+                return
+            if libc.inotify_add_watch(fd, self.directory.encode(), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+                os.close(fd)
+                return
+            self.inotify_fd = fd
+        except (OSError, AttributeError):
+            self.inotify_fd = None
+
+    def _changed_files(self, timeout):
+        """
+        Waits up to timeout seconds for written files and returns their names.
+        """
+        if self.inotify_fd is None:
+            time.sleep(timeout)
+            changed = set()
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".tmp"):
+                    continue
+                mtime = entry.stat().st_mtime
+                if self.mtimes.get(entry.name) != mtime:
+                    self.mtimes[entry.name] = mtime
+                    changed.add(entry.name)
+            return changed
+
+        changed = set()
+        ready, _, _ = select.select([self.inotify_fd], [], [], timeout)
+        while ready:
+            try:
+                data = os.read(self.inotify_fd, 65536)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                _, _, _, name_length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + name_length].rstrip(b"\0").decode()
+                offset += name_length
+                if name and not name.endswith(".tmp"):
+                    changed.add(name)
+            ready, _, _ = select.select([self.inotify_fd], [], [], 0)
+        return changed
+
+    def poll(self, timeout=1):
+        """
+        Reads the digests that changed since the last call.
+
+        :param timeout: Maximum time in seconds to wait for changes.
+        :return: List of routers whose digest version changed.
+        """
+        updated = []
+        for router_name in self._changed_files(timeout):
+            file_path = os.path.join(self.directory, router_name)
+            try:
+                with open(file_path, "r") as f:
+                    header = f.readline().split()
+                    if len(header) != 3 or header[0] != "version":
+                        continue
+                    version = int(header[1])
+                    if self.versions.get(router_name) == version:
+                        continue  # Same version already read
+                    digest = dict(line.split() for line in f if line.strip())
+            except (OSError, ValueError):
+                continue
+            self.versions[router_name] = version
+            self.digests[router_name] = digest
+            self.timestamps[router_name] = float(header[2])
+            updated.append(router_name)
+        return updated
+
+    def rescan(self):
+        """
+        Reads every digest currently present, regardless of the events received.
+        """
+        self.mtimes = {}
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".tmp"):
+                self.mtimes[entry.name] = None
+        inotify_fd, self.inotify_fd = self.inotify_fd, None
+        try:
+            self.poll(timeout=0)
+        finally:
+            self.inotify_fd = inotify_fd
+
+    def close(self):
+        """
+        Releases the inotify watch.
+        """
+        if self.inotify_fd is not None:
+            os.close(self.inotify_fd)
+            self.inotify_fd = None
+
+
+def record_timeline(watcher, timeline, router_names):
+    """
+    Records the digests of some routers in a convergence timeline.
+
+    :param watcher: TelemetryWatcher on the shared telemetry directory.
+    :param timeline: ConvergenceTimeline of the run.
+    :param router_names: Routers whose digest was read.
+    """
+    for router_name in router_names:
+        if router_name in watcher.digests:
+            digest = watcher.digests[router_name]
+            # The digest version changes with the table; the time is the one written by the router
+            timeline.record_state(router_name, len(digest), watcher.versions[router_name],
+                                  digest.get(timeline.victim_prefix), watcher.timestamps[router_name])
+
+
+def wait_for_convergence(watcher, routers, routers_count, stable_time=25, max_wait_time=600, timeline=None):
+    """
+    Waits until every router publishes at least the expected number of prefixes
+    and no digest changes for stable_time seconds.
+
+    :param watcher: TelemetryWatcher on the shared telemetry directory.
+    :param routers: Dictionary of router instances.
+    :param routers_count: Expected number of routes per router.
+    :param stable_time: Time in seconds without digest changes required for convergence.
+    :param max_wait_time: Maximum time in seconds to wait for convergence.
+    :param timeline: Optional ConvergenceTimeline recording the route counts and changes of every router.
+    :return: True if convergence is reached, False otherwise.
+    """
+    print("\nWaiting for route convergence (RIB telemetry)...")
+    router_names = [machine.name for machine in routers.values()]
+    watcher.rescan()
+    if timeline is not None:
+        record_timeline(watcher, timeline, router_names)
+    start = time.monotonic()
+    last_change = start
+
+    while time.monotonic() - start < max_wait_time:
+        updated = watcher.poll(timeout=1)
+        if timeline is not None:
+            record_timeline(watcher, timeline, updated)
+        if updated:
+            last_change = time.monotonic()
+            print(f"BGP table changed for {len(updated)} routers: {', '.join(sorted(updated)[:10])}")
+
+        # Every router must hold at least the expected number of prefixes
+        if any(len(watcher.digests.get(name, {})) < routers_count for name in router_names):
+            continue
+
+        quiet = time.monotonic() - last_change
+        if quiet >= stable_time:
+            if timeline is not None:
+                timeline.mark_converged()
+            print("Convergence reached!")
+            return True
+
+    missing = [name for name in router_names if len(watcher.digests.get(name, {})) < routers_count]
+    for name in missing:
+        print(f"Convergence not reached: {name} has {len(watcher.digests.get(name, {}))} routes (expected: {routers_count}).")
+    print("Timeout reached: Convergence not achieved.")
+    return False
@@ -0,0 +1,247 @@
+from collections import deque
+import rov
+
+# Relationship of a neighbor, as seen by the local AS
+CUSTOMER = "customer"
+PEER = "peer"
+PROVIDER = "provider"
+
+# Local preference set by the route-maps generated in frr.create_frr, by validation state and relationship
+RPKI_PREFER_CUSTOMER = {
+    rov.VALID: {CUSTOMER: 500, PEER: 450, PROVIDER: 400},
+    rov.NOT_FOUND: {CUSTOMER: 350, PEER: 300, PROVIDER: 250},
+    rov.INVALID: {CUSTOMER: 30, PEER: 20, PROVIDER: 10}
+}
+PREFER_CUSTOMER = {CUSTOMER: 350, PEER: 300, PROVIDER: 250}
+ONLY_RPKI = {rov.VALID: 500, rov.NOT_FOUND: 200, rov.INVALID: 10}
+DEFAULT_LOCAL_PREF = 100
+LOCAL_ROUTE_PREF = 1 << 16  # Locally originated routes always win
+
+
+def build_relations(neighbor_dict):
+    """
+    Builds the relationships of every AS towards its neighbors.
+
+    :param neighbor_dict: Dictionary created by neighbor_dictionary.create_neighbor_dictionary.
+    :return: Dictionary mapping each AS to {neighbor AS: CUSTOMER | PEER | PROVIDER}.
+    """
+    relations = {}
+    for as_number, details in neighbor_dict.items():
+        neighbors = relations.setdefault(as_number, {})
+        for rel_type, relation in (("p2c", CUSTOMER), ("p2p", PEER), ("c2p", PROVIDER)):
+            for peer in details[rel_type]:
+                for as_peer in peer:
+                    neighbors[as_peer] = relation
+    return relations
+
+
+def relations_from_topology(topology):
+    """
+    Builds the relationships of every AS from a customer cone topology.
+
+    :param topology: Dictionary representing the customer cone (lists of ASes under "p2c", "p2p" and "c2p").
+    :return: Dictionary mapping each AS to {neighbor AS: CUSTOMER | PEER | PROVIDER}.
+    """
+    opposite = {CUSTOMER: PROVIDER, PEER: PEER, PROVIDER: CUSTOMER}
+    relations = {as_number: {} for as_number in topology}
+    for as_number, details in topology.items():
+        for rel_type, relation in (("p2c", CUSTOMER), ("p2p", PEER), ("c2p", PROVIDER)):
+            for peer in details.get(rel_type, []):
+                if peer in relations:
+                    relations[as_number][peer] = relation
+                    relations[peer][as_number] = opposite[relation]
+    return relations
+
+
+class RoutingPolicy:
+    """
+    Import policy of every router, mirroring the route-maps generated by frr.create_frr.
+    """
+
+    def __init__(self, rpki_nodes, roa_list, prefer_customer, invalid_prefixes_in_bgp_table):
+        """
+        :param rpki_nodes: ASes using RPKI.
+        :param roa_list: List of ROAs loaded in Krill.
+        :param prefer_customer: Boolean flag to prefer customer routes.
+        :param invalid_prefixes_in_bgp_table: Boolean flag to keep invalid routes (with the lowest preference).
+        """
+        self.rpki_nodes = set(rpki_nodes)
+        self.vrp_trie = rov.build_vrp_trie(roa_list)
+        self.prefer_customer = prefer_customer
+        self.invalid_prefixes_in_bgp_table = invalid_prefixes_in_bgp_table
+        self.validation_cache = {}
+
+    def validate(self, prefix, origin_as):
+        """
+        Returns the (cached) validation state of an announcement.
+        """
+        key = (prefix, origin_as)
+        if key not in self.validation_cache:
+            self.validation_cache[key] = rov.validate(self.vrp_trie, prefix, origin_as)
+        return self.validation_cache[key]
+
+    def local_pref(self, as_number, relation, prefix, origin_as):
+        """
+        Computes the local preference a router assigns to a route.
+
+        :param as_number: AS of the receiving router.
+        :param relation: Relationship of the neighbor the route is received from.
+        :param prefix: Announced prefix.
+        :param origin_as: Origin AS of the route.
+        :return: Local preference, or None if the route is filtered.
+        """
+        if as_number not in self.rpki_nodes:
+            return self.state_local_pref(False, relation, None)
+        return self.state_local_pref(True, relation, self.validate(prefix, origin_as))
+
+    def state_local_pref(self, is_rpki, relation, state):
+        """
+        Computes the local preference of a route from its validation state.
+
+        :param is_rpki: Whether the receiving router uses RPKI (the state is ignored otherwise).
+        :param relation: Relationship of the neighbor the route is received from.
+        :param state: Validation state of the route.
+        :return: Local preference, or None if the route is filtered.
+        """
+        if not is_rpki:
+            return PREFER_CUSTOMER[relation] if self.prefer_customer else DEFAULT_LOCAL_PREF
+        if state == rov.INVALID and not self.invalid_prefixes_in_bgp_table:
+            return None
+        if self.prefer_customer:
+            return RPKI_PREFER_CUSTOMER[state][relation]
+        return ONLY_RPKI[state]
+
+
+def _rank(route, older_origins):
+    """
+    Ranks a route for the best path selection: highest local preference, shortest AS path,
+    then routes from the older origins and lowest neighbor AS (a deterministic stand-in for
+    FRR's oldest-path tie-break).
+    """
+    local_pref, path, neighbor, _ = route
+    newer = 1 if path and path[-1] not in older_origins else 0
+    return -local_pref, len(path), newer, int(neighbor) if neighbor else -1
+
+
+def exported_to(relations, as_number, route):
+    """
+    Lists the neighbors a route is exported to under valley-free export.
+
+    :param relations: Dictionary returned by build_relations.
+    :param as_number: AS exporting the route.
+    :param route: Best route of the AS, as stored by propagate (None for no route).
+    :return: List of neighbor ASes receiving the route.
+    """
+    if route is None:
+        return []
+    path = (as_number,) + route[1]
+    from_customer = route[3] in (None, CUSTOMER)
+    # Routes learned from peers and providers go only to customers; neighbors in the path would discard them
+    return [neighbor for neighbor, relation in relations[as_number].items()
+            if (from_customer or relation == CUSTOMER) and neighbor not in path]
+
+
+def propagate(relations, policy, prefix, origins, state=None, seeds=None, older_origins=()):
+    """
+    Computes the best route of every AS towards a prefix under valley-free (Gao-Rexford) export.
+
+    Routes learned from customers (and local routes) are exported to every neighbor, routes
+    learned from peers and providers only to customers, matching the RFC 9234 roles set in
+    frr.create_frr. The computation is a worklist over the ASes whose best route changed, so
+    it can be resumed from a previous state after a policy change at a few ASes (seeds).
+
+    :param relations: Dictionary returned by build_relations.
+    :param policy: RoutingPolicy of the routers.
+    :param prefix: Announced prefix.
+    :param origins: List of ASes originating the prefix.
+    :param state: Optional state returned by a previous call, updated in place.
+    :param seeds: ASes whose best route must be recomputed (all origins when starting from scratch).
+    :param older_origins: Origins announced first, whose routes win ties (as the oldest paths in FRR).
+    :return: State dictionary {"best": {AS: (local_pref, path, neighbor, relation)}, "rib_in": {AS: {neighbor: path}}}.
+             Paths are tuples of ASes starting from the neighbor and ending with the origin; local routes have an empty path.
+    """
+    if state is None:
+        state = {"best": {}, "rib_in": {as_number: {} for as_number in relations}}
+        seeds = list(origins)
+    best = state["best"]
+    rib_in = state["rib_in"]
+    origins = set(origins)
+
+    # Breadth-first order, so shorter paths are usually settled before longer ones
+    worklist = deque(dict.fromkeys(seeds or []))
+    queued = set(worklist)
+    while worklist:
+        as_number = worklist.popleft()
+        queued.discard(as_number)
+
+        # Select the best route among the local route and the routes received from the neighbors
+        candidates = []
+        if as_number in origins:
+            candidates.append((LOCAL_ROUTE_PREF, (), None, None))
+        for neighbor, path in rib_in[as_number].items():
+            relation = relations[as_number][neighbor]
+            local_pref = policy.local_pref(as_number, relation, prefix, path[-1])
+            if local_pref is not None:
+                candidates.append((local_pref, path, neighbor, relation))
+        new_best = min(candidates, key=lambda route: _rank(route, older_origins)) if candidates else None
+        if new_best == best.get(as_number):
+            continue
+        if new_best is None:
+            best.pop(as_number, None)
+        else:
+            best[as_number] = new_best
+
+        # Send the new best route (or a withdrawal) to the neighbors allowed by the export policy
+        receivers = set(exported_to(relations, as_number, new_best))
+        path = (as_number,) + new_best[1] if new_best is not None else None
+        for neighbor in relations[as_number]:
+            current = rib_in[neighbor].get(as_number)
+            if neighbor in receivers and current != path:
+                rib_in[neighbor][as_number] = path
+            elif neighbor not in receivers and current is not None:
+                del rib_in[neighbor][as_number]
+            else:
+                continue
+            if neighbor not in queued:
+                worklist.append(neighbor)
+                queued.add(neighbor)
+    return state
+
+
+def announcements(neighbor_dict, prefix_lan_krill):
+    """
+    Lists the prefixes announced before the attack, as configured by frr.create_frr.
+
+    :param neighbor_dict: Dictionary containing neighbor configurations.
+    :param prefix_lan_krill: LAN prefix of the Krill server, announced by the first router.
+    :return: Dictionary mapping prefixes to the list of their origin ASes.
+    """
+    prefixes = {}
+    for as_number, details in neighbor_dict.items():
+        if not prefixes:
+            prefixes[prefix_lan_krill] = [as_number]
+        internal_lan_base = ".".join(details["internalLan"].split(".")[:3]) + ".0"
+        prefixes.setdefault(f"{internal_lan_base}/24", []).append(as_number)
+    return prefixes
+
+
+def expected_ribs(neighbor_dict, roa_list, prefix_lan_krill, prefer_customer, invalid_prefixes_in_bgp_table):
+    """
+    Computes the set of prefixes each router should hold once BGP has converged (before the attack).
+
+    :param neighbor_dict: Dictionary containing neighbor configurations.
+    :param roa_list: List of ROAs loaded in Krill.
+    :param prefix_lan_krill: LAN prefix of the Krill server.
+    :param prefer_customer: Boolean flag to prefer customer routes.
+    :param invalid_prefixes_in_bgp_table: Boolean flag to keep invalid routes.
+    :return: Dictionary mapping router names (e.g. "router65000") to sets of prefixes.
+    """
+    relations = build_relations(neighbor_dict)
+    rpki_nodes = [as_number for as_number, details in neighbor_dict.items() if details.get("rpki") == "yes"]
+    policy = RoutingPolicy(rpki_nodes, roa_list, prefer_customer, invalid_prefixes_in_bgp_table)
+    ribs = {f"router{as_number}": set() for as_number in neighbor_dict}
+    for prefix, origins in announcements(neighbor_dict, prefix_lan_krill).items():
+        state = propagate(relations, policy, prefix, origins)
+        for as_number in state["best"]:
+            ribs[f"router{as_number}"].add(prefix)
+    return ribs
@@ -0,0 +1,128 @@
+import socket
+
+# Validation states, named as in the FRR route-maps ("match rpki valid|invalid|notfound")
+VALID = "valid"
+INVALID = "invalid"
+NOT_FOUND = "notfound"
+
+
+def prefix_to_int(prefix):
+    """
+    Converts an IPv4 prefix string into its integer network address and length.
+
+    :param prefix: Prefix in CIDR notation (e.g. "10.0.0.0/24"). A missing length is read as /32.
+    :return: Tuple (network address as integer, prefix length).
+    """
+    address, _, length = prefix.partition("/")
+    length = int(length) if length else 32
+    network = int.from_bytes(socket.inet_aton(address), "big")
+    # Clear host bits so that "10.0.0.1/24" and "10.0.0.0/24" share the same trie path
+    if length < 32:
+        network &= ~((1 << (32 - length)) - 1) & 0xFFFFFFFF
+    return network, length
+
+
+def parse_roa_entry(roa_entry):
+    """
+    Parses a ROA string in the format produced by roa_entry.generate_roa_entries.
+
+    Both "prefix => AS" and the Krill max-length form "prefix-maxlen => AS" are accepted.
+
+    :param roa_entry: ROA string (e.g. "10.0.0.0/24 => 65000").
+    :return: Tuple (prefix, max length, origin AS as string).
+    """
+    prefix_part, origin_as = [part.strip() for part in roa_entry.split("=>")]
+    if "-" in prefix_part:
+        prefix, max_length = prefix_part.split("-")
+        max_length = int(max_length)
+    else:
+        prefix = prefix_part
+        max_length = int(prefix.split("/")[1])
+    return prefix, max_length, origin_as.upper().replace("AS", "")
+
+
+def build_vrp_trie(roa_list):
+    """
+    Builds a binary radix trie of Validated ROA Payloads (VRPs).
+
+    Each node is a list [child_0, child_1, vrps], where vrps holds the
+    (max_length, origin_as) pairs of the ROAs whose prefix ends at that node.
+
+    :param roa_list: List of ROA strings generated by roa_entry.generate_roa_entries.
+    :return: Root node of the trie.
+    """
+    root = [None, None, []]
+    for roa in roa_list:
+        prefix, max_length, origin_as = parse_roa_entry(roa)
+        network, length = prefix_to_int(prefix)
+
+        # Walk the prefix bits from the most significant, creating missing nodes
+        node = root
+        for depth in range(length):
+            bit = (network >> (31 - depth)) & 1
+            if node[bit] is None:
+                node[bit] = [None, None, []]
+            node = node[bit]
+        node[2].append((max_length, origin_as))
+    return root
+
+
+def covering_vrps(trie, network, length):
+    """
+    Collects all VRPs whose prefix covers the given prefix.
+
+    :param trie: Root node of the VRP trie.
+    :param network: Network address of the announced prefix as integer.
+    :param length: Length of the announced prefix.
+    :return: List of (max_length, origin_as) pairs of the covering VRPs.
+    """
+    covering = list(trie[2])
+    node = trie
+    for depth in range(length):
+        node = node[(network >> (31 - depth)) & 1]
+        if node is None:
+            break
+        if node[2]:
+            covering.extend(node[2])
+    return covering
+
+
+def validate(trie, prefix, origin_as):
+    """
+    Computes the Route Origin Validation state of an announcement (RFC 6811).
+
+    :param trie: Root node of the VRP trie.
+    :param prefix: Announced prefix in CIDR notation.
+    :param origin_as: Origin AS of the announcement.
+    :return: One of VALID, INVALID or NOT_FOUND.
+    """
+    network, length = prefix_to_int(prefix)
+    return _state(covering_vrps(trie, network, length), length, str(origin_as))
+
+
+def normalize_state(state):
+    """
+    Normalizes a validation state reported by FRR ("valid", "invalid", "not found").
+
+    :param state: Validation state string as printed by vtysh.
+    :return: One of VALID, INVALID or NOT_FOUND, or None if the state is unknown.
+    """
+    if not state:
+        return None
+    state = state.lower().replace(" ", "").replace("-", "")
+    if state in (VALID, INVALID, NOT_FOUND):
+        return state
+    return None
+
+
+def _state(vrps, length, origin_as):
+    """
+    Derives the validation state from the covering VRPs of a prefix.
+    """
+    if not vrps:
+        return NOT_FOUND
+    for max_length, vrp_as in vrps:
+        # AS0 ROAs never validate an announcement (RFC 6483)
+        if vrp_as == origin_as and vrp_as != "0" and length <= max_length:
+            return VALID
+    return INVALID
@@ -0,0 +1,126 @@
+import os
+import json
+import time
+import hashlib
+import subprocess
+
+# Generated files left out of the fingerprint: keys and certificates are new at every run,
+# telemetry digests and MRT dumps are written by the running lab
+EXCLUDED_EXTENSIONS = (".crt", ".key", ".csr", ".pem", ".srl")
+EXCLUDED_DIRECTORIES = ("shared/telemetry", "shared/dumps")
+
+
+def file_digest(path):
+    """
+    Returns the SHA-256 digest of a file.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def lab_digests(lab_directory):
+    """
+    Hashes the configuration files generated in the lab directory.
+
+    :param lab_directory: Path of the lab directory.
+    :return: Dictionary mapping relative paths to SHA-256 digests.
+    """
+    digests = {}
+    for root, directories, files in os.walk(lab_directory):
+        relative_root = os.path.relpath(root, lab_directory)
+        directories[:] = sorted(
+            directory for directory in directories
+            if os.path.normpath(os.path.join(relative_root, directory)).replace(os.sep, "/") not in EXCLUDED_DIRECTORIES
+        )
+        for file_name in files:
+            if not file_name.endswith(EXCLUDED_EXTENSIONS):
+                path = os.path.join(root, file_name)
+                digests[os.path.relpath(path, lab_directory).replace(os.sep, "/")] = file_digest(path)
+    return digests
+
+
+def image_ids(images):
+    """
+    Reads the ids of the Docker images used by the lab.
+
+    :param images: List of Docker image names.
+    :return: Dictionary mapping image names to ids (None if the image cannot be inspected).
+    """
+    ids = {}
+    for image in images:
+        try:
+            result = subprocess.run(["docker", "image", "inspect", "--format", "{{.Id}}", image],
+                                    capture_output=True, text=True, timeout=30)
+            ids[image] = result.stdout.strip() if result.returncode == 0 else None
+        except (OSError, subprocess.TimeoutExpired):
+            ids[image] = None
+    return ids
+
+
+def fingerprint(relations_file, topology, hacker_node, victim_node, options, lab_directory, images):
+    """
+    Computes the fingerprint of every input that affects the outcome of a run.
+
+    :param relations_file: Path of the AS relationships snapshot.
+    :param topology: Customer cone with the 'rpki' and 'collector' attributes of every AS.
+    :param hacker_node: AS number of the hacker.
+    :param victim_node: AS number of the victim.
+    :param options: Dictionary of the policy flags and analysis options of the run.
+    :param lab_directory: Path of the lab directory, once the configuration files are generated.
+    :param images: List of the Docker images used by the lab.
+    :return: Tuple (hexadecimal fingerprint, dictionary of the fingerprinted inputs).
+    """
+    inputs = {
+        "relations_file": file_digest(relations_file) if relations_file and os.path.exists(relations_file) else None,
+        "root_as": next(iter(topology)),
+        "topology": topology,
+        "hacker_node": hacker_node,
+        "victim_node": victim_node,
+        "options": options,
+        "configuration_files": lab_digests(lab_directory),
+        "images": image_ids(images)
+    }
+    encoded = json.dumps(inputs, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest(), inputs
+
+
+class RunCache:
+    """
+    Cache of the analysis results of whole runs, keyed by the fingerprint of their inputs.
+    """
+
+    def __init__(self, directory):
+        """
+        :param directory: Directory holding one JSON file per fingerprint.
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        """
+        Returns the path of the cache entry of a fingerprint.
+        """
+        return os.path.join(self.directory, f"{key}.json")
+
+    def load(self, key):
+        """
+        Returns the analysis results stored for a fingerprint, or None.
+        """
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return json.load(f)["results"]
+
+    def store(self, key, inputs, results):
+        """
+        Stores the analysis results of a run with the inputs of its fingerprint.
+        """
+        # Written to a temporary file first, so an interrupted run never leaves a truncated entry
+        path = self._path(key)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "inputs": inputs, "results": results}, f)
+        os.replace(f"{path}.tmp", path)
@@ -0,0 +1,145 @@
+import os
+import uuid
+import shlex
+import select
+import threading
+import subprocess
+from Kathara.manager.Kathara import Kathara
+
+
+class ShellSession:
+    """
+    Long-lived interactive shell opened with "docker exec -i" in a container.
+
+    Commands are written to the shell one at a time and their output is framed by a
+    delimiter line carrying the return code, so a single exec stream serves every query.
+    """
+
+    def __init__(self, machine_name, lab):
+        """
+        :param machine_name: Name of the Kathara machine.
+        :param lab: Kathara lab instance.
+        """
+        self.machine_name = machine_name
+        self.lab = lab
+        self.marker = f"__KAT_END_{uuid.uuid4().hex}__".encode()
+        self.process = None
+        self.buffer = b""
+        self.lock = threading.Lock()
+
+    def connect(self):
+        """
+        Opens the shell in the container, resolving the container again in case it was restarted.
+        """
+        self.close()
+        container = Kathara.get_instance().get_machine_api_object(self.machine_name, lab_hash=self.lab.hash)
+        self.process = subprocess.Popen(
+            ["docker", "exec", "-i", container.id, "bash"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+        self.buffer = b""
+
+    def close(self):
+        """
+        Terminates the shell, if open.
+        """
+        if self.process is not None:
+            try:
+                self.process.stdin.close()
+                self.process.terminate()
+                self.process.wait(timeout=5)
+            except Exception:
+                self.process.kill()
+            self.process = None
+
+    def exec(self, command, timeout=60):
+        """
+        Runs a command in the shell, reconnecting once if the stream is broken.
+
+        :param command: Command as a list of arguments or as a string (split like docker exec does).
+        :param timeout: Time in seconds to wait for the command to complete.
+        :return: Tuple (stdout as bytes, None, return code), like Kathara's manager.exec.
+        """
+        if isinstance(command, str):
+            command = shlex.split(command)
+        command_line = shlex.join(command)
+
+        with self.lock:
+            for attempt in range(2):
+                try:
+                    if self.process is None or self.process.poll() is not None:
+                        self.connect()
+                    return self._run(command_line, timeout)
+                except TimeoutError:
+                    raise
+                except (BrokenPipeError, EOFError, OSError) as e:
+                    if attempt == 1:
+                        raise
+                    print(f"Session to {self.machine_name} lost ({e}), reconnecting...")
+                    self.close()
+
+    def _run(self, command_line, timeout):
+        """
+        Writes a command followed by the delimiter and reads its framed output.
+        """
+        # The newline before the marker ensures it starts a line even if the output does not end with one
+        framed = f"{command_line} </dev/null; printf '\\n%s %d\\n' '{self.marker.decode()}' $?\n"
+        self.process.stdin.write(framed.encode())
+        self.process.stdin.flush()
+
+        stdout_fd = self.process.stdout.fileno()
+        end = b"\n" + self.marker + b" "
+        while end not in self.buffer:
+            ready, _, _ = select.select([stdout_fd], [], [], timeout)
+            if not ready:
+                # The stream is out of sync after a timeout: drop it and reconnect on the next call
+                self.close()
+                raise TimeoutError(f"no answer from {self.machine_name} within {timeout} seconds")
+            chunk = os.read(stdout_fd, 65536)
+            if not chunk:
+                raise EOFError("shell stream closed")
+            self.buffer += chunk
+
+        output, _, rest = self.buffer.partition(end)
+        return_code, _, self.buffer = rest.partition(b"\n")
+        return output, None, int(return_code)
+
+
+class SessionPool:
+    """
+    Keeps one persistent shell session per container.
+    """
+
+    def __init__(self, lab):
+        """
+        :param lab: Kathara lab instance.
+        """
+        self.lab = lab
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def exec(self, machine_name, command, timeout=60):
+        """
+        Runs a command in a container through its persistent session.
+
+        :param machine_name: Name of the Kathara machine.
+        :param command: Command to execute inside the container.
+        :param timeout: Time in seconds to wait for the command to complete.
+        :return: Tuple (stdout as bytes, None, return code).
+        """
+        with self.lock:
+            session = self.sessions.get(machine_name)
+            if session is None:
+                session = self.sessions[machine_name] = ShellSession(machine_name, self.lab)
+        return session.exec(command, timeout)
+
+    def close(self):
+        """
+        Closes all the sessions.
+        """
+        with self.lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions = {}
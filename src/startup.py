@@ -1,6 +1,59 @@
 import os
+import rib_telemetry
 
-def startup_routers(lab, neighbor_dict, input_file, dict_collision_domain, address_krill, address_router_to_krill, roa_list):
+def rpki_refresh_agent(interval=5, idle_rounds=24, pending_rounds=6):
+    """
+    Generates the RPKI refresh agent run in background by every RPKI router.
+
+    The agent watches the serial published by the local Routinator cache and, when it
+    changes, waits for bgpd to load the new VRP set. A single soft inbound refresh is
+    triggered only if the VRP set loaded by bgpd actually changed. Once the VRP set has
+    been stable for idle_rounds checks the agent exits, so converged labs stop refreshing.
+
+    :param interval: Seconds between two checks.
+    :param idle_rounds: Number of checks without VRP changes after which the agent exits.
+    :param pending_rounds: Number of checks to wait for bgpd to load a new cache serial.
+    :return: List of strings representing the lines of the agent script.
+    """
+    return [
+        "#!/bin/bash",
+        f"INTERVAL={interval}",
+        f"IDLE_ROUNDS={idle_rounds}",
+        f"PENDING_ROUNDS={pending_rounds}",
+        "PREVIOUS_SERIAL=\"\"",
+        "PREVIOUS_DIGEST=\"\"",
+        "PENDING=0",
+        "IDLE=0",
+        "while [ \"$IDLE\" -lt \"$IDLE_ROUNDS\" ]; do",
+        "    # Serial of the VRP set currently published by the local RPKI cache",
+        "    SERIAL=$(curl -s http://127.0.0.1:9556/status | awk '/^serial:/ {print $2; exit}')",
+        "    if [ -n \"$SERIAL\" ] && [ \"$SERIAL\" != \"$PREVIOUS_SERIAL\" ]; then",
+        "        echo \"Cache serial changed: '$PREVIOUS_SERIAL' -> '$SERIAL'\"",
+        "        PREVIOUS_SERIAL=\"$SERIAL\"",
+        "        PENDING=$PENDING_ROUNDS",
+        "    fi",
+        "    if [ \"$PENDING\" -gt 0 ]; then",
+        "        # Digest of the VRP set loaded by bgpd",
+        "        VRPS=$(vtysh -c \"show rpki prefix-table\" | grep -E \"^[0-9]\" | sort)",
+        "        DIGEST=$(echo \"$VRPS\" | md5sum | cut -d ' ' -f 1)",
+        "        if [ -n \"$VRPS\" ] && [ \"$DIGEST\" != \"$PREVIOUS_DIGEST\" ]; then",
+        "            echo \"VRP set changed ($(echo \"$VRPS\" | wc -l) VRPs). Refreshing inbound routes.\"",
+        "            vtysh -c \"clear ip bgp * soft in\"",
+        "            PREVIOUS_DIGEST=\"$DIGEST\"",
+        "            PENDING=0",
+        "        else",
+        "            PENDING=$((PENDING - 1))",
+        "        fi",
+        "        IDLE=0",
+        "    elif [ -n \"$PREVIOUS_DIGEST\" ]; then",
+        "        IDLE=$((IDLE + 1))",
+        "    fi",
+        "    sleep \"$INTERVAL\"",
+        "done",
+        "echo \"VRP set stable for $IDLE_ROUNDS checks. Agent exiting.\""
+    ]
+
+def startup_routers(lab, neighbor_dict, input_file, dict_collision_domain, address_krill, address_router_to_krill, roa_list, telemetry_interval=None):
     """
     Configures startup files for routers based on the topology.
 
@@ -11,6 +64,7 @@ def startup_routers(lab, neighbor_dict, input_file, dict_collision_domain, addre
     :param address_krill: LAN address used for the Krill server.
     :param address_router_to_krill: Address of the router connected to the Krill server.
     :param roa_list: List of ROAs (Route Origin Authorizations) to be applied.
+    :param telemetry_interval: If set, installs the RIB telemetry exporter, run every telemetry_interval seconds.
     :return: None
     """
 
@@ -91,51 +145,25 @@ def startup_routers(lab, neighbor_dict, input_file, dict_collision_domain, addre
                 "vtysh -c \"rpki start\""
             ])
 
-            # BGP table updates
+            # Install and launch the RPKI refresh agent (see rpki_refresh_agent)
+            lista_stringhe_net.append("cat > /root/rpki_agent.sh << 'EOF'")
+            lista_stringhe_net.extend(rpki_refresh_agent())
             lista_stringhe_net.extend([
-                f"MAX_ROUTES={len(neighbor_dict)+1}",
-                "INTERVAL=40",
-                "PREVIOUS_BGP_OUTPUT=\"\"",
-                "VALID_ROUTES_DETECTED=False",
-                "MAX_ITERATIONS=15",
-                "while true; do",
-                "    # Check the number of routes with flag N, V o I",
-                "    ROUTE_COUNT=$(vtysh -c \"show ip bgp\" | grep -c \"^\\s*\\(N\\|V\\|I\\)\\*\")",
-                "    CURRENT_BGP_OUTPUT=$(vtysh -c \"show ip bgp\")",
-                "    if [ \"$ROUTE_COUNT\" -gt 0 ]; then",
-                "        VALID_ROUTES_DETECTED=true",
-                "    fi",
-                "    if [ \"$VALID_ROUTES_DETECTED\" = true ]; then",
-                "        echo \"Current route count: $ROUTE_COUNT\"",
-                "        # Verify if the route count has reached the expected limit",
-                "        if [ \"$ROUTE_COUNT\" -ge \"$MAX_ROUTES\" ]; then",
-                "            echo \"Route count ($ROUTE_COUNT) has reached or exceeded the limit ($MAX_ROUTES). Checking for changes in the content.\"",
-                "            # Check if the content of the BGP table has changed",
-                "            if [ \"$CURRENT_BGP_OUTPUT\" != \"$PREVIOUS_BGP_OUTPUT\" ]; then",
-                "                echo \"BGP table content has changed. Clearing BGP sessions.\"",
-                "                for ((i=1; i<=MAX_ITERATIONS; i++)); do",
-                "                    echo \"Attempt #$i: clear ip bgp * soft\"",
-                "                    vtysh -c \"clear ip bgp * soft\"",
-                "                    sleep \"$INTERVAL\"",
-                "                    CURRENT_BGP_OUTPUT=$(vtysh -c \"show ip bgp\")",
-                "                    if [ \"$CURRENT_BGP_OUTPUT\" == \"$PREVIOUS_BGP_OUTPUT\" ]; then",
-                "                        echo \"BGP table no longer changing after $i attempts. Done.\"",
-                "                        break",
-                "                    fi",
-                "                done",
-                "            else",
-                "                echo \"BGP table content has not changed. No action needed.\"",
-                "            fi",
-                "            PREVIOUS_BGP_OUTPUT=\"$CURRENT_BGP_OUTPUT\"",
-                "        else",
-                "            echo \"Route count ($ROUTE_COUNT) is below the expected limit ($MAX_ROUTES).\"",
-                "            vtysh -c \"clear ip bgp * soft\"",
-                "        fi",
-                "    else",
-                "        echo \"Waiting for valid routes to appear (N, V, I).\"",
-                "    fi",
-                "    sleep \"$INTERVAL\"",
-                "done"
+                "EOF",
+                "nohup bash /root/rpki_agent.sh > /var/log/rpki_agent.log 2>&1 &"
+            ])
+
+        # Install and launch the RIB telemetry exporter (see rib_telemetry.exporter_script)
+        if telemetry_interval is not None:
+            lista_stringhe_net.extend([
+                "mkdir -p /shared/telemetry",
+                "chmod 777 /shared/telemetry",
+                "cat > /root/rib_exporter.py << 'EOF'"
+            ])
+            lista_stringhe_net.extend(rib_telemetry.exporter_script(router_name, telemetry_interval))
+            lista_stringhe_net.extend([
+                "EOF",
+                "nohup python3 /root/rib_exporter.py > /var/log/rib_exporter.log 2>&1 &"
             ])
 
         # Write the configuration file to the lab directory